@@ -1,12 +1,16 @@
+from contextlib import AsyncExitStack
 from fastapi import APIRouter, HTTPException
-from app.schemas.api import ProcessRequest, ProcessResponse, RewriteOption, FeedbackRequest, FeedbackResponse
+from fastapi.responses import StreamingResponse
+from typing import List
+from app.core.config import settings
+from app.core import executor
+from app.schemas.api import ProcessRequest, BatchProcessRequest, ProcessResponse, FeedbackRequest, FeedbackResponse
 # Consolidated imports
-from app.services import embeddings, vectorstore, scorer, issue_detector, rewriter, style_transfer
+from app.services import style_transfer, batching, cache, embedding_cache, feedback, pipeline, vectorstore, retention
 
 
 import uuid
 import json
-import os
 from datetime import datetime
 
 router = APIRouter()
@@ -14,59 +18,67 @@ router = APIRouter()
 @router.post("/analyze", response_model=ProcessResponse)
 async def analyze(request: ProcessRequest):
     try:
-        # --- STEP 0: DEMOJIZATON ---
-        # (REMOVED: Emoji handling caused issues. Using raw text.)
-        clean_text = request.text
-        
-        # 1. Vectorize (Use clean_text so emojis influence the vector)
-        vector = embeddings.generate_embedding(clean_text)
-        
-        # 2. Retrieve Context
-        context = vectorstore.search_context(vector)
-        
-        # 3. Save User Input to Memory
-        # We save the ORIGINAL text (with emojis) so the history looks correct to the user.
-        msg_id = str(uuid.uuid4())
-        vectorstore.upsert_message(
-            mid=msg_id,
-            text=request.text,  # Save original
-            embedding=vector,
-            metadata={"sender": request.sender}
-        )
-        
-        # 4. Score (Use clean_text so BERT understands the emotion)
-        scores = scorer.score_message(clean_text, context)
-        
-        # 5. Detect Issues (Use ORIGINAL text)
-        # We check the original so we can catch specific toxic emojis like 🖕 or 🤬
-        issues = issue_detector.detect_issues(request.text)
-        
-        # 6. Generate Rewrites
-        # Pass clean_text so T5 doesn't get confused by unknown characters
-        ai_rewrite_text = rewriter.generate_rewrite(clean_text)
-        
-        # 7. Apply Style Transfer
-        # Transform the T5 output to the requested persona style
-        styled_text = style_transfer.apply_style(ai_rewrite_text, request.style)
-        
-        # Determine the style label for display
-        style_label = f"{request.style}" if request.style != "Diplomat" else "Empathetic (AI)"
-        
-        rewrites = [
-            RewriteOption(style=style_label, text=styled_text),
-        ]
+        async with executor.admit():
+            return await pipeline.analyze_message(request)
 
-        
-        return ProcessResponse(
-            conversation_id=request.conversation_id or 0,
-            message_id=msg_id,
-            original_text=request.text,
-            retrieved_context=context,
-            empathy_scores=scores,
-            issues=issues,
-            rewrites=rewrites
+    except executor.PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        print(f"Server Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(request: ProcessRequest):
+    """
+    Server-Sent Events version of /analyze, for showing results as they arrive:
+    `meta`, `issues`, `scores`, then one `token` event per decoded word, then
+    `rewrite` (style-transferred text) and `done` (the full /analyze response).
+    Failures after the stream has started arrive as an `error` event.
+    """
+    # Hold an admission slot for the whole stream, but reject before sending a 200
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(executor.admit())
+    except executor.PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    async def events():
+        try:
+            async for event, data in pipeline.stream_message(request):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            print(f"Server Error: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            await slot.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/analyze/batch", response_model=List[ProcessResponse])
+async def analyze_batch(request: BatchProcessRequest):
+    """
+    Run the /analyze pipeline over many messages at once.
+    Each model stage (embed, retrieve, score, rewrite) runs as one padded batch.
+    """
+    if len(request.messages) > settings.ANALYZE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.messages)} > {settings.ANALYZE_BATCH_MAX_SIZE} messages"
         )
 
+    try:
+        async with executor.admit():
+            return await pipeline.analyze_messages(request.messages)
+
+    except executor.PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         print(f"Server Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -83,9 +95,31 @@ async def get_styles():
     }
 
 
-# --- FEEDBACK FILE PATH ---
-FEEDBACK_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "data", "feedback.jsonl")
+@router.get("/batching/stats")
+async def get_batching_stats():
+    """
+    Micro-batching metrics per model (queue depth, batch size histogram, wait times)
+    plus inference pool occupancy.
+    """
+    return {**batching.get_stats(), "pool": executor.get_stats()}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Result cache hit/miss counters per stage plus memory/disk occupancy,
+    and the same for the embedding cache.
+    """
+    return {**cache.get_stats(), "embeddings": embedding_cache.get_stats()}
+
 
+@router.get("/vectorstore/stats")
+async def get_vectorstore_stats():
+    """
+    Message store size, write-behind buffer depth / flush latency,
+    and retention evictions by reason.
+    """
+    return {**await executor.run_blocking(vectorstore.get_stats), "retention": retention.get_stats()}
 
 
 @router.post("/feedback", response_model=FeedbackResponse)
@@ -109,12 +143,9 @@ async def submit_feedback(request: FeedbackRequest):
             "timestamp": datetime.utcnow().isoformat(),
         }
         
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(FEEDBACK_FILE), exist_ok=True)
-        
-        # Append to JSONL file (one JSON object per line for easy processing)
-        with open(FEEDBACK_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(feedback_record) + "\n")
+        # Append to the JSONL log (one JSON object per line for easy processing);
+        # concurrent submissions are written together in one batch
+        await feedback.submit(feedback_record)
         
         # Log the feedback for monitoring
         feedback_type = "positive" if request.rating > 0 else "negative"
@@ -137,38 +168,11 @@ async def submit_feedback(request: FeedbackRequest):
 @router.get("/feedback/stats")
 async def get_feedback_stats():
     """
-    Get statistics on collected RLHF feedback.
+    Get statistics on collected RLHF feedback, overall and per UTC day (`by_day`).
+    Running totals: only lines logged since the last call are read.
     """
     try:
-        if not os.path.exists(FEEDBACK_FILE):
-            return {
-                "total_feedback": 0,
-                "positive_count": 0,
-                "negative_count": 0,
-                "corrections_count": 0
-            }
-        
-        positive_count = 0
-        negative_count = 0
-        corrections_count = 0
-        
-        with open(FEEDBACK_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    record = json.loads(line)
-                    if record.get("rating", 0) > 0:
-                        positive_count += 1
-                    else:
-                        negative_count += 1
-                    if record.get("user_correction"):
-                        corrections_count += 1
-        
-        return {
-            "total_feedback": positive_count + negative_count,
-            "positive_count": positive_count,
-            "negative_count": negative_count,
-            "corrections_count": corrections_count
-        }
+        return {**await executor.run_blocking(feedback.get_stats), "writer": feedback.get_writer_stats()}
         
     except Exception as e:
         print(f"Stats Error: {e}")
@@ -1,12 +1,135 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Empathy Engine"
     API_V1_STR: str = "/api/v1"
     
+    # Message store engine: "chroma" (ChromaDB) or "local" (NumPy memmap + optional HNSW)
+    VECTOR_BACKEND: str = "chroma"
+
     # Path where VectorDB will store data
     CHROMA_PERSIST_DIR: str = "./chroma_data"
+    # One Chroma collection per conversation (queries without a conversation use "messages")
+    CHROMA_SHARD_BY_CONVERSATION: bool = False
+
+    # Context retrieval scope: "conversation" (falls back to sender when the request
+    # has no conversation_id), "sender", or "global"
+    CONTEXT_SCOPE: str = "conversation"
+    # Only retrieve messages newer than this (seconds); 0 disables the window
+    CONTEXT_RECENCY_SECONDS: float = 30 * 24 * 3600
+
+    # Local backend: data dir, and store size above which search switches
+    # from exact matmul to an HNSW graph (needs `pip install hnswlib`)
+    LOCAL_VECTOR_DIR: str = "./vector_data"
+    LOCAL_VECTOR_ANN_THRESHOLD: int = 50000
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 64
+
+    # Write-behind buffer for vector store upserts: flush in bulk at this many
+    # messages, or when the oldest buffered message is this many seconds old
+    VECTOR_WRITE_BUFFER_SIZE: int = 64
+    VECTOR_WRITE_FLUSH_INTERVAL_S: float = 2.0
+
+    # Retention for the message store, enforced by a background compaction pass
+    # every COMPACTION_INTERVAL_S. 0 disables a limit (or the pass itself).
+    RETENTION_MAX_AGE_DAYS: float = 90
+    RETENTION_MAX_PER_CONVERSATION: int = 1000
+    RETENTION_MAX_TOTAL: int = 1_000_000
+    RETENTION_DEDUPLICATE: bool = True
+    COMPACTION_INTERVAL_S: float = 600
+
+    # Upper bound on messages accepted by /analyze/batch in one call
+    ANALYZE_BATCH_MAX_SIZE: int = 256
+
+    # Micro-batching: concurrent /analyze calls are coalesced into one forward pass.
+    # A batch runs when MAX_SIZE items are queued or MAX_WAIT_MS after the first arrived.
+    SCORER_BATCH_MAX_SIZE: int = 32
+    SCORER_BATCH_MAX_WAIT_MS: float = 5.0
+    REWRITER_BATCH_MAX_SIZE: int = 8
+    REWRITER_BATCH_MAX_WAIT_MS: float = 20.0
+
+    # Bounded thread pool for blocking inference / vector store calls
+    INFERENCE_WORKERS: int = 4
+    # Max /analyze requests in the pipeline at once; beyond this we 503 or queue
+    INFERENCE_MAX_PENDING: int = 64
+    INFERENCE_REJECT_WHEN_FULL: bool = True
+    # torch intra-op threads per process; 0 = default (cores / workers under gunicorn_conf.py)
+    TORCH_NUM_THREADS: int = 0
+
+    # Runtime for the scorer / rewriter: "torch" (saved_models/<model>) or "onnx"
+    # (saved_models/<model>_onnx, built with `python -m scripts.export_onnx`).
+    # ONNX_QUANTIZED loads the dynamic int8 export (<model>_onnx_int8) instead.
+    INFERENCE_BACKEND: str = "torch"
+    ONNX_QUANTIZED: bool = False
+
+    # Deterministic stand-ins for all three models (app/services/mock_models.py), for
+    # benchmarks and demos without saved_models/. Each forward pass sleeps MOCK_MODEL_LATENCY_MS.
+    MOCK_MODELS: bool = False
+    MOCK_MODEL_LATENCY_MS: float = 0.0
+
+    # T5 decoding: profile used when a request doesn't pick one ("quality", "balanced",
+    # "fast" or "sample"), and an output budget of MARGIN + RATIO * input tokens, capped at MAX_LENGTH
+    REWRITE_DEFAULT_PROFILE: str = "quality"
+    REWRITE_LENGTH_RATIO: float = 2.0
+    REWRITE_LENGTH_MARGIN: int = 10
+    REWRITE_MAX_LENGTH: int = 128
+    # /analyze/stream emits tokens as they're decoded, which needs a single hypothesis:
+    # requests for a beam profile are streamed with this one ("fast" or "sample") instead
+    STREAM_PROFILE: str = "fast"
+    # Skip T5 entirely (return the original text) when the heuristic score and both
+    # model-blended warmth / validation are at least this high; 0 disables
+    REWRITE_SKIP_THRESHOLD: float = 0.7
+
+    # Word list for issue detection and heuristic scoring (default: app/resources/lexicon.json)
+    LEXICON_PATH: Optional[str] = None
+
+    # Directory of persona rule files for style transfer (default: app/resources/styles/)
+    STYLES_DIR: Optional[str] = None
+
+    # Load and warm all models in the background at startup; /readyz is 503 until done.
+    # With ALLOW_FALLBACK, a model whose weights are missing (fallback output) doesn't block readiness.
+    WARMUP_ON_STARTUP: bool = True
+    WARMUP_ALLOW_FALLBACK: bool = False
+
+    # Result cache for scores and base rewrites
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_TTL_SECONDS: float = 24 * 3600
+    # Optional sqlite file for a cache tier that survives restarts (e.g. "./cache/results.sqlite")
+    CACHE_DISK_PATH: Optional[str] = None
+
+    # MiniLM vectors, keyed by text + model name (0 entries disables the memory tier)
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 50000
+    # Optional memory-mapped float32 tier shared by all workers (e.g. "./cache/embeddings");
+    # creates <path>.f32 (EMBEDDING_CACHE_DISK_ENTRIES x 384 x 4 bytes, sparse), <path>.idx and <path>.lock
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+    EMBEDDING_CACHE_DISK_ENTRIES: int = 200000
+
+    # RLHF feedback log: one JSONL segment per worker in FEEDBACK_DIR (default: data/feedback/),
+    # written in batches and rotated at MAX_BYTES or MAX_AGE_S (0 = no limit), gzipped with COMPRESS.
+    # Running stats are checkpointed to <dir>/.stats.json at most every CHECKPOINT_INTERVAL_S.
+    FEEDBACK_DIR: Optional[str] = None
+    FEEDBACK_BATCH_MAX_SIZE: int = 256
+    FEEDBACK_BATCH_MAX_WAIT_MS: float = 5.0
+    FEEDBACK_SEGMENT_MAX_BYTES: int = 64 * 1024 * 1024
+    FEEDBACK_SEGMENT_MAX_AGE_S: float = 24 * 3600
+    FEEDBACK_COMPRESS: bool = False
+    FEEDBACK_FSYNC: bool = False
+    FEEDBACK_CHECKPOINT_INTERVAL_S: float = 30.0
+
+    # Every analysis result, keyed by message_id, in sqlite (default: data/analyses.sqlite),
+    # for joining with feedback (scripts/export_training_data.py). Written behind the response.
+    ANALYSIS_STORE_ENABLED: bool = True
+    ANALYSIS_STORE_PATH: Optional[str] = None
+    ANALYSIS_STORE_BATCH_MAX_SIZE: int = 256
+    ANALYSIS_STORE_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # Per-stage latency histograms and counters are served at GET /metrics (Prometheus
+    # text format); SERVER_TIMING also lists each request's stage times in its headers
+    SERVER_TIMING: bool = True
     
     class Config:
         case_sensitive = True
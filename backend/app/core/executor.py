@@ -0,0 +1,112 @@
+"""
+Inference Executor
+Runs blocking model/DB calls on a bounded thread pool so the event loop stays free.
+
+Torch, tokenizers and Chroma release the GIL for the heavy work, so threads give
+real overlap without duplicating model weights per process.
+Admission control caps how many requests can be in the pipeline at once; past
+that limit we either reject (503) or make callers wait, per Settings.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+class PoolSaturated(Exception):
+    """Raised when the pipeline is at INFERENCE_MAX_PENDING and rejection is enabled."""
+
+
+# transformers builds weights under a process-global "empty weights" patch, so two
+# from_pretrained calls on different threads can corrupt each other. Hold this
+# while constructing model weights; tokenizers and inference don't need it.
+model_load_lock = threading.Lock()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_in_flight = 0
+_rejected = 0
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INFERENCE_WORKERS,
+            thread_name_prefix="inference",
+        )
+    return _executor
+
+
+async def run_blocking(fn: Callable, *args, **kwargs) -> Any:
+    """Await a synchronous call on the inference pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+@asynccontextmanager
+async def admit():
+    """
+    Reserve a pipeline slot for one request.
+    Raises PoolSaturated when full and INFERENCE_REJECT_WHEN_FULL is set, otherwise queues.
+    """
+    global _slots, _in_flight, _rejected
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.INFERENCE_MAX_PENDING)
+
+    if settings.INFERENCE_REJECT_WHEN_FULL and _slots.locked():
+        _rejected += 1
+        raise PoolSaturated(f"Inference pool is busy ({_in_flight} requests in flight)")
+
+    async with _slots:
+        _in_flight += 1
+        try:
+            yield
+        finally:
+            _in_flight -= 1
+
+
+class DedicatedThread:
+    """
+    One named thread for ordered blocking I/O (log appends, store writes) that must
+    not queue behind model calls on the inference pool. Restarts on use after shutdown().
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+            pool = self._executor
+        return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._executor = self._executor, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+def get_stats() -> Dict[str, Any]:
+    return {
+        "workers": settings.INFERENCE_WORKERS,
+        "max_pending": settings.INFERENCE_MAX_PENDING,
+        "in_flight": _in_flight,
+        "rejected": _rejected,
+    }
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
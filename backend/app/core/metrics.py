@@ -0,0 +1,280 @@
+"""
+Metrics
+In-process latency histograms and counters, rendered in the Prometheus text
+format at GET /metrics, plus the per-request stage timings behind the
+Server-Timing response header.
+
+    with metrics.stage("retrieve"):       # a pipeline stage, as the request sees it
+        ...                               # (queueing and micro-batch waits included)
+
+    @metrics.timed("scorer.score_messages")  # one service call (compute only)
+    def score_messages(...): ...
+
+Every value is per process: with several gunicorn workers, each one counts its
+own requests, so scrape them individually or sum in Prometheus.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+# Seconds; spans a cache hit (sub-ms) to a long beam search
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value not in (float("inf"), float("-inf")) else ("+Inf" if value > 0 else "-Inf")
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_fmt(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, +Inf count, sum)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        with self._lock:
+            for labels, (counts, total, sum_) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(names, labels + (_fmt(bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {total}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_fmt(sum_)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {total}")
+        return lines
+
+
+class Gauge:
+    """
+    Read at scrape time from `collect()`, which returns {label values: value}.
+    kind="counter" exposes a running total that a service already keeps (e.g. cache hits).
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]], kind: str = "gauge"):
+        self.name, self.help, self.label_names, self.collect, self.kind = name, help, tuple(labels), collect, kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.collect()
+        except Exception as e:
+            return lines + [f"# collect failed: {e}"]
+        for labels, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_fmt(value)}")
+        return lines
+
+
+_registry: List = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# --- CORE METRICS ---
+
+STAGE_SECONDS = register(Histogram(
+    "empathy_stage_seconds", "Time a request spends in each pipeline stage, waits included.", ["stage"]))
+STAGE_ERRORS = register(Counter(
+    "empathy_stage_errors_total", "Pipeline stages that raised.", ["stage"]))
+CALL_SECONDS = register(Histogram(
+    "empathy_call_seconds", "Duration of one service call (a whole micro-batch for model calls).", ["function"]))
+CALL_ERRORS = register(Counter(
+    "empathy_call_errors_total", "Service calls that raised.", ["function"]))
+FALLBACKS = register(Counter(
+    "empathy_model_fallbacks_total", "Outputs produced without the model (weights missing or failed to load).", ["model"]))
+HTTP_SECONDS = register(Histogram(
+    "empathy_http_request_seconds", "HTTP request latency until the response headers are sent.", ["method", "route"]))
+HTTP_REQUESTS = register(Counter(
+    "empathy_http_requests_total", "HTTP requests by final status.", ["method", "route", "status"]))
+
+
+# --- PER-REQUEST TIMINGS (Server-Timing) ---
+
+# stage -> seconds for the current request; None outside a request
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def start_request() -> Tuple[Dict[str, float], contextvars.Token]:
+    timings: Dict[str, float] = {}
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def detached() -> contextvars.Context:
+    """A copy of the current context outside any request, for work that outlives it (write-behind)."""
+    context = contextvars.copy_context()
+    context.run(_request_timings.set, None)
+    return context
+
+
+def server_timing(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    """Server-Timing header value, durations in ms: "embed;dur=3.1, rewrite;dur=240.0, total;dur=251.7"."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def stage(name: str):
+    """Time one pipeline stage into STAGE_SECONDS and the current request's Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        if not isinstance(e, asyncio.CancelledError):
+            STAGE_ERRORS.inc(name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        timings = _request_timings.get()
+        if timings is not None:
+            # A stage can run more than once per request (e.g. one rewrite per profile in a batch)
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def timed(name: str):
+    """Decorator: time every call of a sync or async function into CALL_SECONDS / CALL_ERRORS."""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception:
+                    CALL_ERRORS.inc(name)
+                    raise
+                finally:
+                    CALL_SECONDS.observe(time.perf_counter() - start, name)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                CALL_ERRORS.inc(name)
+                raise
+            finally:
+                CALL_SECONDS.observe(time.perf_counter() - start, name)
+        return wrapper
+    return decorate
+
+
+# --- HTTP ---
+
+class TimingMiddleware:
+    """
+    ASGI middleware: per-request latency / status by route, and the Server-Timing
+    header built from the stages the request ran through.
+
+    Timing stops when the response headers go out, so for /analyze/stream it
+    covers time to first byte, and its stages can't be listed in the header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        timings, token = start_request()
+        started = False
+
+        def record(status: int) -> float:
+            elapsed = time.perf_counter() - start
+            # No route takes path parameters, so matched paths are a small fixed set;
+            # everything else (404s, scanners) shares one label
+            route = scope["path"] if scope.get("route") is not None else "unmatched"
+            HTTP_SECONDS.observe(elapsed, scope["method"], route)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
+            return elapsed
+
+        async def send_with_timing(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                elapsed = record(message["status"])
+                if settings.SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(timings, elapsed).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            if not started:
+                record(500)  # the server's error handler (outside this middleware) sends the 500
+            raise
+        finally:
+            end_request(token)
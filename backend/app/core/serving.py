@@ -0,0 +1,52 @@
+"""
+Multi-Process Serving
+Helpers for running several workers without a full copy of the weights each.
+
+With gunicorn's preload_app (see backend/gunicorn_conf.py), the master process
+imports the app and loads every model once before forking. Workers inherit the
+weights through copy-on-write pages. The weights are only read, so those pages
+stay shared, and each extra worker costs its own Python heap and activations,
+not another copy of DistilBERT, T5 and MiniLM.
+
+The master never runs inference: torch's OpenMP pool is not fork-safe once
+started, so warm-up happens in each worker after fork (see warmup.py).
+"""
+
+import gc
+import os
+import time
+
+from app.core.config import settings
+
+
+def preload_models():
+    """Load all model weights in the current (pre-fork) process."""
+    import torch
+    from app.services import embeddings, rewriter, scorer
+
+    # Keep the master single-threaded so no OpenMP pool exists to be inherited by fork
+    torch.set_num_threads(1)
+    start = time.perf_counter()
+    embeddings.get_model()
+    scorer.get_model()
+    rewriter.get_model()
+    # Move everything allocated so far out of the GC's generations: collections in
+    # the workers then never touch (and so never copy) these objects' pages.
+    gc.freeze()
+    print(f"📦 Preloaded models for forked workers in {time.perf_counter() - start:.1f}s")
+
+
+def torch_threads(workers: int = 1) -> int:
+    """TORCH_NUM_THREADS, or an even split of the cores across `workers` processes."""
+    if settings.TORCH_NUM_THREADS > 0:
+        return settings.TORCH_NUM_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def configure_torch_threads(workers: int = 1):
+    """Cap intra-op threads so N workers don't oversubscribe the cores."""
+    import torch
+
+    threads = torch_threads(workers)
+    torch.set_num_threads(threads)
+    return threads
@@ -0,0 +1,152 @@
+"""
+ChromaDB Backend
+The original message store: a Chroma PersistentClient collection (squared L2).
+
+With `shard_by_conversation`, each conversation gets its own collection
+(`messages_c<id>`), so a conversation-scoped query only touches that
+conversation's index. Messages without a conversation stay in `messages`.
+A query without a conversation (sender or global scope) searches every
+collection and merges the nearest.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.db.vector_backend import VectorBackend, ContextFilter, Hit
+
+COLLECTION_NAME = "messages"
+
+
+def _where(f: Optional[ContextFilter], sharded: bool) -> Optional[Dict[str, Any]]:
+    if f is None:
+        return None
+    clauses = []
+    # In sharded mode the collection itself already scopes the conversation
+    if f.conversation_id is not None and not sharded:
+        clauses.append({"conversation_id": {"$eq": f.conversation_id}})
+    if f.sender is not None:
+        clauses.append({"sender": {"$eq": f.sender}})
+    if f.min_timestamp is not None:
+        clauses.append({"timestamp": {"$gte": f.min_timestamp}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, persist_dir: str, shard_by_conversation: bool = False):
+        # Imported here so the local backend never pays for chromadb's import
+        import chromadb
+
+        # PersistentClient saves data to disk automatically
+        self._client = chromadb.PersistentClient(path=persist_dir)
+        self.collection = self._client.get_or_create_collection(name=COLLECTION_NAME)
+        self.shard_by_conversation = shard_by_conversation
+        self._shards = {COLLECTION_NAME: self.collection}
+
+    def _collection_for(self, conversation_id: Optional[int]):
+        if not self.shard_by_conversation or not conversation_id:
+            return self.collection
+        name = f"{COLLECTION_NAME}_c{conversation_id}"
+        if name not in self._shards:
+            self._shards[name] = self._client.get_or_create_collection(name=name)
+        return self._shards[name]
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        # One upsert per target collection (a single one unless sharded)
+        groups = defaultdict(list)
+        for row in zip(ids, documents, embeddings, metadatas):
+            groups[(row[3] or {}).get("conversation_id") if self.shard_by_conversation else None].append(row)
+
+        for conversation_id, rows in groups.items():
+            g_ids, g_docs, g_embs, g_metas = zip(*rows)
+            self._collection_for(conversation_id).upsert(
+                ids=list(g_ids),
+                documents=list(g_docs),
+                embeddings=[np.asarray(e, dtype=np.float32).tolist() for e in g_embs],
+                metadatas=list(g_metas),
+            )
+
+    def query(self, embeddings, top_k: int, filters=None) -> List[List[Hit]]:
+        filters = filters or [None] * len(embeddings)
+        results: List[List[Hit]] = [[] for _ in embeddings]
+
+        # Chroma applies one `where` to all query embeddings, so group queries by filter
+        groups = defaultdict(list)
+        for i, f in enumerate(filters):
+            groups[f].append(i)
+
+        for f, positions in groups.items():
+            query_embeddings = [np.asarray(embeddings[i], dtype=np.float32).tolist() for i in positions]
+            if self.shard_by_conversation and (f is None or f.conversation_id is None):
+                # Not scoped to one conversation: its messages may be in any shard
+                collections = self._all_collections()
+            else:
+                collections = [self._collection_for(f.conversation_id if f else None)]
+            for coll in collections:
+                res = coll.query(
+                    query_embeddings=query_embeddings,
+                    n_results=top_k,
+                    where=_where(f, self.shard_by_conversation),
+                    include=["documents", "distances"],
+                )
+                ids = (res or {}).get("ids") or [[] for _ in positions]
+                docs = (res or {}).get("documents") or [[] for _ in positions]
+                dists = (res or {}).get("distances") or [[] for _ in positions]
+                for j, i in enumerate(positions):
+                    results[i].extend(zip(ids[j] or [], docs[j] or [], dists[j] or []))
+            if len(collections) > 1:
+                for i in positions:
+                    results[i] = sorted(results[i], key=lambda hit: hit[2])[:top_k]
+        return results
+
+    def distances(self, queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        # Chroma's default space is squared L2
+        return ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=-1)
+
+    def _all_collections(self):
+        if not self.shard_by_conversation:
+            return [self.collection]
+        # list_collections returns names in newer chromadb, objects in older releases
+        names = [c if isinstance(c, str) else c.name for c in self._client.list_collections()]
+        return [self._client.get_collection(n) for n in names if n == COLLECTION_NAME or n.startswith(f"{COLLECTION_NAME}_c")]
+
+    def count(self) -> int:
+        return sum(c.count() for c in self._all_collections())
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        # Ids don't say which shard they live in; deleting a missing id is a no-op in Chroma
+        for coll in self._all_collections():
+            coll.delete(ids=ids)
+
+    def scan(self, batch_size: int = 5000):
+        for coll in self._all_collections():
+            offset = 0
+            while True:
+                page = coll.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+                if not page["ids"]:
+                    break
+                yield list(zip(page["ids"], page["documents"], [m or {} for m in page["metadatas"]]))
+                offset += len(page["ids"])
+
+    def iter_all(self, batch_size: int = 1000):
+        """Yield (ids, documents, embeddings, metadatas) pages; used by the migration tool."""
+        for coll in self._all_collections():
+            offset = 0
+            while True:
+                page = coll.get(
+                    include=["documents", "embeddings", "metadatas"],
+                    limit=batch_size,
+                    offset=offset,
+                )
+                if not page["ids"]:
+                    break
+                yield page["ids"], page["documents"], page["embeddings"], page["metadatas"]
+                offset += len(page["ids"])
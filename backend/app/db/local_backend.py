@@ -0,0 +1,482 @@
+"""
+Local Vector Backend
+In-process message store for small-dimension embeddings (MiniLM, 384-d).
+
+- Embeddings live in one contiguous float32 matrix, memory-mapped from
+  `vectors.f32`, stored L2-normalized so cosine similarity is a dot product.
+- Ids, documents and metadata live in `rows.sqlite`, keyed by matrix row.
+- Search is exact (one vectorized matmul) until the store holds
+  LOCAL_VECTOR_ANN_THRESHOLD messages, then switches to an HNSW graph index
+  if `hnswlib` is installed.
+- conversation_id / sender / timestamp are mirrored into NumPy columns and a
+  per-conversation row partition, so a scoped query only scores that
+  conversation's rows no matter how large the global store gets.
+
+Deletes leave tombstones (rows are masked out of search); `vacuum` rewrites
+the matrix and renumbers rows once enough of them are dead.
+
+Distances are cosine distances (1 - cosine similarity).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.db.vector_backend import VectorBackend, ContextFilter, Hit
+
+try:
+    import hnswlib
+except ImportError:  # optional: exact search only
+    hnswlib = None
+
+_SQLITE_MAX_PARAMS = 900
+
+# Filtered queries whose candidate set is at most this big are always scored
+# exactly; larger ones go through the HNSW index with a filter predicate.
+EXACT_FILTER_LIMIT = 20000
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _chunks(seq, size=_SQLITE_MAX_PARAMS):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+class LocalBackend(VectorBackend):
+    name = "local"
+
+    def __init__(self, data_dir: str, ann_threshold: int = 50000,
+                 hnsw_m: int = 16, hnsw_ef_construction: int = 200, hnsw_ef: int = 64):
+        os.makedirs(data_dir, exist_ok=True)
+        self.data_dir = data_dir
+        self.ann_threshold = ann_threshold
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef = hnsw_ef
+
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(data_dir, "vectors.f32")
+        self._ann_path = os.path.join(data_dir, "hnsw.bin")
+
+        self._db = sqlite3.connect(os.path.join(data_dir, "rows.sqlite"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " idx INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE,"
+            " document TEXT NOT NULL, metadata TEXT NOT NULL,"
+            " conversation_id INTEGER, sender TEXT, timestamp REAL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(rows)")}
+        for column, sql_type in (("conversation_id", "INTEGER"), ("sender", "TEXT"), ("timestamp", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE rows ADD COLUMN {column} {sql_type}")
+
+        dim = self._get_info("dim")
+        self.dim: Optional[int] = int(dim) if dim else None
+        self._finish_vacuum()
+        self.size = self._db.execute("SELECT COALESCE(MAX(idx) + 1, 0) FROM rows").fetchone()[0]
+
+        self._vectors: Optional[np.memmap] = None
+        if self.dim is not None and os.path.exists(self._vectors_path):
+            capacity = os.path.getsize(self._vectors_path) // (self.dim * 4)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+        self._load_columns()
+
+        self._ann = None
+        self._warned_no_ann = False
+        self._load_ann()
+
+    # --- METADATA ---
+
+    def _get_info(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_info(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # --- FILTER COLUMNS ---
+
+    def _sender_code(self, sender: Optional[str]) -> int:
+        if sender is None:
+            return -1
+        if sender not in self._sender_codes:
+            self._sender_codes[sender] = len(self._sender_codes)
+        return self._sender_codes[sender]
+
+    def _grow_columns(self, rows_needed: int):
+        if rows_needed <= len(self._conv):
+            return
+        new_len = max(rows_needed, len(self._conv) * 2, 1024)
+        pad = new_len - len(self._conv)
+        self._conv = np.concatenate([self._conv, np.zeros(pad, dtype=np.int64)])
+        self._sender = np.concatenate([self._sender, np.full(pad, -1, dtype=np.int32)])
+        self._ts = np.concatenate([self._ts, np.zeros(pad, dtype=np.float64)])
+        self._alive = np.concatenate([self._alive, np.zeros(pad, dtype=bool)])
+
+    def _set_columns(self, idx: int, metadata: Dict[str, Any]):
+        conversation_id = int(metadata.get("conversation_id") or 0)
+        old = int(self._conv[idx])
+        if old != conversation_id:
+            self._partitions[old].discard(idx)
+        self._partitions[conversation_id].add(idx)
+        self._conv[idx] = conversation_id
+        sender = self._sender_code(metadata.get("sender"))
+        old = int(self._sender[idx])
+        if old != sender:
+            self._by_sender[old].discard(idx)
+        self._by_sender[sender].add(idx)
+        self._sender[idx] = sender
+        self._ts[idx] = float(metadata.get("timestamp") or 0.0)
+        self._alive[idx] = True
+
+    def _load_columns(self):
+        # Filter columns, parallel to the matrix rows
+        self._conv = np.zeros(0, dtype=np.int64)
+        self._sender = np.zeros(0, dtype=np.int32)
+        self._ts = np.zeros(0, dtype=np.float64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._sender_codes: Dict[str, int] = {}
+        self._partitions: Dict[int, Set[int]] = defaultdict(set)
+        self._by_sender: Dict[int, Set[int]] = defaultdict(set)  # sender code -> rows, for sender-only scopes
+
+        self._grow_columns(self.size)
+        live = 0
+        for idx, conversation_id, sender, ts in self._db.execute(
+            "SELECT idx, conversation_id, sender, timestamp FROM rows"
+        ):
+            self._set_columns(idx, {"conversation_id": conversation_id, "sender": sender, "timestamp": ts})
+            live += 1
+        self.dead = self.size - live
+
+    def _candidates(self, f: Optional[ContextFilter]) -> Optional[np.ndarray]:
+        """
+        Live row indices that satisfy the filter, starting from the smaller of the
+        conversation partition and the sender's rows. None means "every row" and lets
+        the caller take the unfiltered fast path. A recency-only filter has no index
+        and still scans every row.
+        """
+        if f is None:
+            # The HNSW index already skips deleted labels
+            if self.dead == 0 or self._ann is not None:
+                return None
+            return np.flatnonzero(self._alive[:self.size])
+        sender = self._sender_codes.get(f.sender, -2) if f.sender is not None else None
+        conversation = self._partitions.get(int(f.conversation_id), ()) if f.conversation_id is not None else None
+        by_sender = self._by_sender.get(sender, ()) if sender is not None else None
+        if conversation is not None and (by_sender is None or len(conversation) <= len(by_sender)):
+            rows = np.fromiter(conversation, dtype=np.int64, count=len(conversation))
+            if sender is not None:
+                rows = rows[self._sender[rows] == sender]
+        elif by_sender is not None:
+            rows = np.fromiter(by_sender, dtype=np.int64, count=len(by_sender))
+            if conversation is not None:
+                rows = rows[self._conv[rows] == int(f.conversation_id)]
+        else:
+            rows = np.flatnonzero(self._alive[:self.size])
+        if f.min_timestamp is not None:
+            rows = rows[self._ts[rows] >= f.min_timestamp]
+        return rows
+
+    # --- MATRIX STORAGE ---
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _reserve(self, rows_needed: int):
+        """Grow the memory-mapped matrix geometrically so appends stay amortized O(1)."""
+        if rows_needed <= self.capacity:
+            return
+        new_capacity = max(rows_needed, self.capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "a+b") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim))
+
+    def _lookup_idx(self, ids: List[str]) -> Dict[str, int]:
+        found = {}
+        for chunk in _chunks(ids):
+            marks = ",".join("?" * len(chunk))
+            for idx, mid in self._db.execute(f"SELECT idx, id FROM rows WHERE id IN ({marks})", chunk):
+                found[mid] = idx
+        return found
+
+    def _documents(self, idxs: List[int]) -> Dict[int, tuple]:
+        out = {}
+        for chunk in _chunks(idxs):
+            marks = ",".join("?" * len(chunk))
+            for idx, mid, doc in self._db.execute(f"SELECT idx, id, document FROM rows WHERE idx IN ({marks})", chunk):
+                out[idx] = (mid, doc)
+        return out
+
+    # --- VectorBackend API ---
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        if not ids:
+            return
+        vecs = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                self._set_info("dim", self.dim)
+            elif vecs.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {vecs.shape[1]} does not match store dim {self.dim}")
+
+            # Existing ids are overwritten in place; new ids append at the end
+            existing = self._lookup_idx(list(ids))
+            rows = []
+            next_idx = self.size
+            for mid in ids:
+                if mid not in existing:
+                    existing[mid] = next_idx
+                    next_idx += 1
+                rows.append(existing[mid])
+
+            self._reserve(next_idx)
+            row_idx = np.asarray(rows, dtype=np.int64)
+            self._vectors[row_idx] = vecs
+            self._vectors.flush()
+
+            metadatas = [meta or {} for meta in metadatas]
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rows (idx, id, document, metadata, conversation_id, sender, timestamp)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (idx, mid, doc, json.dumps(meta), meta.get("conversation_id"), meta.get("sender"), meta.get("timestamp"))
+                    for idx, mid, doc, meta in zip(rows, ids, documents, metadatas)
+                ],
+            )
+            self._db.execute("COMMIT")
+            self.size = next_idx
+
+            self._grow_columns(next_idx)
+            for idx, meta in zip(rows, metadatas):
+                self._set_columns(idx, meta)
+
+            if self._ann is not None:
+                self._ann_add(vecs, row_idx)
+            elif self.count() >= self.ann_threshold:
+                self._build_ann()
+
+    def query(self, embeddings, top_k: int, filters=None) -> List[List[Hit]]:
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        filters = filters or [None] * len(queries)
+        labels: List[np.ndarray] = [np.zeros(0, dtype=np.int64)] * len(queries)
+        dists: List[np.ndarray] = [np.zeros(0, dtype=np.float32)] * len(queries)
+
+        with self._lock:
+            if self.count() == 0 or top_k <= 0:
+                return [[] for _ in range(len(queries))]
+
+            # Queries sharing a filter share one candidate set and one matmul
+            groups = defaultdict(list)
+            for i, f in enumerate(filters):
+                groups[f].append(i)
+
+            for f, positions in groups.items():
+                cands = self._candidates(f)
+                if cands is not None and len(cands) == 0:
+                    continue
+                found = self._search(queries[positions], top_k, cands)
+                for i, (lab, dist) in zip(positions, zip(*found)):
+                    labels[i], dists[i] = lab, dist
+
+            docs = self._documents(sorted({int(i) for row in labels for i in row}))
+
+        results = []
+        for row_labels, row_dists in zip(labels, dists):
+            hits = []
+            for idx, dist in zip(np.asarray(row_labels).tolist(), np.asarray(row_dists).tolist()):
+                if idx in docs:
+                    mid, doc = docs[idx]
+                    hits.append((mid, doc, float(dist)))
+            results.append(hits)
+        return results
+
+    def _search(self, queries: np.ndarray, top_k: int, candidates: Optional[np.ndarray]):
+        """(labels, distances) arrays of shape (len(queries), k) over all rows or `candidates`."""
+        pool = self.count() if candidates is None else len(candidates)
+        k = min(top_k, pool)
+
+        if self._ann is not None and (candidates is None or pool > EXACT_FILTER_LIMIT):
+            if candidates is None:
+                return self._ann.knn_query(queries, k=k)
+            allowed = np.zeros(self.size, dtype=bool)
+            allowed[candidates] = True
+            return self._ann.knn_query(queries, k=k, filter=lambda label: bool(allowed[label]))
+
+        # Exact search: one (queries x pool) matmul, then a partial sort per row
+        matrix = self._vectors[:self.size] if candidates is None else self._vectors[candidates]
+        sims = queries @ matrix.T
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_sims, axis=1)
+        best = np.take_along_axis(part, order, axis=1)
+        labels = best if candidates is None else candidates[best]
+        return labels, 1.0 - np.take_along_axis(part_sims, order, axis=1)
+
+    def distances(self, queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        return 1.0 - _normalize(queries) @ _normalize(vectors).T
+
+    def count(self) -> int:
+        return self.size - self.dead
+
+    def delete(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            found = self._lookup_idx(list(ids))
+            if not found:
+                return
+            self._db.execute("BEGIN")
+            for chunk in _chunks(list(found)):
+                self._db.execute(f"DELETE FROM rows WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            self._db.execute("COMMIT")
+
+            for idx in found.values():
+                self._alive[idx] = False
+                self._partitions[int(self._conv[idx])].discard(idx)
+                self._by_sender[int(self._sender[idx])].discard(idx)
+                if self._ann is not None:
+                    self._ann.mark_deleted(idx)
+            self.dead += len(found)
+
+    def scan(self, batch_size: int = 5000):
+        # Keyset pagination on idx so the scan stays O(n) overall
+        last = -1
+        while True:
+            page = self._db.execute(
+                "SELECT idx, id, document, conversation_id, sender, timestamp FROM rows"
+                " WHERE idx > ? ORDER BY idx LIMIT ?",
+                (last, batch_size),
+            ).fetchall()
+            if not page:
+                return
+            last = page[-1][0]
+            yield [
+                (mid, doc, {"conversation_id": conversation_id or 0, "sender": sender, "timestamp": ts or 0.0})
+                for _, mid, doc, conversation_id, sender, ts in page
+            ]
+
+    def vacuum(self, min_dead_fraction: float = 0.25) -> bool:
+        """
+        Reclaim tombstoned rows once they are `min_dead_fraction` of the matrix:
+        copy live vectors into a fresh file, renumber rows, rebuild the indexes.
+        """
+        with self._lock:
+            if self.size == 0 or self.dead / self.size < min_dead_fraction:
+                return False
+            keep = np.flatnonzero(self._alive[:self.size])
+            tmp_path = self._vectors_path + ".tmp"
+
+            # 1. New matrix, copied in chunks so memory stays bounded
+            capacity = max(len(keep), 1024)
+            with open(tmp_path, "wb") as f:
+                f.truncate(capacity * self.dim * 4)
+            fresh = np.memmap(tmp_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+            for start in range(0, len(keep), 65536):
+                chunk = keep[start:start + 65536]
+                fresh[start:start + len(chunk)] = self._vectors[chunk]
+            fresh.flush()
+            del fresh
+
+            # 2. Renumber rows. keep is ascending and new <= old, so ascending updates never collide.
+            # The pending flag lets a restart finish the file swap if we crash after commit.
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE rows SET idx = ? WHERE idx = ?",
+                [(new, int(old)) for new, old in enumerate(keep) if new != old],
+            )
+            self._set_info("pending_vacuum", tmp_path)
+            self._db.execute("DELETE FROM info WHERE key IN ('ann_size', 'ann_dead')")
+            self._db.execute("COMMIT")
+
+            self._vectors = None
+            self._finish_vacuum()
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+            # 3. Rebuild in-memory columns and the graph index over the new numbering
+            reclaimed = self.dead
+            self.size = len(keep)
+            self._load_columns()
+            if self._ann is not None:
+                self._ann = None
+                if os.path.exists(self._ann_path):
+                    os.remove(self._ann_path)
+                if self.size >= self.ann_threshold:
+                    self._build_ann()
+            print(f"🧹 Vacuumed local vector store: reclaimed {reclaimed} rows, {self.size} live")
+            return True
+
+    def compact_storage(self) -> bool:
+        return self.vacuum()
+
+    def _finish_vacuum(self):
+        pending = self._get_info("pending_vacuum")
+        if pending:
+            if os.path.exists(pending):
+                os.replace(pending, self._vectors_path)
+            self._db.execute("DELETE FROM info WHERE key = 'pending_vacuum'")
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._ann is not None:
+                self._ann.save_index(self._ann_path)
+                self._set_info("ann_size", self.size)
+                self._set_info("ann_dead", self.dead)
+            self._db.close()
+
+    # --- APPROXIMATE INDEX ---
+
+    def _load_ann(self):
+        if hnswlib is None or self.count() < self.ann_threshold:
+            return
+        saved = self._get_info("ann_size")
+        saved_dead = int(self._get_info("ann_dead") or 0)
+        if saved and int(saved) == self.size and saved_dead == self.dead and os.path.exists(self._ann_path):
+            index = hnswlib.Index(space="cosine", dim=self.dim)
+            index.load_index(self._ann_path, max_elements=max(self.size * 2, 1024))
+            index.set_ef(self.hnsw_ef)
+            self._ann = index
+        else:
+            # Stale or missing on disk: rebuild from the matrix
+            self._build_ann()
+
+    def _build_ann(self):
+        if hnswlib is None:
+            if not self._warned_no_ann:
+                print(f"⚠️ {self.count()} vectors stored but hnswlib is not installed; staying on exact search.")
+                self._warned_no_ann = True
+            return
+        live = np.flatnonzero(self._alive[:self.size])
+        print(f"🕸️ Building HNSW index over {len(live)} vectors...")
+        index = hnswlib.Index(space="cosine", dim=self.dim)
+        index.init_index(max_elements=max(self.size * 2, 1024), ef_construction=self.hnsw_ef_construction, M=self.hnsw_m)
+        index.add_items(np.asarray(self._vectors[live]), live)
+        index.set_ef(self.hnsw_ef)
+        self._ann = index
+
+    def _ann_add(self, vecs: np.ndarray, labels: np.ndarray):
+        needed = int(labels.max()) + 1
+        if needed > self._ann.get_max_elements():
+            self._ann.resize_index(max(needed, self._ann.get_max_elements() * 2))
+        # Re-adding an existing label replaces its vector
+        self._ann.add_items(vecs, labels)
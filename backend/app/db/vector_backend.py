@@ -0,0 +1,73 @@
+"""
+Vector Backend Interface
+Storage engines behind app.services.vectorstore implement this contract.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# (id, document, distance) for one hit; lower distance = more similar
+Hit = Tuple[str, str, float]
+
+
+@dataclass(frozen=True)
+class ContextFilter:
+    """
+    Restricts retrieval to one conversation and/or sender, optionally only
+    messages newer than `min_timestamp` (unix seconds). None = no constraint.
+    """
+    conversation_id: Optional[int] = None
+    sender: Optional[str] = None
+    min_timestamp: Optional[float] = None
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        metadata = metadata or {}
+        if self.conversation_id is not None and metadata.get("conversation_id") != self.conversation_id:
+            return False
+        if self.sender is not None and metadata.get("sender") != self.sender:
+            return False
+        if self.min_timestamp is not None and metadata.get("timestamp", float("-inf")) < self.min_timestamp:
+            return False
+        return True
+
+
+class VectorBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def upsert(self, ids: List[str], documents: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
+        """Insert or replace messages in bulk."""
+
+    @abstractmethod
+    def query(self, embeddings: List[List[float]], top_k: int,
+              filters: Optional[List[Optional[ContextFilter]]] = None) -> List[List[Hit]]:
+        """Nearest neighbours per query embedding, best first. `filters` mirrors `embeddings`."""
+
+    @abstractmethod
+    def distances(self, queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """
+        Pairwise distances (queries x vectors) in the same metric `query` reports,
+        so results from outside the backend (e.g. the write buffer) can be merged.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored messages."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Remove messages by id; unknown ids are ignored."""
+
+    @abstractmethod
+    def scan(self, batch_size: int = 5000) -> Iterator[List[Tuple[str, str, Dict[str, Any]]]]:
+        """Yield pages of (id, document, metadata) over every stored message."""
+
+    def compact_storage(self) -> bool:
+        """Reclaim space left by deletes, if the engine needs it. Returns True if work was done."""
+        return False
+
+    def close(self):
+        """Release files / handles."""
@@ -1,9 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api import routes
+from app.core import executor, metrics, serving
+from app.services import analysis_store, batching, cache, embedding_cache, feedback, pipeline, vectorstore, retention, warmup
 
-app = FastAPI(title=settings.PROJECT_NAME)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.TORCH_NUM_THREADS > 0:
+        serving.configure_torch_threads()
+    # Load all models concurrently so the first request doesn't pay for it (see /readyz)
+    warmup_task = warmup.start()
+    # Periodic retention pass over the message store (deletes in bulk, then compacts)
+    retention_task = retention.start()
+    # Replay feedback logged since the last stats checkpoint
+    await executor.run_blocking(feedback.get_stats)
+    yield
+    for task in (warmup_task, retention_task):
+        if task is not None:
+            task.cancel()
+    # A retention pass already running finishes on its own thread
+    await executor.run_blocking(retention.shutdown)
+    # Let write-behind upserts land before tearing down the workers they run on
+    await pipeline.drain()
+    # Flush buffered messages to the vector store in one final bulk upsert
+    await executor.run_blocking(vectorstore.flush)
+    # Stop the micro-batching workers so no request is left waiting on a future
+    await batching.shutdown()
+    # Close this worker's feedback segment and checkpoint the feedback stats
+    await feedback.shutdown()
+    await analysis_store.shutdown()
+    executor.shutdown()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # Enable CORS for frontend communication
 app.add_middleware(
@@ -13,7 +46,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow POST, GET, OPTIONS
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Added last so it wraps CORS too and times the whole request
+app.add_middleware(metrics.TimingMiddleware)
 
 # Include the routes
 # app.include_router(router, prefix=settings.API_V1_STR)
@@ -23,6 +59,47 @@ app.include_router(routes.router, prefix="/api/v1")
 def root():
     return {"message": "Empathy Engine Backend is Running"}
 
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving (models may still be loading)."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 only once every model is loaded and warmed, with per-model load times."""
+    status = warmup.get_status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Service state read at scrape time (the same numbers as the /stats endpoints)
+metrics.register(metrics.Gauge(
+    "empathy_inference_in_flight", "Requests holding an inference pool slot.", [],
+    lambda: {(): executor.get_stats()["in_flight"]}))
+metrics.register(metrics.Gauge(
+    "empathy_inference_rejected_total", "Requests turned away with 503 because the pool was full.", [],
+    lambda: {(): executor.get_stats()["rejected"]}, kind="counter"))
+metrics.register(metrics.Gauge(
+    "empathy_batch_queue_depth", "Items waiting for the next micro-batch.", ["batcher"],
+    lambda: {(name,): s["queue_depth"] for name, s in batching.get_stats().items()}))
+metrics.register(metrics.Gauge(
+    "empathy_cache_lookups_total", "Result cache lookups by namespace and outcome.", ["namespace", "outcome"],
+    lambda: {(ns, outcome): n for ns, counts in cache.get_stats()["namespaces"].items() for outcome, n in counts.items()},
+    kind="counter"))
+metrics.register(metrics.Gauge(
+    "empathy_embedding_cache_lookups_total", "Embedding cache lookups by outcome.", ["outcome"],
+    lambda: {(outcome,): embedding_cache.get_stats()[outcome] for outcome in ("hits", "disk_hits", "misses")},
+    kind="counter"))
+metrics.register(metrics.Gauge(
+    "empathy_vector_write_buffer_depth", "Messages buffered for the next vector store upsert.", [],
+    lambda: {(): vectorstore.get_buffer_stats()["buffer_depth"]}))
+metrics.register(metrics.Gauge(
+    "empathy_model_ready", "1 once a model is loaded and warmed, by model.", ["model"],
+    lambda: {(name,): float(state["status"] == "ready") for name, state in warmup.get_status()["models"].items()}))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
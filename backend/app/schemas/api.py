@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict, Any, Literal, Union
 
 # --- INPUTS ---
 class ProcessRequest(BaseModel):
@@ -8,6 +8,15 @@ class ProcessRequest(BaseModel):
     text: str
     target_style: str = "gentle"
     style: str = "Diplomat"  # Persona style: Diplomat, Gen Z, Executive, Victorian
+    # T5 decoding profile; None uses REWRITE_DEFAULT_PROFILE
+    profile: Optional[Literal["quality", "balanced", "fast", "sample"]] = None
+    # Return issues as offsets + codes (see CompactIssue) instead of full Issue objects
+    compact_issues: bool = False
+
+
+class BatchProcessRequest(BaseModel):
+    """Many messages analyzed in one call (e.g. backfilling a chat export)"""
+    messages: List[ProcessRequest] = Field(..., min_length=1)
 
 
 # --- OUTPUT COMPONENTS ---
@@ -15,6 +24,20 @@ class Issue(BaseModel):
     span: str
     issue: str
     explanation: Optional[str] = None
+    # Character offsets into original_text, end exclusive (0..len for whole-text issues)
+    start: int
+    end: int
+    code: str  # stable category id, e.g. "personal_attack", "shouting"
+
+class CompactIssue(BaseModel):
+    """An Issue without its strings: the span is original_text[start:end], the rest is in issue_legend[code]"""
+    start: int
+    end: int
+    code: str
+
+class IssueType(BaseModel):
+    issue: str
+    explanation: Optional[str] = None
 
 class EmpathyScores(BaseModel):
     perspective_taking: float
@@ -37,8 +60,10 @@ class ProcessResponse(BaseModel):
     original_text: str
     retrieved_context: List[str] # Simplified for frontend display
     empathy_scores: EmpathyScores
-    issues: List[Issue]
+    issues: List[Union[Issue, CompactIssue]]
+    issue_legend: Optional[Dict[str, IssueType]] = None  # code -> category, only with compact_issues
     rewrites: List[RewriteOption]
+    rewrite_skipped: bool = False  # True when the message was already empathetic and T5 didn't run
 
 
 # --- FEEDBACK (RLHF) ---
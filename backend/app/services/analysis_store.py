@@ -0,0 +1,178 @@
+"""
+Analysis Store
+Every analysis result (original text, base T5 rewrite, style, scores, issues and
+the model versions that produced them) in a sqlite table keyed by message_id
+(data/analyses.sqlite, or ANALYSIS_STORE_PATH). Feedback only carries a
+message_id; this is what it is joined against to build a training set
+(scripts/export_training_data.py).
+
+Rows are written behind the response, batched through a micro-batcher so a
+burst of requests costs one transaction, on a thread of their own so they never
+queue behind model calls on the inference pool. The database runs in WAL mode, so the
+export can read while the API writes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.executor import DedicatedThread
+from app.schemas.api import ProcessRequest, ProcessResponse
+from app.services import issue_detector, rewriter, scorer
+from app.services.batching import MicroBatcher
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "analyses.sqlite")
+_SQLITE_MAX_PARAMS = 900
+
+SCORE_FIELDS = ("perspective_taking", "validation", "warmth", "non_judgmental", "supportiveness")
+COLUMNS = (
+    "message_id", "created_at", "conversation_id", "sender", "original_text",
+    "base_rewrite", "rewrite_skipped", "style", "styled_rewrite", "profile",
+    *SCORE_FIELDS, "issues", "scorer_version", "rewriter_version", "rules_version",
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS analyses (
+    message_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    conversation_id INTEGER,
+    sender TEXT,
+    original_text TEXT NOT NULL,
+    base_rewrite TEXT,          -- T5 output before style transfer; NULL when skipped
+    rewrite_skipped INTEGER NOT NULL,
+    style TEXT,
+    styled_rewrite TEXT,
+    profile TEXT,
+    {", ".join(f"{f} REAL" for f in SCORE_FIELDS)},
+    issues TEXT,                -- JSON [[start, end, code], ...]
+    scorer_version TEXT,
+    rewriter_version TEXT,
+    rules_version TEXT
+)
+"""
+
+
+class AnalysisStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_created_at ON analyses (created_at)")
+        self._lock = threading.Lock()
+        self.rows_written = 0
+
+    def put_many(self, rows: Sequence[Dict[str, Any]]) -> List[None]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO analyses ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                ([row.get(c) for c in COLUMNS] for row in rows),
+            )
+            self._conn.execute("COMMIT")
+            self.rows_written += len(rows)
+        return [None] * len(rows)
+
+    def get_many(self, message_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for i in range(0, len(message_ids), _SQLITE_MAX_PARAMS):
+                chunk = list(message_ids[i:i + _SQLITE_MAX_PARAMS])
+                cursor = self._conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM analyses WHERE message_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for values in cursor:
+                    found[values[0]] = dict(zip(COLUMNS, values))
+        return found
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Pages of rows in insertion order (keyset pagination on rowid)."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT rowid, {', '.join(COLUMNS)} FROM analyses WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [dict(zip(COLUMNS, r[1:])) for r in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def analysis_row(request: ProcessRequest, response: ProcessResponse, base_rewrite: Optional[str]) -> Dict[str, Any]:
+    profile = request.profile or settings.REWRITE_DEFAULT_PROFILE
+    scores = response.empathy_scores
+    return {
+        "message_id": response.message_id,
+        "created_at": time.time(),
+        "conversation_id": request.conversation_id,
+        "sender": request.sender,
+        "original_text": request.text,
+        "base_rewrite": base_rewrite,
+        "rewrite_skipped": int(response.rewrite_skipped),
+        "style": request.style,
+        "styled_rewrite": response.rewrites[0].text if response.rewrites else None,
+        "profile": profile,
+        **{f: getattr(scores, f) for f in SCORE_FIELDS},
+        "issues": json.dumps([[i.start, i.end, i.code] for i in response.issues]),
+        "scorer_version": scorer.get_model_version(),
+        "rewriter_version": rewriter.get_profile_version(profile),
+        "rules_version": issue_detector.RULES_VERSION,
+    }
+
+
+_store: Optional[AnalysisStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> AnalysisStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AnalysisStore(settings.ANALYSIS_STORE_PATH or DEFAULT_PATH)
+    return _store
+
+
+def _put_batch(rows: List[Dict[str, Any]]) -> List[None]:
+    return get_store().put_many(rows)
+
+
+writer_thread = DedicatedThread("analysis-store")
+
+store_batcher = MicroBatcher(
+    "analysis_store", _put_batch,
+    max_batch_size=settings.ANALYSIS_STORE_BATCH_MAX_SIZE,
+    max_wait_ms=settings.ANALYSIS_STORE_BATCH_MAX_WAIT_MS,
+    run=writer_thread.run,
+)
+
+
+async def submit(row: Dict[str, Any]):
+    await store_batcher.submit(row)
+
+
+async def shutdown():
+    """Stop the writer (after pipeline.drain()) and close the database."""
+    global _store
+    await store_batcher.stop()
+    if _store is not None:
+        await writer_thread.run(_store.close)
+        _store = None
+    writer_thread.shutdown()
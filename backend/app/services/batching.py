@@ -0,0 +1,181 @@
+"""
+Dynamic Micro-Batching
+Coalesces concurrent single-message inference calls into padded batches.
+
+Callers `await batcher.submit(item)`; a background worker gathers queued items
+until MAX_SIZE is reached or MAX_WAIT_MS has passed since the first one arrived,
+runs one batched call for all of them, and resolves each caller's future.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.executor import run_blocking
+from app.services import scorer, rewriter
+
+
+class MicroBatcher:
+    def __init__(self, name: str, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int, max_wait_ms: float,
+                 run: Callable[..., Awaitable[Any]] = run_blocking):
+        """`run` awaits batch_fn off the event loop: the inference pool unless it's I/O with its own thread."""
+        self.name = name
+        self.batch_fn = batch_fn
+        self.run = run
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # --- METRICS ---
+        self.batches_run = 0
+        self.items_processed = 0
+        self.batch_size_histogram: Dict[int, int] = {}
+        self.max_wait_seen_ms = 0.0
+        self._recent_waits_ms = deque(maxlen=1024)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its slot in the next batch."""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            # Started by whichever request comes first, but it serves them all
+            self._task = metrics.detached().run(asyncio.create_task, self._worker(), name=f"batcher-{self.name}")
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # 1. Block until the first item arrives, then open the batching window
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # 2. Keep gathering until the batch is full or the window closes
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Drop callers that gave up (e.g. client disconnected) before we spend compute on them
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            self._record_batch(batch)
+
+            # 3. Run one batched call (on the inference pool by default) and fan results back out
+            items = [item for item, _, _ in batch]
+            try:
+                results = await self.run(self.batch_fn, items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record_batch(self, batch):
+        now = time.perf_counter()
+        size = len(batch)
+        self.batches_run += 1
+        self.items_processed += size
+        self.batch_size_histogram[size] = self.batch_size_histogram.get(size, 0) + 1
+        for _, _, enqueued_at in batch:
+            wait_ms = (now - enqueued_at) * 1000
+            self._recent_waits_ms.append(wait_ms)
+            self.max_wait_seen_ms = max(self.max_wait_seen_ms, wait_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._recent_waits_ms)
+
+        def pct(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3) if waits else 0.0
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batches_run": self.batches_run,
+            "items_processed": self.items_processed,
+            "avg_batch_size": round(self.items_processed / self.batches_run, 3) if self.batches_run else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "wait_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": round(self.max_wait_seen_ms, 3)},
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Fail anything still waiting so callers don't hang on shutdown
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} batcher stopped"))
+
+
+def _score_batch(items):
+    texts, contexts = zip(*items)
+    return scorer.score_messages(list(texts), list(contexts))
+
+
+def _rewrite_batch(items):
+    # One generate call per decoding profile present in the batch
+    groups: Dict[Optional[str], List[int]] = {}
+    for i, (_, profile) in enumerate(items):
+        groups.setdefault(profile, []).append(i)
+    results: List[Any] = [None] * len(items)
+    for profile, positions in groups.items():
+        outputs = rewriter.generate_rewrites([items[i][0] for i in positions], profile=profile)
+        for i, out in zip(positions, outputs):
+            results[i] = out
+    return results
+
+
+scorer_batcher = MicroBatcher(
+    "scorer", _score_batch,
+    max_batch_size=settings.SCORER_BATCH_MAX_SIZE,
+    max_wait_ms=settings.SCORER_BATCH_MAX_WAIT_MS,
+)
+
+rewriter_batcher = MicroBatcher(
+    "rewriter", _rewrite_batch,
+    max_batch_size=settings.REWRITER_BATCH_MAX_SIZE,
+    max_wait_ms=settings.REWRITER_BATCH_MAX_WAIT_MS,
+)
+
+
+async def score(text: str, context: List[str]):
+    return await scorer_batcher.submit((text, context))
+
+
+async def rewrite(text: str, profile: Optional[str] = None) -> str:
+    return await rewriter_batcher.submit((text, profile))
+
+
+def get_stats() -> Dict[str, Any]:
+    return {b.name: b.stats() for b in (scorer_batcher, rewriter_batcher)}
+
+
+async def shutdown():
+    for b in (scorer_batcher, rewriter_batcher):
+        await b.stop()
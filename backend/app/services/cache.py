@@ -0,0 +1,234 @@
+"""
+Result Cache
+Content-addressed cache for the expensive /analyze stages.
+
+Each stage (scores, base rewrite) is cached separately under its own
+namespace, keyed by a hash of the normalized text and the version of the
+model that produced it. Style transfer is cheap and never cached, so changing
+only `style` reuses the T5 output. Issue detection isn't cached either: its
+offsets index the exact text, which normalization would lose.
+
+Tier 1 is an in-memory LRU with TTL; tier 2 is an optional sqlite file that
+survives restarts. Values must be JSON-serializable; embeddings have their own
+float32 cache (embedding_cache.py).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.executor import run_blocking
+
+_MISSING = object()
+
+
+def normalize_text(text: str) -> str:
+    # Keep case: it matters for shouting detection and for the models
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(namespace: str, text: str, version: str) -> str:
+    raw = f"{namespace}\x1f{version}\x1f{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                self.expirations += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DiskCache:
+    """sqlite-backed second tier; expired rows are purged lazily."""
+
+    PURGE_EVERY = 500  # writes between expired-row sweeps
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else _MISSING
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl_seconds),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    def __init__(self):
+        self.memory = LRUCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+        self.disk = DiskCache(settings.CACHE_DISK_PATH, settings.CACHE_TTL_SECONDS) if settings.CACHE_DISK_PATH else None
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, outcome: str):
+        ns = self.counters.setdefault(namespace, {"hits": 0, "disk_hits": 0, "misses": 0})
+        ns[outcome] += 1
+
+    def get_memory(self, namespace: str, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not _MISSING:
+            self._count(namespace, "hits")
+        return value
+
+    def get_disk(self, namespace: str, key: str) -> Any:
+        """Second-tier lookup for a memory miss; records the final hit/miss outcome."""
+        value = self.disk.get(key) if self.disk is not None else _MISSING
+        if value is _MISSING:
+            self._count(namespace, "misses")
+        else:
+            # Promote so the next lookup stays in memory
+            self.memory.set(key, value)
+            self._count(namespace, "disk_hits")
+        return value
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.CACHE_ENABLED,
+            "memory_entries": len(self.memory),
+            "memory_max_entries": self.memory.max_entries,
+            "evictions": self.memory.evictions,
+            "expirations": self.memory.expirations,
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+            "namespaces": self.counters,
+        }
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+
+async def cached(namespace: str, text: str, version: Optional[str], compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return the cached value for (namespace, text, version) or await `compute()` and store it.
+    version=None marks a non-deterministic result (e.g. a sampled rewrite): always computed, never stored.
+    """
+    return (await cached_many(namespace, [text], version, lambda missing: _single(compute)))[0]
+
+
+async def _single(compute):
+    return [await compute()]
+
+
+async def cached_many(namespace: str, texts: List[str], version: Optional[str],
+                      compute_many: Callable[[List[str]], Awaitable[List[Any]]]) -> List[Any]:
+    """Batched lookup: only the misses are passed to `compute_many`, in order."""
+    if not settings.CACHE_ENABLED or version is None:
+        return await compute_many(texts)
+
+    cache = get_cache()
+    keys = [make_key(namespace, text, version) for text in texts]
+    values = [cache.get_memory(namespace, key) for key in keys]
+
+    missing = [i for i, value in enumerate(values) if value is _MISSING]
+    if missing:
+        # Disk lookups hit sqlite, so keep them off the event loop
+        from_disk = await run_blocking(lambda: [cache.get_disk(namespace, keys[i]) for i in missing])
+        for i, value in zip(missing, from_disk):
+            values[i] = value
+        missing = [i for i in missing if values[i] is _MISSING]
+
+    if missing:
+        computed = await compute_many([texts[i] for i in missing])
+        for i, value in zip(missing, computed):
+            values[i] = value
+        if cache.disk is None:
+            for i in missing:
+                cache.set(keys[i], values[i])
+        else:
+            await run_blocking(lambda: [cache.set(keys[i], values[i]) for i in missing])
+    return values
+
+
+def get_stats() -> Dict[str, Any]:
+    return get_cache().stats()
+
+
+def file_fingerprint(*paths: str) -> str:
+    """Cheap version tag for on-disk model weights: changes whenever a file is replaced."""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{st.st_size}-{st.st_mtime_ns}")
+        except OSError:
+            parts.append("missing")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:12]
@@ -0,0 +1,214 @@
+"""
+Embedding Cache
+MiniLM vectors keyed by a hash of the normalized text and the model name, so a
+draft that is analyzed again (or retrieved and then upserted) is encoded once.
+
+Tier 1 is an in-memory LRU of float32 rows. Tier 2 (EMBEDDING_CACHE_PATH) is a
+fixed-size ring of float32 rows in a memory-mapped file, with a sqlite index
+from key to row. Vectors are read straight out of the mapping, with no JSON and
+no Python lists, and the mapping is shared by every worker that opens the file.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows: no forked workers share the file there
+    fcntl = None
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.cache import LRUCache, _MISSING, make_key
+
+_SQLITE_MAX_PARAMS = 900
+
+
+class MemmapTier:
+    """
+    `capacity` float32 rows of `dim` in <path>.f32, indexed by <path>.idx; the oldest rows
+    are overwritten first. Writers in every process take turns on <path>.lock.
+    """
+
+    def __init__(self, path: str, capacity: int, dim: int):
+        self.capacity = capacity
+        self.dim = dim
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path + ".idx", check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS slots (key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._lock = threading.Lock()
+        self._writer_file = open(path + ".lock", "a+b")
+
+        data_path = path + ".f32"
+        size = capacity * dim * np.dtype(np.float32).itemsize
+        # Check and create under sqlite's write lock: workers starting together against a
+        # missing file must not both create it, or the second would zero rows the first indexed
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            shape = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+            fresh = shape.get("dim") != dim or shape.get("capacity") != capacity or \
+                not os.path.exists(data_path) or os.path.getsize(data_path) != size
+            if fresh:
+                # New file, or another model / size: start over
+                self._conn.execute("DELETE FROM slots")
+                self._conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                                       [("dim", dim), ("capacity", capacity), ("next", 0)])
+                with open(data_path, "wb") as f:
+                    f.truncate(size)  # sparse zeros
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._vectors = np.memmap(data_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+    def _slots(self, keys: Sequence[str]) -> Dict[str, int]:
+        slots: Dict[str, int] = {}
+        for i in range(0, len(keys), _SQLITE_MAX_PARAMS):
+            chunk = keys[i:i + _SQLITE_MAX_PARAMS]
+            slots.update(self._conn.execute(
+                f"SELECT key, slot FROM slots WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        return slots
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            # Copy under the lock so no put_many on this tier reuses a slot mid-read
+            slots = self._slots(keys)
+            if not slots:
+                return {}
+            rows = np.array(self._vectors[list(slots.values())])
+            # Another worker sharing the file may have reclaimed a slot meanwhile. put_many
+            # unmaps a slot before overwriting it, so a key still on its slot was read intact.
+            current = self._slots(list(slots))
+        rows.setflags(write=False)
+        return {key: row for (key, slot), row in zip(slots.items(), rows) if current.get(key) == slot}
+
+    @contextmanager
+    def _writer(self):
+        """Writers in every process, one at a time: two writes lapping the ring could fill one slot."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._writer_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._writer_file, fcntl.LOCK_UN)
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        keys, vectors = list(keys)[-self.capacity:], vectors[-self.capacity:]
+        n = len(keys)
+        with self._writer():
+            # Claim the next n rows and forget what they held, so nobody reads a row mid-write
+            self._conn.execute("BEGIN IMMEDIATE")
+            start = self._conn.execute("SELECT value FROM meta WHERE name = 'next'").fetchone()[0]
+            slots = [(start + i) % self.capacity for i in range(n)]
+            self._conn.execute("UPDATE meta SET value = ? WHERE name = 'next'", ((start + n) % self.capacity,))
+            for i in range(0, n, _SQLITE_MAX_PARAMS):
+                chunk = slots[i:i + _SQLITE_MAX_PARAMS]
+                self._conn.execute(f"DELETE FROM slots WHERE slot IN ({','.join('?' * len(chunk))})", chunk)
+            self._conn.execute("COMMIT")
+
+            self._vectors[slots] = vectors
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO slots (key, slot) VALUES (?, ?)", zip(keys, slots))
+            self._conn.execute("COMMIT")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._vectors.flush()
+            self._conn.close()
+            self._writer_file.close()
+
+
+class EmbeddingCache:
+    def __init__(self):
+        # Embeddings of a given model never go stale, so entries only leave by LRU eviction
+        self.memory = LRUCache(settings.EMBEDDING_CACHE_MAX_ENTRIES, float("inf"))
+        self.disk: Optional[MemmapTier] = None
+        self._disk_lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _disk(self, dim: int) -> Optional[MemmapTier]:
+        # Opened on first use: the row width comes from the model
+        if self.disk is None and settings.EMBEDDING_CACHE_PATH:
+            with self._disk_lock:
+                if self.disk is None:
+                    self.disk = MemmapTier(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_DISK_ENTRIES, dim)
+        return self.disk
+
+    def peek(self, key: str) -> Optional[np.ndarray]:
+        """Memory tier only (cheap enough for the event loop); counts hits, not misses."""
+        value = self.memory.get(key)
+        if value is _MISSING:
+            return None
+        self.counters["hits"] += 1
+        return value
+
+    def get_many(self, keys: Sequence[str], dim: int) -> List[Optional[np.ndarray]]:
+        values = [self.memory.get(key) for key in keys]
+        missing = [i for i, v in enumerate(values) if v is _MISSING]
+        self.counters["hits"] += len(keys) - len(missing)
+
+        disk = self._disk(dim) if missing else None
+        if disk is not None:
+            found = disk.get_many([keys[i] for i in missing])
+            for i in missing:
+                vector = found.get(keys[i])
+                if vector is not None:
+                    values[i] = vector
+                    self.memory.set(keys[i], vector)
+            self.counters["disk_hits"] += len(found)
+
+        values = [None if v is _MISSING else v for v in values]
+        self.counters["misses"] += sum(v is None for v in values)
+        return values
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        vectors = vectors.copy()
+        vectors.setflags(write=False)  # rows are handed out to every later hit
+        for key, vector in zip(keys, vectors):
+            self.memory.set(key, vector)
+        disk = self._disk(vectors.shape[1])
+        if disk is not None:
+            disk.put_many(keys, vectors)
+
+    def stats(self) -> Dict:
+        return {
+            "memory_entries": len(self.memory),
+            "memory_max_entries": self.memory.max_entries,
+            "evictions": self.memory.evictions,
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+            "disk_max_entries": settings.EMBEDDING_CACHE_DISK_ENTRIES if settings.EMBEDDING_CACHE_PATH else None,
+            **self.counters,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
+
+
+def key(text: str, model_name: str) -> str:
+    return make_key("embedding", text, model_name)
+
+
+def get_stats() -> Dict:
+    return get_cache().stats()
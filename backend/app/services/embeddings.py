@@ -1,15 +1,68 @@
+import threading
+from typing import Optional
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
+from app.core import metrics
+from app.core.config import settings
+from app.core.executor import model_load_lock
+from app.services import embedding_cache, mock_models
 
 _model = None
+_load_lock = threading.Lock()
+MODEL_NAME = 'all-MiniLM-L6-v2'
 
 def get_model():
     global _model
     if _model is None:
-        print("📥 Loading Embedding Model (MiniLM)...")
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
+        with _load_lock:
+            if _model is None:
+                if settings.MOCK_MODELS:
+                    print("🧪 Using mock Embedding Model (MOCK_MODELS)")
+                    _model = mock_models.embedding_model()
+                else:
+                    print("📥 Loading Embedding Model (MiniLM)...")
+                    with model_load_lock:
+                        _model = SentenceTransformer(MODEL_NAME)
     return _model
 
-def generate_embedding(text: str):
+def get_model_version() -> str:
+    return MODEL_NAME + ("+mock" if settings.MOCK_MODELS else "")
+
+def cached_embedding(text: str) -> Optional[np.ndarray]:
+    """The vector for `text` if it is in the in-memory cache tier, else None. Never encodes."""
+    return embedding_cache.get_cache().peek(embedding_cache.key(text, get_model_version()))
+
+def generate_embedding(text: str) -> np.ndarray:
+    return generate_embeddings([text])[0]
+
+@metrics.timed("embeddings.generate_embeddings")
+def generate_embeddings(texts: list[str], batch_size: int = 64) -> np.ndarray:
+    """
+    float32 matrix, one row per text. Cached texts are looked up; only the
+    misses are encoded, with one padded forward pass per `batch_size` chunk.
+    """
     model = get_model()
-    # Convert to standard list for JSON/DB compatibility
-    return model.encode(text).tolist()
\ No newline at end of file
+    dim = model.get_sentence_embedding_dimension()
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    if not texts:
+        return out
+
+    cache = embedding_cache.get_cache()
+    version = get_model_version()
+    keys = [embedding_cache.key(text, version) for text in texts]
+    missing = {}  # key -> positions, so a text repeated in the batch is encoded once
+    for i, (key, vector) in enumerate(zip(keys, cache.get_many(keys, dim))):
+        if vector is None:
+            missing.setdefault(key, []).append(i)
+        else:
+            out[i] = vector
+
+    if missing:
+        todo = [positions[0] for positions in missing.values()]
+        vectors = model.encode([texts[i] for i in todo], batch_size=batch_size, convert_to_numpy=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        for positions, vector in zip(missing.values(), vectors):
+            out[positions] = vector
+        cache.put_many(list(missing), vectors)
+    return out
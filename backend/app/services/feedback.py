@@ -0,0 +1,327 @@
+"""
+Feedback Log
+RLHF feedback is appended to JSONL segment files in data/feedback/ (or
+FEEDBACK_DIR), one record per line.
+
+Writing: `await submit(record)` queues the record on a micro-batcher whose
+single worker writes everything queued with one write() per batch, on a thread
+of its own rather than the inference pool, so feedback never waits behind
+model calls. Each process
+writes its own segment (feedback-<start time>-<pid>-<n>.jsonl), so gunicorn
+workers never interleave lines and need no file locking. A segment is rotated
+once it reaches FEEDBACK_SEGMENT_MAX_BYTES or FEEDBACK_SEGMENT_MAX_AGE_S, and
+with FEEDBACK_COMPRESS the closed segment is gzipped.
+
+Reading: `read_records()` streams every record from all segments, oldest
+first, plain or gzipped. GET /feedback/stats uses running totals, overall and
+per UTC day, checkpointed to .stats.json with the byte offset reached in each
+segment; at startup (and on each read) only lines past those offsets are read.
+"""
+
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.executor import DedicatedThread, run_blocking
+from app.services.batching import MicroBatcher
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "feedback")
+CHECKPOINT_NAME = ".stats.json"
+CHECKPOINT_VERSION = 2
+
+
+def get_dir() -> str:
+    return settings.FEEDBACK_DIR or DEFAULT_DIR
+
+
+# --- SEGMENTS ---
+
+def _stem(path: str) -> str:
+    name = os.path.basename(path)
+    return name[:-3] if name.endswith(".gz") else name
+
+
+def list_segments(directory: Optional[str] = None) -> List[str]:
+    """Segment paths, oldest first; a segment caught mid-compression is listed once, as the .gz."""
+    directory = directory or get_dir()
+    by_stem: Dict[str, str] = {}
+    for path in glob.glob(os.path.join(directory, "*.jsonl")) + glob.glob(os.path.join(directory, "*.jsonl.gz")):
+        if path.endswith(".gz") or _stem(path) not in by_stem:
+            by_stem[_stem(path)] = path
+    return [by_stem[stem] for stem in sorted(by_stem)]
+
+
+def open_segment(path: str) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def read_records(directory: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Every feedback record in every segment, oldest segment first; unreadable lines are skipped."""
+    for path in list_segments(directory):
+        try:
+            f = open_segment(path)
+        except FileNotFoundError:
+            # Compressed since it was listed
+            if not os.path.exists(path + ".gz"):
+                continue
+            f = open_segment(path + ".gz")
+        with f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class SegmentWriter:
+    """This process's open segment. Not thread-safe: only the feedback batcher's worker calls it."""
+
+    def __init__(self, directory: str, max_bytes: int, max_age_s: float, compress: bool, fsync: bool):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.compress = compress
+        self.fsync = fsync
+        self._file: Optional[IO[bytes]] = None
+        self._path: Optional[str] = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._seq = 0
+        self.segments_closed = 0
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        self._path = os.path.join(self.directory, f"feedback-{stamp}-{os.getpid()}-{self._seq:04d}.jsonl")
+        self._seq += 1
+        self._file = open(self._path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = time.monotonic()
+
+    def _due(self) -> bool:
+        return (self.max_bytes > 0 and self._size >= self.max_bytes) or \
+               (self.max_age_s > 0 and time.monotonic() - self._opened_at >= self.max_age_s)
+
+    def _seal(self):
+        path = self._path
+        self._file.close()
+        self._file = self._path = None
+        self.segments_closed += 1
+        if self.compress and os.path.getsize(path):
+            tmp = path + ".gz.tmp"
+            with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, path + ".gz")  # readers prefer the .gz once it exists
+            os.remove(path)
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> List[None]:
+        if self._file is not None and self._due():
+            self._seal()
+        if self._file is None:
+            self._open()
+        data = b"".join((json.dumps(r) + "\n").encode("utf-8") for r in records)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size += len(data)
+        return [None] * len(records)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "segment": os.path.basename(self._path) if self._path else None,
+            "segment_bytes": self._size if self._path else 0,
+            "segments_closed": self.segments_closed,
+        }
+
+    def close(self):
+        if self._file is not None:
+            self._seal()
+
+
+# --- RUNNING STATS ---
+
+def _empty_day() -> Dict[str, int]:
+    return {"positive": 0, "negative": 0, "corrections": 0}
+
+
+class FeedbackStats:
+    """Running totals over all segments, advanced from a per-segment byte offset."""
+
+    def __init__(self, directory: str, checkpoint_interval: float):
+        self.directory = directory
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_NAME)
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self.offsets: Dict[str, int] = {}  # segment stem -> bytes counted (uncompressed)
+        self.complete: set = set()  # stems counted in full from their .gz
+        self.positive = 0
+        self.negative = 0
+        self.corrections = 0
+        self.malformed = 0
+        self.days: Dict[str, Dict[str, int]] = {}
+        self._last_checkpoint = 0.0
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get("version") != CHECKPOINT_VERSION:
+            return
+        self.offsets = state["offsets"]
+        self.complete = set(state["complete"])
+        self.positive = state["positive"]
+        self.negative = state["negative"]
+        self.corrections = state["corrections"]
+        self.malformed = state.get("malformed", 0)
+        self.days = state["days"]
+
+    def _checkpoint(self):
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "offsets": self.offsets,
+            "complete": sorted(self.complete),
+            "positive": self.positive,
+            "negative": self.negative,
+            "corrections": self.corrections,
+            "malformed": self.malformed,
+            "days": self.days,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)  # atomic: a reader never sees half a checkpoint
+        self._last_checkpoint = time.monotonic()
+
+    def _count(self, record: Dict[str, Any]):
+        day = self.days.setdefault(str(record.get("timestamp", ""))[:10] or "unknown", _empty_day())
+        if record.get("rating", 0) > 0:
+            self.positive += 1
+            day["positive"] += 1
+        else:
+            self.negative += 1
+            day["negative"] += 1
+        if record.get("user_correction"):
+            self.corrections += 1
+            day["corrections"] += 1
+
+    def _advance(self, path: str):
+        stem = _stem(path)
+        compressed = path.endswith(".gz")
+        offset = self.offsets.get(stem, 0)
+        if not compressed and os.path.getsize(path) <= offset:
+            return
+        with open_segment(path) as f:
+            f.seek(offset)  # for a .gz this decompresses up to the offset
+            for line in f:
+                if not line.endswith(b"\n") and not compressed:
+                    break  # a write in progress; picked up next time
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    self._count(json.loads(line))
+                except (ValueError, AttributeError):
+                    self.malformed += 1
+        if compressed:
+            # Sealed: never changes again
+            self.complete.add(stem)
+            self.offsets.pop(stem, None)
+        else:
+            self.offsets[stem] = offset
+
+    def _catch_up(self):
+        """Fold in every complete line past the recorded offsets (caller holds the lock)."""
+        for path in list_segments(self.directory):
+            if _stem(path) in self.complete:
+                continue
+            try:
+                self._advance(path)
+            except FileNotFoundError:
+                pass  # compressed meanwhile: continued from the .gz on the next read
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self._checkpoint()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._catch_up()
+            return {
+                "total_feedback": self.positive + self.negative,
+                "positive_count": self.positive,
+                "negative_count": self.negative,
+                "corrections_count": self.corrections,
+                "malformed_lines": self.malformed,
+                "by_day": {day: dict(counts) for day, counts in sorted(self.days.items())},
+            }
+
+    def close(self):
+        with self._lock:
+            self._catch_up()
+            self._checkpoint()
+
+
+# --- MODULE STATE ---
+
+writer = SegmentWriter(
+    get_dir(),
+    max_bytes=settings.FEEDBACK_SEGMENT_MAX_BYTES,
+    max_age_s=settings.FEEDBACK_SEGMENT_MAX_AGE_S,
+    compress=settings.FEEDBACK_COMPRESS,
+    fsync=settings.FEEDBACK_FSYNC,
+)
+
+# SegmentWriter isn't thread-safe; one thread does every write and the final close
+writer_thread = DedicatedThread("feedback-writer")
+
+feedback_batcher = MicroBatcher(
+    "feedback", writer.write_batch,
+    max_batch_size=settings.FEEDBACK_BATCH_MAX_SIZE,
+    max_wait_ms=settings.FEEDBACK_BATCH_MAX_WAIT_MS,
+    run=writer_thread.run,
+)
+
+_stats: Optional[FeedbackStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_log() -> FeedbackStats:
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = FeedbackStats(get_dir(), settings.FEEDBACK_CHECKPOINT_INTERVAL_S)
+    return _stats
+
+
+async def submit(record: Dict[str, Any]):
+    """Queue one record; returns once the batch holding it has been written."""
+    await feedback_batcher.submit(record)
+
+
+def get_stats() -> Dict[str, Any]:
+    return get_log().stats()
+
+
+def get_writer_stats() -> Dict[str, Any]:
+    return {**writer.stats(), "batching": feedback_batcher.stats()}
+
+
+async def shutdown():
+    """Stop the writer, close (and maybe compress) this process's segment, checkpoint the stats."""
+    await feedback_batcher.stop()
+    await writer_thread.run(writer.close)
+    writer_thread.shutdown()
+    if _stats is not None:
+        await run_blocking(_stats.close)
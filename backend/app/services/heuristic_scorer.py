@@ -1,38 +1,43 @@
 import re
+from typing import Optional, Sequence
+
+from app.services import lexicon
 
 # --- CONFIGURATION ---
-POSITIVE_MARKERS = [
-    "please", "thank", "appreciate", "could you", "would you", "help", 
-    "understand", "concern", "perspective", "together", "we can"
-]
+# Positive / negative markers are the lexicon entries with a "polarity"
+# (app/resources/lexicon.json), matched on word boundaries in one shared scan.
+POSITIVE_BONUS = 0.10
+NEGATIVE_PENALTY = 0.15
+# Bump when a rule below changes
+RULES_REVISION = 2
 
-NEGATIVE_MARKERS = [
-    "trash", "stupid", "useless", "idiot", "garbage", "waste", 
-    "hell", "damn", "worst", "fail", "mess", "ridiculous"
-]
+# Changes whenever the lexicon, these weights or the rules change, so cached scores are invalidated
+RULES_VERSION = f"{lexicon.get_lexicon().version}-{POSITIVE_BONUS}-{NEGATIVE_PENALTY}-r{RULES_REVISION}"
 
-def calculate_heuristic_score(text: str) -> float:
+def calculate_heuristic_score(text: str, hits: Optional[Sequence[lexicon.Hit]] = None) -> float:
     """
     Calculates a deterministic score based on rule-based features.
     Base Score: 0.5 (Neutral)
     Range: 0.0 to 1.0
+    `hits` is a precomputed lexicon scan of `text`; scanned here if omitted.
     """
-    text_lower = text.lower()
+    hits = lexicon.scan(text) if hits is None else hits
     score = 0.5  # Start neutral
-    
+
+    # Each marker counts once, however often it appears
+    polarities = {hit.entry.term: hit.entry.polarity for hit in hits if hit.entry.polarity}
+
     # 1. Penalty for Toxic Words (-0.15 per word)
-    for word in NEGATIVE_MARKERS:
-        if word in text_lower:
-            score -= 0.15
+    score -= NEGATIVE_PENALTY * sum(1 for p in polarities.values() if p == "negative")
 
     # 2. Bonus for Polite Words (+0.10 per word)
-    for word in POSITIVE_MARKERS:
-        if word in text_lower:
-            score += 0.10
+    score += POSITIVE_BONUS * sum(1 for p in polarities.values() if p == "positive")
 
     # 3. Penalty for Shouting (All Caps) -> -0.2
-    # We check if >50% of characters are upper case and the text is long enough
-    if len(text) > 5 and sum(1 for c in text if c.isupper()) / len(text) > 0.5:
+    # We check if >50% of characters are upper case and the text is long enough.
+    # Whitespace isn't counted: scores are cached under whitespace-normalized text.
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) > 5 and sum(1 for c in chars if c.isupper()) / len(chars) > 0.5:
         score -= 0.20
 
     # 4. Penalty for Aggressive Punctuation (Multiple !!! or ???) -> -0.1
@@ -1,39 +1,66 @@
-from app.schemas.api import Issue
-
-# A simple but effective list of toxic phrases for the MVP
-TOXIC_KEYWORDS = {
-    "trash": "Degrading language",
-    "garbage": "Degrading language",
-    "stupid": "Insulting adjective",
-    "idiot": "Personal attack",
-    "useless": "Personal attack",
-    "dumb": "Insulting adjective",
-    "fired": "Threatening language",
-    "hate": "Strong negative emotion",
-    "kill": "Violent language",
-    "always": "Absolutism (triggers defensiveness)",
-    "never": "Absolutism (triggers defensiveness)"
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core import metrics
+from app.schemas.api import CompactIssue, Issue, IssueType
+from app.services import lexicon
+
+# Toxic phrases are the lexicon entries with an "issue" code
+# (app/resources/lexicon.json), matched on word boundaries in one shared scan.
+
+SHOUTING = "shouting"
+SHOUTING_LABEL = "Shouting (All Caps)"
+
+# Per-category explanations for the compact legend (keyword issues name the word instead)
+EXPLANATIONS = {
+    SHOUTING: "Typing in all caps is perceived as shouting.",
 }
+DEFAULT_EXPLANATION = "Words like these tend to escalate conflict."
+
+# Changes whenever the lexicon changes; recorded with each stored analysis
+RULES_VERSION = lexicon.get_lexicon().version
 
-def detect_issues(text: str) -> list[Issue]:
+@metrics.timed("issue_detector.detect_issues")
+def detect_issues(text: str, hits: Optional[Sequence[lexicon.Hit]] = None) -> list[Issue]:
+    """
+    One issue per occurrence, with character offsets into `text`.
+    `hits` is a precomputed lexicon scan of `text`; scanned here if omitted.
+    """
     issues = []
-    lower_text = text.lower()
-    
+    hits = lexicon.scan(text) if hits is None else hits
+    labels = lexicon.get_lexicon().issues
+
     # 1. Keyword Scanning
-    for word, category in TOXIC_KEYWORDS.items():
-        if word in lower_text:
-            issues.append(Issue(
-                span=word,
-                issue=category,
-                explanation=f"Using words like '{word}' tends to escalate conflict."
-            ))
+    for hit in hits:
+        code = hit.entry.issue
+        if code is None:
+            continue
+        issues.append(Issue(
+            span=hit.text,
+            start=hit.start,
+            end=hit.end,
+            code=code,
+            issue=labels.get(code, code),
+            explanation=f"Using words like '{hit.entry.term}' tends to escalate conflict."
+        ))
 
     # 2. Tone Checks (Heuristics)
     if text.isupper():
         issues.append(Issue(
             span="ENTIRE TEXT",
-            issue="Shouting (All Caps)",
-            explanation="Typing in all caps is perceived as shouting."
+            start=0,
+            end=len(text),
+            code=SHOUTING,
+            issue=SHOUTING_LABEL,
+            explanation=EXPLANATIONS[SHOUTING]
         ))
         
-    return issues
\ No newline at end of file
+    return issues
+
+
+def compact_issues(issues: Sequence[Issue]) -> Tuple[List[CompactIssue], Dict[str, IssueType]]:
+    """Offsets + codes, and one legend entry per code, instead of repeating strings per occurrence."""
+    legend = {
+        issue.code: IssueType(issue=issue.issue, explanation=EXPLANATIONS.get(issue.code, DEFAULT_EXPLANATION))
+        for issue in issues
+    }
+    return [CompactIssue(start=i.start, end=i.end, code=i.code) for i in issues], legend
@@ -0,0 +1,141 @@
+"""
+Lexicon Matcher
+One pass over the text finds every lexicon term, with character offsets, for
+both the heuristic scorer and the issue detector.
+
+Terms live in app/resources/lexicon.json (or LEXICON_PATH). They are merged
+into a character trie and compiled into a single regex, so alternatives that
+share a prefix are tested once: the cost of a scan grows with the text, not
+with the number of terms. Matches respect word boundaries, so "hell" does not
+fire inside "hello" and "hate" does not fire inside "whatever".
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "..", "resources", "lexicon.json")
+_END = ""
+
+
+@dataclass(frozen=True)
+class Entry:
+    term: str
+    polarity: Optional[str] = None   # "positive" / "negative", for the heuristic scorer
+    issue: Optional[str] = None      # issue code (key of Lexicon.issues), for the issue detector
+    prefix: bool = False
+    forms: Tuple[str, ...] = field(default_factory=tuple)
+
+
+@dataclass(frozen=True)
+class Hit:
+    start: int
+    end: int
+    text: str       # as written in the message
+    entry: Entry
+
+
+def _normalize(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+def trie_regex(terms, space: str = r"\s+") -> str:
+    """
+    Regex matching exactly `terms`, factored through a trie (longest alternative
+    first). A space in a term matches `space`.
+    """
+    root: Dict = {}
+    for term in terms:
+        node = root
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[_END] = {}
+
+    def build(node) -> str:
+        branches = [
+            (space if ch == " " else re.escape(ch)) + build(child)
+            for ch, child in sorted(node.items()) if ch != _END
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if _END in node:
+            # A shorter term ends here: the rest is optional (greedy, so longer terms win)
+            body = ("(?:" + body + ")" if len(branches) == 1 else body) + "?"
+        return body
+
+    return build(root) if root else "(?!)"
+
+
+class Lexicon:
+    def __init__(self, entries: List[Entry], version: str = "", issues: Optional[Dict[str, str]] = None):
+        self.entries = entries
+        self.version = version
+        self.issues = issues or {}  # issue code -> label shown to users
+        self._exact: Dict[str, Entry] = {}
+        self._prefix: Dict[str, Entry] = {}
+        for entry in entries:
+            target = self._prefix if entry.prefix else self._exact
+            target[_normalize(entry.term)] = entry
+            for form in entry.forms:
+                self._exact[_normalize(form)] = entry
+
+        # Whole-word terms first; prefix terms may run on into the rest of the word
+        self._pattern = re.compile(
+            r"(?<!\w)(?:(?P<exact>" + trie_regex(self._exact) + r")(?!\w)"
+            r"|(?P<prefix>" + trie_regex(self._prefix) + r")\w*)",
+            re.IGNORECASE,
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "Lexicon":
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw)
+        entries = [
+            Entry(
+                term=item["term"],
+                polarity=item.get("polarity"),
+                issue=item.get("issue"),
+                prefix=bool(item.get("prefix", False)),
+                forms=tuple(item.get("forms", ())),
+            )
+            for item in data["entries"]
+        ]
+        # Content hash: editing the file invalidates cached scores / issues
+        return cls(entries, version=hashlib.sha1(raw).hexdigest()[:12], issues=data.get("issues"))
+
+    def scan(self, text: str) -> List[Hit]:
+        hits = []
+        for m in self._pattern.finditer(text):
+            if m.group("exact") is not None:
+                entry = self._exact[_normalize(m.group("exact"))]
+            else:
+                entry = self._prefix[_normalize(m.group("prefix"))]
+            hits.append(Hit(m.start(), m.end(), m.group(0), entry))
+        return hits
+
+
+_lexicon: Optional[Lexicon] = None
+
+
+def get_lexicon() -> Lexicon:
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = Lexicon.from_file(settings.LEXICON_PATH or DEFAULT_PATH)
+    return _lexicon
+
+
+@lru_cache(maxsize=4096)
+def scan(text: str) -> Tuple[Hit, ...]:
+    """
+    All lexicon hits in `text`, left to right. Memoized, so the scorer and the
+    issue detector share one scan of each message.
+    """
+    return tuple(get_lexicon().scan(text))
@@ -0,0 +1,136 @@
+"""
+Mock Models
+Stand-ins for MiniLM, DistilBERT and T5 with the call signatures the services
+use, so the API runs end to end without saved_models/ or a hub download
+(MOCK_MODELS=1, e.g. for benchmarks/load_test.py).
+
+Outputs are deterministic functions of the input: embeddings are seeded by the
+text, scores by the token ids, and the rewrite echoes the message. Every
+forward pass (one per generated token for T5) sleeps MOCK_MODEL_LATENCY_MS, so
+batching, the inference pool and streaming behave as they would with real
+models, at a configurable cost.
+"""
+
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from app.core.config import settings
+
+EMBEDDING_DIM = 384
+PAD, EOS = 0, 1
+
+
+def _forward_pass():
+    if settings.MOCK_MODEL_LATENCY_MS > 0:
+        time.sleep(settings.MOCK_MODEL_LATENCY_MS / 1000)
+
+
+class MockEncoder:
+    """SentenceTransformer stand-in: unit vectors seeded by the text."""
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return EMBEDDING_DIM
+
+    def encode(self, texts, batch_size: int = 64, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        out = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+            out[i] = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM)
+        for _ in range(0, len(texts), batch_size):
+            _forward_pass()
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+class MockTokenizer:
+    """Whitespace tokenizer with a vocabulary that grows as words are seen."""
+
+    def __init__(self):
+        self._ids = {"<pad>": PAD, "</s>": EOS}
+        self._words = ["<pad>", "</s>"]
+        self._lock = threading.Lock()
+
+    def _encode(self, text: str, max_length: int = None) -> list:
+        ids = []
+        with self._lock:
+            for word in text.split():
+                if word not in self._ids:
+                    self._ids[word] = len(self._words)
+                    self._words.append(word)
+                ids.append(self._ids[word])
+        ids = ids[:max_length - 1] if max_length else ids
+        return ids + [EOS]
+
+    def __call__(self, texts, return_tensors=None, padding=False, truncation=False, max_length=None, **kwargs):
+        if isinstance(texts, str):
+            return {"input_ids": self._encode(texts, max_length if truncation else None)}
+        rows = [self._encode(t, max_length if truncation else None) for t in texts]
+        width = max(map(len, rows))
+        return {
+            "input_ids": torch.tensor([r + [PAD] * (width - len(r)) for r in rows]),
+            "attention_mask": torch.tensor([[1] * len(r) + [0] * (width - len(r)) for r in rows]),
+        }
+
+    def decode(self, ids, skip_special_tokens: bool = True, **kwargs) -> str:
+        ids = ids.tolist() if hasattr(ids, "tolist") else list(ids)
+        return " ".join(self._words[i] for i in ids if not (skip_special_tokens and i in (PAD, EOS)))
+
+    def batch_decode(self, batch, skip_special_tokens: bool = True, **kwargs) -> list:
+        return [self.decode(ids, skip_special_tokens=skip_special_tokens) for ids in batch]
+
+
+class MockScorer:
+    """DistilBERT stand-in: two logits in 0-1 per message, derived from its token ids."""
+
+    def __call__(self, input_ids, attention_mask=None, **kwargs):
+        _forward_pass()
+        h = (input_ids * 2654435761 % 1000).sum(dim=1, keepdim=True).float()
+        return SimpleNamespace(logits=torch.cat([(h % 997) / 997, (h % 991) / 991], dim=1))
+
+
+class MockRewriter:
+    """T5 stand-in: "generates" the message without its prompt, one token per forward pass."""
+
+    def __init__(self, prompt_tokens: int):
+        self.prompt_tokens = prompt_tokens
+
+    def generate(self, input_ids, attention_mask, max_length: int = 20, streamer=None,
+                 stopping_criteria=None, **kwargs):
+        _forward_pass()  # encoder
+        sources = [row[:int(mask.sum())][self.prompt_tokens:-1] for row, mask in zip(input_ids, attention_mask)]
+        outputs = [[PAD] for _ in sources]
+        if streamer is not None:
+            streamer.put(torch.tensor(outputs[0]))
+        for step in range(max_length - 1):
+            live = [i for i, src in enumerate(sources) if outputs[i][-1] != EOS]
+            if not live:
+                break
+            _forward_pass()
+            for i in live:
+                src = sources[i]
+                outputs[i].append(int(src[step]) if step < len(src) else EOS)
+            if streamer is not None:
+                streamer.put(torch.tensor([outputs[0][-1]]))
+            if stopping_criteria and any(bool(c(torch.tensor(outputs[:1]), None).all()) for c in stopping_criteria):
+                break
+        if streamer is not None:
+            streamer.end()
+        width = max(map(len, outputs))
+        return torch.tensor([o + [PAD] * (width - len(o)) for o in outputs])
+
+
+def embedding_model() -> MockEncoder:
+    return MockEncoder()
+
+
+def scorer_model():
+    return MockTokenizer(), MockScorer()
+
+
+def rewriter_model(prompt: str):
+    tokenizer = MockTokenizer()
+    return tokenizer, MockRewriter(prompt_tokens=len(prompt.split()))
@@ -0,0 +1,64 @@
+"""
+ONNX Runtime Models
+Export / quantize helpers for running the fine-tuned scorer and rewriter
+through onnxruntime (via optimum) instead of PyTorch.
+
+    saved_models/empathy_scorer            PyTorch checkpoint (training output)
+    saved_models/empathy_scorer_onnx       fp32 ONNX export
+    saved_models/empathy_scorer_onnx_int8  dynamic int8 quantized export
+
+T5 is exported as an encoder plus a merged decoder that takes past key/values,
+so optimum's generate() reuses the KV cache instead of re-running the decoder
+over the whole prefix at each step.
+"""
+
+import os
+import shutil
+
+from app.core.config import settings
+
+# Weights are replaced by the export; everything else (tokenizer files) is copied over
+_WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".onnx_data")
+
+
+def onnx_dir(model_path: str, quantized: bool = None) -> str:
+    quantized = settings.ONNX_QUANTIZED if quantized is None else quantized
+    return f"{model_path}_onnx_int8" if quantized else f"{model_path}_onnx"
+
+
+def runtime_tag() -> str:
+    """Appended to model versions so cached results from different runtimes don't mix."""
+    if settings.MOCK_MODELS:
+        return "+mock"
+    if settings.INFERENCE_BACKEND != "onnx":
+        return ""
+    return "+onnx-int8" if settings.ONNX_QUANTIZED else "+onnx"
+
+
+def _copy_support_files(src: str, dst: str):
+    for name in os.listdir(src):
+        path = os.path.join(src, name)
+        if os.path.isfile(path) and not name.endswith(_WEIGHT_SUFFIXES) and not name.endswith(".onnx"):
+            if not os.path.exists(os.path.join(dst, name)):
+                shutil.copy2(path, dst)
+
+
+def export(model_path: str, ort_model_cls, out_dir: str = None) -> str:
+    """Convert a PyTorch checkpoint to ONNX with `ort_model_cls` (an optimum ORTModelFor* class)."""
+    out_dir = out_dir or onnx_dir(model_path, quantized=False)
+    model = ort_model_cls.from_pretrained(model_path, export=True)
+    model.save_pretrained(out_dir)
+    _copy_support_files(model_path, out_dir)
+    return out_dir
+
+
+def quantize(src_dir: str, dst_dir: str):
+    """Dynamic int8 quantization of every ONNX graph in `src_dir` (weights int8, activations fp32)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(dst_dir, exist_ok=True)
+    for name in os.listdir(src_dir):
+        if name.endswith(".onnx"):
+            quantize_dynamic(os.path.join(src_dir, name), os.path.join(dst_dir, name), weight_type=QuantType.QInt8)
+    _copy_support_files(src_dir, dst_dir)
+    return dst_dir
@@ -0,0 +1,348 @@
+"""
+Analyze Pipeline
+Runs the /analyze stages as a small dependency graph instead of a straight line.
+
+    embed ──> retrieve ──> score ──┐
+                 └──> upsert (write-behind, off the critical path)
+    detect issues ─────────────────┼──> style transfer ──> response
+    rewrite (T5) ──────────────────┘
+
+Only `score` needs the retrieved context; issue detection and the T5 rewrite
+depend on the text alone, so all three branches run concurrently and latency
+is roughly max(rewrite, embed + retrieve + score) instead of their sum.
+
+The one exception: when the rule-based score already looks empathetic, the
+rewrite waits for the model scores and is skipped (original text returned)
+if they agree. Messages that clearly need a rewrite never wait.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+
+from app.core import executor, metrics
+from app.schemas.api import ProcessRequest, ProcessResponse, RewriteOption, EmpathyScores, Issue
+from app.core.config import settings
+from app.services import embeddings, vectorstore, scorer, heuristic_scorer, issue_detector, rewriter, style_transfer, batching, cache
+from app.services import analysis_store
+
+# Strong references to fire-and-forget tasks so they aren't garbage-collected mid-flight
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def write_behind(coro, label: str):
+    """Schedule work whose result the response doesn't need; failures are logged, not raised."""
+    # Off the request's clock: its stages go to /metrics but not to its Server-Timing
+    task = metrics.detached().run(asyncio.create_task, coro)
+    _background_tasks.add(task)
+
+    def _done(t: asyncio.Task):
+        _background_tasks.discard(t)
+        if not t.cancelled() and t.exception() is not None:
+            print(f"⚠️ Background {label} failed: {t.exception()}")
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def timed_stage(name: str, awaitable):
+    with metrics.stage(name):
+        return await awaitable
+
+
+async def drain():
+    """Wait for pending write-behind work (called on shutdown)."""
+    if _background_tasks:
+        await asyncio.gather(*list(_background_tasks), return_exceptions=True)
+
+
+# --- SINGLE MESSAGE ---
+
+async def analyze_message(request: ProcessRequest) -> ProcessResponse:
+    # --- STEP 0: DEMOJIZATON ---
+    # (REMOVED: Emoji handling caused issues. Using raw text.)
+    clean_text = request.text
+    msg_id = str(uuid.uuid4())
+
+    async def rewrite_branch(context_task):
+        # 6. Generate Rewrites (unless the message is already empathetic)
+        if might_skip_rewrite(clean_text):
+            _, scores = await context_task
+            if skip_rewrite(scores):
+                return None
+        # Pass clean_text so T5 doesn't get confused by unknown characters.
+        # The base rewrite is cached without style, so switching persona skips T5 entirely.
+        profile = request.profile or settings.REWRITE_DEFAULT_PROFILE
+        with metrics.stage("rewrite"):
+            return await cache.cached(
+                "rewrite", clean_text, rewriter.get_cache_version(profile),
+                lambda: batching.rewrite(clean_text, profile)
+            )
+
+    context_task = asyncio.ensure_future(context_branch(request, msg_id))
+    (context, scores), issues, ai_rewrite_text = await asyncio.gather(
+        context_task, issues_branch(request), rewrite_branch(context_task)
+    )
+    return build_response(request, msg_id, context, scores, issues, ai_rewrite_text)
+
+
+async def context_branch(request: ProcessRequest, msg_id: str):
+    """Embed -> retrieve -> (upsert, write-behind) -> score for one message."""
+    clean_text = request.text
+
+    # 1. Vectorize (Use clean_text so emojis influence the vector)
+    # A repeated draft is usually still in memory: skip the executor hop entirely
+    with metrics.stage("embed"):
+        vector = embeddings.cached_embedding(clean_text)
+        if vector is None:
+            vector = await executor.run_blocking(embeddings.generate_embedding, clean_text)
+
+    # 2. Retrieve Context (scoped to this conversation/sender and recent history)
+    scope = vectorstore.context_filter(request.conversation_id, request.sender)
+    with metrics.stage("retrieve"):
+        context = await executor.run_blocking(vectorstore.search_context, vector, scope=scope)
+
+    # 3. Save User Input to Memory, after the search so a message never retrieves itself.
+    # We save the ORIGINAL text (with emojis) so the history looks correct to the user.
+    write_behind(timed_stage("upsert", executor.run_blocking(
+        vectorstore.upsert_message,
+        mid=msg_id,
+        text=request.text,  # Save original
+        embedding=vector,
+        metadata=message_metadata(request)
+    )), "upsert")
+
+    # 4. Score (Use clean_text so BERT understands the emotion)
+    # Queued so concurrent requests share one DistilBERT forward pass
+    async def compute_scores():
+        return (await batching.score(clean_text, context)).model_dump()
+
+    with metrics.stage("score"):
+        scores = EmpathyScores(**await cache.cached("scores", clean_text, scorer.get_model_version(), compute_scores))
+    return context, scores
+
+
+async def issues_branch(request: ProcessRequest) -> List[Issue]:
+    # 5. Detect Issues (Use ORIGINAL text)
+    # We check the original so we can catch specific toxic emojis like 🖕 or 🤬
+    # Not cached: offsets index the exact text, and the cache key normalizes whitespace
+    with metrics.stage("detect"):
+        return issue_detector.detect_issues(request.text)
+
+
+# --- STREAMING ---
+
+_DONE = object()
+
+
+async def stream_message(request: ProcessRequest) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Same graph as analyze_message, but yields (event, data) as each part is ready:
+    meta, then issues / scores (whichever finishes first), then rewrite tokens as
+    T5 decodes them, then the style-transferred rewrite and the full response ("done").
+    """
+    clean_text = request.text
+    msg_id = str(uuid.uuid4())
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    yield "meta", {"message_id": msg_id, "conversation_id": request.conversation_id or 0}
+
+    async def scored():
+        context, scores = await context_branch(request, msg_id)
+        events.put_nowait(("scores", {"empathy_scores": scores.model_dump(), "retrieved_context": context}))
+        return context, scores
+
+    async def issues():
+        found = await issues_branch(request)
+        if request.compact_issues:
+            compact, legend = issue_detector.compact_issues(found)
+            events.put_nowait(("issues", {
+                "issues": [i.model_dump() for i in compact],
+                "issue_legend": {code: t.model_dump() for code, t in legend.items()},
+            }))
+        else:
+            events.put_nowait(("issues", {"issues": [i.model_dump() for i in found]}))
+        return found
+
+    async def rewrite(context_task):
+        if might_skip_rewrite(clean_text):
+            _, scores = await context_task
+            if skip_rewrite(scores):
+                return None
+
+        # Token streaming needs a single hypothesis, so beam profiles fall back to STREAM_PROFILE
+        profile = request.profile or settings.REWRITE_DEFAULT_PROFILE
+        if rewriter.DECODING_PROFILES[profile].get("num_beams", 1) > 1:
+            profile = settings.STREAM_PROFILE
+        streamed = False
+
+        def on_text(piece: str):
+            # Called on the inference thread for every decoded word
+            loop.call_soon_threadsafe(events.put_nowait, ("token", {"text": piece}))
+
+        async def compute():
+            nonlocal streamed
+            streamed = True
+            return await executor.run_blocking(rewriter.stream_rewrite, clean_text, on_text, profile, stop)
+
+        with metrics.stage("rewrite"):
+            base = await cache.cached("rewrite", clean_text, rewriter.get_cache_version(profile), compute)
+        if not streamed:
+            # Cache hit: nothing to stream, send it in one piece
+            events.put_nowait(("token", {"text": base}))
+        return base
+
+    context_task = asyncio.ensure_future(scored())
+    work = asyncio.gather(context_task, issues(), rewrite(context_task))
+    # Token callbacks are scheduled before the executor future resolves, so _DONE always comes last
+    work.add_done_callback(lambda _: events.put_nowait(_DONE))
+    try:
+        while True:
+            item = await events.get()
+            if item is _DONE:
+                break
+            yield item
+
+        (context, scores), found, ai_rewrite_text = work.result()
+        response = build_response(request, msg_id, context, scores, found, ai_rewrite_text)
+        yield "rewrite", {**response.rewrites[0].model_dump(), "rewrite_skipped": response.rewrite_skipped}
+        yield "done", response.model_dump()
+    finally:
+        # Client went away (or we failed): stop decoding and drop the remaining work
+        stop.set()
+        if not work.done():
+            work.cancel()
+
+
+# --- MANY MESSAGES ---
+
+async def analyze_messages(items: List[ProcessRequest]) -> List[ProcessResponse]:
+    texts = [item.text for item in items]
+    msg_ids = [str(uuid.uuid4()) for _ in items]
+
+    async def context_branch():
+        # 1. Vectorize all messages in one encode call (cache misses only)
+        with metrics.stage("embed"):
+            vectors = await executor.run_blocking(embeddings.generate_embeddings, texts)
+
+        # 2. Retrieve Context for every message (one query per distinct scope)
+        now = time.time()
+        scopes = [vectorstore.context_filter(item.conversation_id, item.sender, now=now) for item in items]
+        with metrics.stage("retrieve"):
+            contexts = await executor.run_blocking(vectorstore.search_context_batch, vectors, scopes=scopes)
+
+        # 3. Save all inputs to Memory with one upsert (write-behind)
+        write_behind(timed_stage("upsert", executor.run_blocking(
+            vectorstore.upsert_messages,
+            mids=msg_ids,
+            texts=texts,
+            embeddings=vectors,
+            metadatas=[message_metadata(item) for item in items]
+        )), "batch upsert")
+
+        # 4. Score the whole batch with one DistilBERT forward pass
+        async def compute_scores(missing):
+            # The scorer ignores context today, so scores are keyed on text alone
+            results = await executor.run_blocking(scorer.score_messages, missing)
+            return [s.model_dump() for s in results]
+
+        with metrics.stage("score"):
+            scores = [EmpathyScores(**s) for s in await cache.cached_many("scores", texts, scorer.get_model_version(), compute_scores)]
+        return contexts, scores
+
+    async def issues_branch():
+        # 5. Detect Issues (one lexicon scan per message; not cached, offsets index the exact text)
+        with metrics.stage("detect"):
+            return [issue_detector.detect_issues(text) for text in texts]
+
+    async def rewrite_branch(context_task):
+        # 6. Generate Rewrites with one T5 generate call per decoding profile
+        todo = list(range(len(items)))
+        if any(might_skip_rewrite(t) for t in texts):
+            _, scores = await context_task
+            todo = [i for i in todo if not (might_skip_rewrite(texts[i]) and skip_rewrite(scores[i]))]
+
+        by_profile = {}
+        for i in todo:
+            by_profile.setdefault(items[i].profile or settings.REWRITE_DEFAULT_PROFILE, []).append(i)
+
+        rewrites = [None] * len(items)
+        for profile, positions in by_profile.items():
+            with metrics.stage("rewrite"):
+                outputs = await cache.cached_many(
+                    "rewrite", [texts[i] for i in positions], rewriter.get_cache_version(profile),
+                    lambda missing, profile=profile: executor.run_blocking(rewriter.generate_rewrites, missing, profile=profile)
+                )
+            for i, out in zip(positions, outputs):
+                rewrites[i] = out
+        return rewrites
+
+    context_task = asyncio.ensure_future(context_branch())
+    (contexts, scores), issues, ai_rewrites = await asyncio.gather(
+        context_task, issues_branch(), rewrite_branch(context_task)
+    )
+    return [
+        build_response(*row)
+        for row in zip(items, msg_ids, contexts, scores, issues, ai_rewrites)
+    ]
+
+
+def message_metadata(request: ProcessRequest) -> dict:
+    # Chroma metadata can't hold None, so "no conversation" is stored as 0
+    return {
+        "sender": request.sender,
+        "conversation_id": request.conversation_id or 0,
+        "timestamp": time.time(),
+    }
+
+
+def might_skip_rewrite(text: str) -> bool:
+    """Cheap pre-check: only messages the rules already rate highly can skip T5."""
+    threshold = settings.REWRITE_SKIP_THRESHOLD
+    return threshold > 0 and heuristic_scorer.calculate_heuristic_score(text) >= threshold
+
+
+def skip_rewrite(scores: EmpathyScores) -> bool:
+    """The model-blended scores agree the message is already empathetic."""
+    return min(scores.warmth, scores.validation) >= settings.REWRITE_SKIP_THRESHOLD
+
+
+def build_response(request: ProcessRequest, msg_id: str, context, scores, issues, ai_rewrite_text) -> ProcessResponse:
+    # 7. Apply Style Transfer
+    # Transform the T5 output to the requested persona style.
+    # No rewrite (already empathetic) means the original text is returned as-is.
+    skipped = ai_rewrite_text is None
+    with metrics.stage("style"):
+        styled_text = request.text if skipped else style_transfer.apply_style(ai_rewrite_text, request.style)
+
+    # Determine the style label for display
+    style_label = f"{request.style}" if request.style != "Diplomat" else "Empathetic (AI)"
+
+    rewrites = [
+        RewriteOption(style=style_label, text=styled_text),
+    ]
+
+    legend = None
+    if request.compact_issues:
+        issues, legend = issue_detector.compact_issues(issues)
+
+    response = ProcessResponse(
+        conversation_id=request.conversation_id or 0,
+        message_id=msg_id,
+        original_text=request.text,
+        retrieved_context=context,
+        empathy_scores=scores,
+        issues=issues,
+        issue_legend=legend,
+        rewrites=rewrites,
+        rewrite_skipped=skipped
+    )
+
+    # 8. Keep the result for training-set exports (joined with feedback by message_id)
+    if settings.ANALYSIS_STORE_ENABLED:
+        write_behind(analysis_store.submit(analysis_store.analysis_row(request, response, ai_rewrite_text)), "analysis store")
+    return response
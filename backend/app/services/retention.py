@@ -0,0 +1,160 @@
+"""
+Message Store Retention
+Keeps the vector store bounded. A background task periodically scans the
+store, plans evictions and deletes them in bulk:
+
+    expired           older than RETENTION_MAX_AGE_DAYS (never messages without a timestamp)
+    duplicate         same normalized text as a newer message in the same conversation
+    conversation_cap  beyond the newest RETENTION_MAX_PER_CONVERSATION of a conversation
+    total_cap         beyond the newest RETENTION_MAX_TOTAL overall
+
+Messages without a conversation are grouped by sender instead. Messages stored
+before timestamps were recorded have an unknown age: they are never expired, but
+rank as the oldest for the caps. After deleting, the backend is asked to reclaim
+space (the local backend vacuums its matrix).
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core import executor, metrics
+from app.core.config import settings
+from app.services import vectorstore
+from app.services.cache import normalize_text
+
+DELETE_CHUNK_SIZE = 5000
+
+# A pass scans the whole store: keep it off the inference pool request traffic needs
+compaction_thread = executor.DedicatedThread("retention")
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "runs": 0,
+    "evicted": Counter(),
+    "compactions": 0,
+    "last_run_at": None,
+    "last_run_ms": 0.0,
+    "last_scanned": 0,
+    "last_error": None,
+}
+
+
+def _scope_key(metadata: Dict[str, Any]) -> str:
+    conversation_id = metadata.get("conversation_id") or 0
+    return str(conversation_id) if conversation_id else f"sender:{metadata.get('sender')}"
+
+
+def plan_evictions(rows: Iterable[Tuple[str, str, Dict[str, Any]]], now: float,
+                   max_age_s: float = 0, max_per_conversation: int = 0,
+                   max_total: int = 0, dedupe: bool = False) -> Dict[str, str]:
+    """
+    Decide which messages to drop. `rows` are (id, document, metadata);
+    returns {id: reason}. Limits of 0 are disabled. Newer messages always win.
+    """
+    entries = []
+    for mid, doc, meta in rows:
+        meta = meta or {}
+        digest = hashlib.sha1(normalize_text(doc or "").encode("utf-8")).digest() if dedupe else None
+        ts = meta.get("timestamp")
+        entries.append((float(ts) if ts else None, mid, _scope_key(meta), digest))
+    # Unknown age (legacy rows) sorts as oldest
+    entries.sort(key=lambda e: float("-inf") if e[0] is None else e[0], reverse=True)
+
+    evict: Dict[str, str] = {}
+    seen = set()
+    per_scope = defaultdict(int)
+    kept = 0
+    for ts, mid, scope, digest in entries:
+        if max_age_s > 0 and ts is not None and ts < now - max_age_s:
+            evict[mid] = "expired"
+        elif dedupe and (scope, digest) in seen:
+            evict[mid] = "duplicate"
+        elif max_per_conversation > 0 and per_scope[scope] >= max_per_conversation:
+            evict[mid] = "conversation_cap"
+        elif max_total > 0 and kept >= max_total:
+            evict[mid] = "total_cap"
+        else:
+            if dedupe:
+                seen.add((scope, digest))
+            per_scope[scope] += 1
+            kept += 1
+    return evict
+
+
+@metrics.timed("retention.run_compaction")
+def run_compaction(now: Optional[float] = None) -> Dict[str, int]:
+    """One full retention pass (blocking). Returns eviction counts by reason."""
+    start = time.perf_counter()
+    backend = vectorstore.get_backend()
+
+    rows = (row for page in backend.scan() for row in page)
+    scanned = 0
+
+    def counted(it):
+        nonlocal scanned
+        for row in it:
+            scanned += 1
+            yield row
+
+    evict = plan_evictions(
+        counted(rows),
+        now=time.time() if now is None else now,
+        max_age_s=settings.RETENTION_MAX_AGE_DAYS * 86400,
+        max_per_conversation=settings.RETENTION_MAX_PER_CONVERSATION,
+        max_total=settings.RETENTION_MAX_TOTAL,
+        dedupe=settings.RETENTION_DEDUPLICATE,
+    )
+
+    ids = list(evict)
+    for i in range(0, len(ids), DELETE_CHUNK_SIZE):
+        backend.delete(ids[i:i + DELETE_CHUNK_SIZE])
+    compacted = backend.compact_storage() if ids else False
+
+    counts = Counter(evict.values())
+    with _stats_lock:
+        _stats["runs"] += 1
+        _stats["evicted"].update(counts)
+        _stats["compactions"] += int(compacted)
+        _stats["last_run_at"] = time.time()
+        _stats["last_run_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        _stats["last_scanned"] = scanned
+        _stats["last_error"] = None
+    if ids:
+        print(f"🗑️ Retention evicted {len(ids)} of {scanned} messages: {dict(counts)}")
+    return dict(counts)
+
+
+async def retention_loop():
+    """Run compaction every COMPACTION_INTERVAL_S until cancelled."""
+    while True:
+        await asyncio.sleep(settings.COMPACTION_INTERVAL_S)
+        try:
+            await compaction_thread.run(run_compaction)
+        except Exception as e:
+            print(f"⚠️ Retention pass failed: {e}")
+            with _stats_lock:
+                _stats["last_error"] = str(e)
+
+
+def start() -> Optional[asyncio.Task]:
+    if settings.COMPACTION_INTERVAL_S <= 0:
+        return None
+    return asyncio.create_task(retention_loop())
+
+
+def shutdown():
+    """Wait for a pass in progress (blocking), so the backend isn't closed under its deletes."""
+    compaction_thread.shutdown()
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            **_stats,
+            "evicted": dict(_stats["evicted"]),
+            "evicted_total": sum(_stats["evicted"].values()),
+        }
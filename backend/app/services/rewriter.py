@@ -1,47 +1,206 @@
-from transformers import T5Tokenizer, T5ForConditionalGeneration
+from transformers import T5Tokenizer, T5ForConditionalGeneration, TextStreamer, StoppingCriteria, StoppingCriteriaList
+import math
+import os
+import threading
 import torch
+from typing import Optional
+from app.core import metrics
+from app.core.config import settings
+from app.core.executor import model_load_lock
+from app.services import cache, mock_models, onnx_models
 
 _tokenizer = None
 _model = None
+_load_error = None
+_load_lock = threading.Lock()
 MODEL_PATH = "saved_models/empathy_rewriter"
+PROMPT = "rewrite harsh to polite: "
+
+# --- DECODING PROFILES ---
+# quality:  the original settings (5 beams)
+# balanced: 2 beams, most of the quality at well under half the decoder work
+# fast:     greedy, one hypothesis per message, KV cache reused every step
+# sample:   nucleus sampling, same cost as greedy but more varied phrasing; never cached,
+#           so every request draws a fresh sample
+DECODING_PROFILES = {
+    "quality": {"num_beams": 5, "early_stopping": True, "no_repeat_ngram_size": 2},
+    "balanced": {"num_beams": 2, "early_stopping": True, "no_repeat_ngram_size": 2},
+    "fast": {"num_beams": 1, "do_sample": False, "no_repeat_ngram_size": 2},
+    "sample": {"num_beams": 1, "do_sample": True, "top_p": 0.9, "temperature": 0.8, "no_repeat_ngram_size": 2},
+}
+
+_version = None
+_prompt_tokens = None
+
+def get_model_version() -> str:
+    """Fingerprint of the weights on disk, used to key cached results."""
+    global _version
+    if _version is None:
+        _version = cache.file_fingerprint(
+            os.path.join(MODEL_PATH, "config.json"),
+            os.path.join(MODEL_PATH, "model.safetensors"),
+            os.path.join(MODEL_PATH, "pytorch_model.bin"),
+        ) + onnx_models.runtime_tag()
+    return _version
+
+def get_profile_version(profile: str = None) -> str:
+    """Model version plus everything about decoding that changes the output, for cache keys."""
+    profile = profile or settings.REWRITE_DEFAULT_PROFILE
+    return (f"{get_model_version()}:{profile}:"
+            f"{settings.REWRITE_LENGTH_RATIO}:{settings.REWRITE_LENGTH_MARGIN}:{settings.REWRITE_MAX_LENGTH}")
+
+def get_cache_version(profile: str = None) -> Optional[str]:
+    """Result-cache version for a profile's rewrites; None (don't cache) when it samples."""
+    profile = profile or settings.REWRITE_DEFAULT_PROFILE
+    if DECODING_PROFILES[profile].get("do_sample"):
+        return None
+    return get_profile_version(profile)
+
+def load_model(backend: str = None, quantized: bool = None):
+    """(tokenizer, model) for the given runtime; defaults to INFERENCE_BACKEND / ONNX_QUANTIZED."""
+    if settings.MOCK_MODELS:
+        print("🧪 Using mock T5 Rewriter (MOCK_MODELS)")
+        return mock_models.rewriter_model(PROMPT)
+    backend = backend or settings.INFERENCE_BACKEND
+    if backend == "onnx":
+        # Encoder + decoder-with-past sessions; generate() below works unchanged and reuses the KV cache
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        path = onnx_models.onnx_dir(MODEL_PATH, quantized)
+        print(f"✍️ Loading ONNX T5 Rewriter from {path}...")
+        with model_load_lock:
+            model = ORTModelForSeq2SeqLM.from_pretrained(path, use_cache=True)
+        return T5Tokenizer.from_pretrained(path, legacy=False), model
+
+    print(f"✍️ Loading T5 Rewriter from {MODEL_PATH}...")
+    tokenizer = T5Tokenizer.from_pretrained(MODEL_PATH, legacy=False)
+    with model_load_lock:
+        model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
+    model.eval()
+    return tokenizer, model
 
 def get_model():
-    global _tokenizer, _model
-    if _model is None:
-        print(f"✍️ Loading T5 Rewriter from {MODEL_PATH}...")
-        try:
-            _tokenizer = T5Tokenizer.from_pretrained(MODEL_PATH, legacy=False)
-            _model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
-            _model.eval()
-        except Exception as e:
-            print(f"❌ Error loading T5 Rewriter: {e}")
-            return None, None
+    global _tokenizer, _model, _load_error
+    # A failed load is remembered, so requests don't retry it (and stall) one by one
+    if _model is None and _load_error is None:
+        # Startup warm-up and an early request may both get here; load once
+        with _load_lock:
+            if _model is not None or _load_error is not None:
+                return _tokenizer, _model
+            try:
+                _tokenizer, _model = load_model()
+            except Exception as e:
+                print(f"❌ Error loading T5 Rewriter: {e}")
+                _load_error = str(e)
+                return None, None
     return _tokenizer, _model
 
 def generate_rewrite(text: str, style: str = "gentle") -> str:
+    return generate_rewrites([text], style=style)[0]
+
+@metrics.timed("rewriter.generate_rewrites")
+def generate_rewrites(texts: list[str], style: str = "gentle", batch_size: int = 16, profile: str = None) -> list[str]:
+    """Rewrite many messages, one padded T5 generate call per `batch_size` chunk."""
+    if not texts:
+        return []
     tokenizer, model = get_model()
     
     if model is None:
-        return f"[Mock] {text} (Model not loaded)"
+        metrics.FALLBACKS.inc("rewriter", amount=len(texts))
+        return [f"[Mock] {text} (Model not loaded)" for text in texts]
+    return generate(tokenizer, model, texts, batch_size, profile)
 
-    input_text = f"rewrite harsh to polite: {text}"
-    
-    inputs = tokenizer(
-        input_text, 
-        return_tensors="pt", 
-        max_length=128, 
-        truncation=True
-    )
+def output_length(tokenizer, attention_mask) -> int:
+    """
+    Adaptive max_length for a padded batch: proportional to the longest source
+    message (prompt excluded), so a three-word input doesn't get a 128-token budget.
+    """
+    global _prompt_tokens
+    if _prompt_tokens is None:
+        # Minus the trailing </s>, which every input has anyway
+        _prompt_tokens = len(tokenizer(PROMPT.strip())["input_ids"]) - 1
+    source_tokens = max(1, int(attention_mask.sum(dim=1).max()) - _prompt_tokens)
+    budget = settings.REWRITE_LENGTH_MARGIN + math.ceil(settings.REWRITE_LENGTH_RATIO * source_tokens)
+    return min(settings.REWRITE_MAX_LENGTH, budget)
 
-    with torch.no_grad():
-        outputs = model.generate(
-            **inputs, 
+def generate(tokenizer, model, texts: list[str], batch_size: int = 16, profile: str = None) -> list[str]:
+    """Rewrites with an already loaded (tokenizer, model), torch or ONNX, using a decoding profile."""
+    decoding = DECODING_PROFILES[profile or settings.REWRITE_DEFAULT_PROFILE]
+    results = []
+    for i in range(0, len(texts), batch_size):
+        input_texts = [f"{PROMPT}{text}" for text in texts[i:i + batch_size]]
+        
+        inputs = tokenizer(
+            input_texts, 
+            return_tensors="pt", 
+            padding=True,
             max_length=128, 
-            num_beams=5, 
-            early_stopping=True,
-            min_length=5, # <--- FORCE it to generate at least 5 words
-            no_repeat_ngram_size=2
+            truncation=True
         )
+        max_length = output_length(tokenizer, inputs["attention_mask"])
+
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs, 
+                max_length=max_length,
+                min_length=min(5, max_length), # <--- FORCE it to generate at least 5 words
+                use_cache=True,
+                **decoding
+            )
+
+        results.extend(tokenizer.batch_decode(outputs, skip_special_tokens=True))
+    return results
+
 
-    result = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return result 
\ No newline at end of file
+class _CallbackStreamer(TextStreamer):
+    """TextStreamer that hands each decoded word to a callback instead of printing it."""
+
+    def __init__(self, tokenizer, on_text):
+        super().__init__(tokenizer, skip_special_tokens=True)
+        self.on_text = on_text
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.on_text(text)
+
+class _StopWhenSet(StoppingCriteria):
+    """Ends generation early once `event` is set (e.g. the streaming client went away)."""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+@metrics.timed("rewriter.stream_rewrite")
+def stream_rewrite(text: str, on_text, profile: str = None, stop: threading.Event = None) -> str:
+    """
+    Rewrite one message, calling `on_text(piece)` as the decoder produces words.
+    Streaming needs a single hypothesis, so beam profiles are rejected; returns the full text.
+    Setting `stop` ends generation at the next token.
+    """
+    profile = profile or settings.REWRITE_DEFAULT_PROFILE
+    decoding = DECODING_PROFILES[profile]
+    if decoding.get("num_beams", 1) > 1:
+        raise ValueError(f"Profile {profile!r} uses beam search and can't be streamed")
+
+    tokenizer, model = get_model()
+    if model is None:
+        metrics.FALLBACKS.inc("rewriter")
+        mock = f"[Mock] {text} (Model not loaded)"
+        for word in mock.split(" "):
+            on_text(word + " ")
+        return mock
+
+    inputs = tokenizer([f"{PROMPT}{text}"], return_tensors="pt", max_length=128, truncation=True)
+    max_length = output_length(tokenizer, inputs["attention_mask"])
+    with torch.no_grad():
+        outputs = model.generate(
+            **inputs,
+            max_length=max_length,
+            min_length=min(5, max_length),
+            use_cache=True,
+            streamer=_CallbackStreamer(tokenizer, on_text),
+            stopping_criteria=StoppingCriteriaList([_StopWhenSet(stop)]) if stop is not None else None,
+            **decoding
+        )
+    return tokenizer.decode(outputs[0], skip_special_tokens=True)
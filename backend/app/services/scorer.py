@@ -1,64 +1,126 @@
+import os
+import threading
 import torch
 from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+from app.core import metrics
+from app.core.config import settings
+from app.core.executor import model_load_lock
 from app.schemas.api import EmpathyScores
 # Import the new Rule Engine
 from app.services import heuristic_scorer 
+from app.services import cache, mock_models, onnx_models
 
 _tokenizer = None
 _model = None
+_load_error = None
+_load_lock = threading.Lock()
 MODEL_PATH = "saved_models/empathy_scorer"
 
 # --- WEIGHTS FOR THE FORMULA ---
 AI_WEIGHT = 0.60       # The Deep Learning Model (Nuance)
 RULE_WEIGHT = 0.40     # The Mathematical Rules (Stability)
 
+_version = None
+
+def get_model_version() -> str:
+    """Fingerprint of the weights on disk, used to key cached results."""
+    global _version
+    if _version is None:
+        _version = cache.file_fingerprint(
+            os.path.join(MODEL_PATH, "config.json"),
+            os.path.join(MODEL_PATH, "model.safetensors"),
+            os.path.join(MODEL_PATH, "pytorch_model.bin"),
+        ) + onnx_models.runtime_tag() + "+" + heuristic_scorer.RULES_VERSION
+    return _version
+
+def load_model(backend: str = None, quantized: bool = None):
+    """(tokenizer, model) for the given runtime; defaults to INFERENCE_BACKEND / ONNX_QUANTIZED."""
+    if settings.MOCK_MODELS:
+        print("🧪 Using mock Scorer (MOCK_MODELS)")
+        return mock_models.scorer_model()
+    backend = backend or settings.INFERENCE_BACKEND
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        path = onnx_models.onnx_dir(MODEL_PATH, quantized)
+        print(f"🧠 Loading ONNX Scorer from {path}...")
+        with model_load_lock:
+            model = ORTModelForSequenceClassification.from_pretrained(path)
+        return DistilBertTokenizer.from_pretrained(path), model
+
+    print(f"🧠 Loading Fine-Tuned Scorer from {MODEL_PATH}...")
+    tokenizer = DistilBertTokenizer.from_pretrained(MODEL_PATH)
+    with model_load_lock:
+        model = DistilBertForSequenceClassification.from_pretrained(MODEL_PATH)
+    model.eval()
+    return tokenizer, model
+
 def get_model():
-    global _tokenizer, _model
-    if _model is None:
-        try:
-            print(f"🧠 Loading Fine-Tuned Scorer from {MODEL_PATH}...")
-            _tokenizer = DistilBertTokenizer.from_pretrained(MODEL_PATH)
-            _model = DistilBertForSequenceClassification.from_pretrained(MODEL_PATH)
-            _model.eval()
-        except Exception as e:
-            print(f"❌ Error loading Scorer: {e}")
-            return None, None
+    global _tokenizer, _model, _load_error
+    # A failed load is remembered, so requests don't retry it (and stall) one by one
+    if _model is None and _load_error is None:
+        # Startup warm-up and an early request may both get here; load once
+        with _load_lock:
+            if _model is not None or _load_error is not None:
+                return _tokenizer, _model
+            try:
+                _tokenizer, _model = load_model()
+            except Exception as e:
+                print(f"❌ Error loading Scorer: {e}")
+                _load_error = str(e)
+                return None, None
     return _tokenizer, _model
 
+def predict(tokenizer, model, texts: list[str], batch_size: int = 64) -> list[tuple[float, float]]:
+    """Raw (warmth, validation) model outputs, clipped to 0-1; one padded forward pass per chunk."""
+    ai_scores = []
+    for i in range(0, len(texts), batch_size):
+        inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", padding=True, truncation=True, max_length=128)
+        with torch.no_grad():
+            outputs = model(**inputs)
+        # Assuming the model was trained to output 2 values (Warmth, Validation)
+        # Let's assume raw output is roughly 0-1 from training, so we just clip it.
+        for row in outputs.logits.tolist():
+            ai_warmth = max(0, min(1, row[0]))
+            ai_validation = max(0, min(1, row[1])) if len(row) > 1 else ai_warmth
+            ai_scores.append((ai_warmth, ai_validation))
+    return ai_scores
+
 def score_message(text: str, context_texts: list[str] = None) -> EmpathyScores:
+    return score_messages([text], [context_texts])[0]
+
+@metrics.timed("scorer.score_messages")
+def score_messages(texts: list[str], contexts: list[list[str]] = None, batch_size: int = 64) -> list[EmpathyScores]:
+    """
+    Score many messages, one padded DistilBERT forward pass per `batch_size` chunk.
+    `contexts` mirrors `texts` and is accepted for parity with score_message.
+    """
+    if not texts:
+        return []
     tokenizer, model = get_model()
-    
-    # 1. Calculate RULE-BASED Score (The "Math" Part)
-    heuristic_val = heuristic_scorer.calculate_heuristic_score(text)
 
-    # 2. Calculate AI Score (The "Brain" Part)
+    # 1. Calculate AI Scores (The "Brain" Part) for the whole batch
     if model is None:
         # Fallback if model fails
-        ai_val = 0.5
+        ai_scores = [(0.5, 0.5)] * len(texts)
+        metrics.FALLBACKS.inc("scorer", amount=len(texts))
     else:
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=128)
-        with torch.no_grad():
-            outputs = model(**inputs)
-        # Assuming the model was trained to output 2 values (Warmth, Validation)
-        # We normalize them to 0-1 range if they aren't already
-        logits = outputs.logits.squeeze().tolist()
-        
-        # If your model outputs raw logits, sigmoid ensures 0-1 range
-        # simple sigmoid approximation for demo: 1 / (1 + exp(-x))
-        # But since you trained for regression 0-1, we might just clip it.
-        # Let's assume raw output is roughly 0-1 from training.
-        ai_warmth = max(0, min(1, logits[0])) if isinstance(logits, list) else max(0, min(1, logits))
-        ai_validation = max(0, min(1, logits[1])) if isinstance(logits, list) and len(logits) > 1 else ai_warmth
+        ai_scores = predict(tokenizer, model, texts, batch_size)
+
+    results = []
+    for text, (ai_warmth, ai_validation) in zip(texts, ai_scores):
+        # 2. Calculate RULE-BASED Score (The "Math" Part)
+        heuristic_val = heuristic_scorer.calculate_heuristic_score(text)
 
-    # 3. APPLY THE FORMULA: Final = (AI * 0.6) + (Rules * 0.4)
-    final_warmth = (ai_warmth * AI_WEIGHT) + (heuristic_val * RULE_WEIGHT)
-    final_validation = (ai_validation * AI_WEIGHT) + (heuristic_val * RULE_WEIGHT)
+        # 3. APPLY THE FORMULA: Final = (AI * 0.6) + (Rules * 0.4)
+        final_warmth = (ai_warmth * AI_WEIGHT) + (heuristic_val * RULE_WEIGHT)
+        final_validation = (ai_validation * AI_WEIGHT) + (heuristic_val * RULE_WEIGHT)
 
-    # 4. Map to 5 Dimensions (Feature Correlation)
-    return EmpathyScores(
-        warmth=final_warmth,
-        validation=final_validation,
-        perspective_taking=final_validation, 
-        supportiveness=final_warmth,          
-        non_judgmental=final_validation * 1.1 # Slight boost if validation is high
-    )
\ No newline at end of file
+        # 4. Map to 5 Dimensions (Feature Correlation)
+        results.append(EmpathyScores(
+            warmth=final_warmth,
+            validation=final_validation,
+            perspective_taking=final_validation, 
+            supportiveness=final_warmth,          
+            non_judgmental=final_validation * 1.1 # Slight boost if validation is high
+        ))
+    return results
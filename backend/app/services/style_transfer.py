@@ -1,230 +1,168 @@
 """
 Style Transfer Service
 Transforms T5 empathetic output into different personas/styles.
+
+Personas are declarative rule files in app/resources/styles/ (or STYLES_DIR),
+one JSON file per persona. A file is compiled once, the first time a style is
+used: its word/phrase rules become one regex alternation plus a replacement
+table, so a rewrite is transformed in a single pass whatever the number of
+rules. Endings are picked with an RNG seeded from the text, so the same rewrite
+in the same style always comes out the same.
+
+Steps, in the order they run (all optional):
+    lowercase            -> lowercase the whole text
+    strip_chars          -> delete these characters
+    rules                -> whole-word replacements / removals (single pass)
+    sentences            -> cap sentence length, drop a dangling conjunction
+    collapse_whitespace  -> squeeze runs of whitespace, trim the ends
+    ending               -> strip end punctuation, maybe append a random ending
+    capitalize           -> uppercase the first letter
 """
 
-import re
+import glob
+import hashlib
+import json
+import os
 import random
-from typing import Literal
+import re
+from typing import Dict, List, Literal, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services import lexicon
 
 # Supported styles
 StyleType = Literal["Diplomat", "Gen Z", "Executive", "Victorian"]
 
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "..", "resources", "styles")
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+class Persona:
+    def __init__(self, spec: dict):
+        self.name: str = spec["name"]
+        self.order: int = spec.get("order", 0)
+        self.description: str = spec.get("description", "")
+        self.lowercase: bool = spec.get("lowercase", False)
+        self.strip_table = str.maketrans("", "", spec.get("strip_chars", ""))
+        self.collapse_whitespace: bool = spec.get("collapse_whitespace", False)
+        self.capitalize: bool = spec.get("capitalize", False)
+        self.ending: Optional[dict] = spec.get("ending")
+        self.ignore_case: bool = spec.get("ignore_case", False)
+
+        # All rule groups in one alternation: group "r<i>" is rule i, and
+        # self._tables[i] maps each matched phrase to its replacement.
+        # Phrases are factored through a trie, so each position is tested once
+        # per shared prefix. Within a group the longest phrase wins; groups are
+        # tried in file order.
+        branches = []
+        self._tables: List[Dict[str, str]] = []
+        for i, rule in enumerate(spec.get("rules", [])):
+            if "replace" in rule:
+                table = {self._key(k): v for k, v in rule["replace"].items()}
+                tail = r"\b"
+            else:
+                table = {self._key(k): "" for k in rule["remove"]}
+                tail = rule.get("trailing", r"\b")
+            branches.append(f"(?P<r{i}>{lexicon.trie_regex(table, space=' ')}){tail}")
+            self._tables.append(table)
+        self._pattern = (
+            re.compile(r"\b(?:" + "|".join(branches) + ")", re.IGNORECASE if self.ignore_case else 0)
+            if branches else None
+        )
+
+        sentences = spec.get("sentences")
+        self.max_words: Optional[int] = sentences["max_words"] if sentences else None
+        self._dangling = (
+            re.compile(r"\s+(?:" + "|".join(map(re.escape, sentences.get("drop_trailing", []))) + r")$", re.IGNORECASE)
+            if sentences and sentences.get("drop_trailing") else None
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "Persona":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _key(self, phrase: str) -> str:
+        return phrase.lower() if self.ignore_case else phrase
+
+    def _replace(self, m: re.Match) -> str:
+        return self._tables[int(m.lastgroup[1:])][self._key(m.group(m.lastgroup))]
+
+    def _shorten_sentences(self, text: str) -> str:
+        sentences = []
+        for sentence in _SENTENCE_SPLIT.split(text):
+            words = sentence.split()
+            if len(words) > self.max_words:
+                sentence = " ".join(words[:self.max_words])
+                if self._dangling is not None:
+                    sentence = self._dangling.sub("", sentence)
+                if not sentence.endswith((".", "!", "?")):
+                    sentence += "."
+            if sentence.strip():
+                sentences.append(sentence.strip())
+        return " ".join(sentences)
+
+    def apply(self, text: str, rng: Optional[random.Random] = None) -> str:
+        """`rng` picks the ending; by default it is seeded from the persona and the text."""
+        result = text
+        if self.lowercase:
+            result = result.lower()
+        result = result.translate(self.strip_table)
+        if self._pattern is not None:
+            result = self._pattern.sub(self._replace, result)
+        if self.max_words:
+            result = self._shorten_sentences(result)
+        if self.collapse_whitespace:
+            result = " ".join(result.split())
+
+        if self.ending:
+            if rng is None:
+                seed = hashlib.sha1(f"{self.name}\0{text}".encode("utf-8")).digest()
+                rng = random.Random(int.from_bytes(seed[:8], "big"))
+            result = result.rstrip(self.ending.get("strip", ""))
+            if rng.random() < self.ending.get("probability", 1.0):
+                result += self.ending.get("separator", "") + rng.choice(self.ending["choices"])
+
+        if self.capitalize and result:
+            result = result[0].upper() + result[1:]
+        return result
+
 
+_personas: Optional[Dict[str, Persona]] = None
+
+
+def get_personas() -> Dict[str, Persona]:
+    """Compiled personas keyed by normalized name, in display order."""
+    global _personas
+    if _personas is None:
+        loaded = [Persona.from_file(p) for p in glob.glob(os.path.join(settings.STYLES_DIR or DEFAULT_DIR, "*.json"))]
+        _personas = {p.name.strip().title(): p for p in sorted(loaded, key=lambda p: (p.order, p.name))}
+    return _personas
+
+
+@metrics.timed("style_transfer.apply_style")
 def apply_style(text: str, style: str = "Diplomat") -> str:
     """
     Apply persona/style transformation to text.
-    
+
     Args:
         text: The base empathetic text (from T5 model)
-        style: One of "Diplomat", "Gen Z", "Executive", "Victorian"
-    
+        style: One of get_available_styles(), e.g. "Diplomat", "Gen Z", "Executive", "Victorian"
+
     Returns:
         Transformed text in the specified style
     """
     style = style.strip().title()  # Normalize: "gen z" -> "Gen Z"
-    
-    if style == "Diplomat" or not text:
-        return text
-    elif style == "Gen Z":
-        return _apply_gen_z_style(text)
-    elif style == "Executive":
-        return _apply_executive_style(text)
-    elif style == "Victorian":
-        return _apply_victorian_style(text)
-    else:
+    persona = get_personas().get(style)
+
+    if persona is None or not text:
         # Unknown style, return original
         return text
-
-
-def _apply_gen_z_style(text: str) -> str:
-    """
-    Gen Z style: lowercase, no punctuation, casual slang.
-    Example: "I understand your frustration." -> "i understand your frustration ngl"
-    """
-    # Convert to lowercase
-    result = text.lower()
-    
-    # Remove formal punctuation (keep apostrophes)
-    result = re.sub(r'[.,!?;:]', '', result)
-    
-    # Replace formal phrases with casual ones
-    replacements = [
-        (r'\bi am\b', "im"),
-        (r'\byou are\b', "ur"),
-        (r'\bdo not\b', "dont"),
-        (r'\bcannot\b', "cant"),
-        (r'\bwill not\b', "wont"),
-        (r'\bvery\b', "super"),
-        (r'\breally\b', "lowkey"),
-        (r'\bunderstand\b', "get"),
-        (r'\bdifficult\b', "rough"),
-        (r'\bsituation\b', "sitch"),
-        (r'\bproblem\b', "issue"),
-        (r'\bplease\b', "pls"),
-        (r'\bthank you\b', "ty"),
-        (r'\bthanks\b', "thx"),
-    ]
-    
-    for pattern, replacement in replacements:
-        result = re.sub(pattern, replacement, result)
-    
-    # Clean up extra spaces
-    result = re.sub(r'\s+', ' ', result).strip()
-    
-    # Randomly append Gen Z phrases
-    endings = ["tbh", "ngl", "fr fr", "no cap", "lowkey", "its giving", "slay"]
-    if random.random() > 0.3:  # 70% chance to add ending
-        result = f"{result} {random.choice(endings)}"
-    
-    return result
-
-
-def _apply_executive_style(text: str) -> str:
-    """
-    Executive style: concise, punchy, professional. No fluff.
-    Example: "I really understand that this is very frustrating." -> "I understand. This is frustrating."
-    """
-    # Remove filler words and phrases
-    filler_patterns = [
-        r'\breally\s+',
-        r'\bvery\s+',
-        r'\bjust\s+',
-        r'\bactually\s+',
-        r'\bbasically\s+',
-        r'\bhonestly\s+',
-        r'\bliterally\s+',
-        r'\bkind of\s+',
-        r'\bsort of\s+',
-        r'\ba bit\s+',
-        r'\ba little\s+',
-        r'\bI think that\s+',
-        r'\bI believe that\s+',
-        r'\bI feel like\s+',
-        r'\bin my opinion\s*,?\s*',
-        r'\bto be honest\s*,?\s*',
-        r'\bif I may\s*,?\s*',
-        r'\bperhaps\s+',
-        r'\bmaybe\s+',
-    ]
-    
-    result = text
-    for pattern in filler_patterns:
-        result = re.sub(pattern, '', result, flags=re.IGNORECASE)
-    
-    # Split into sentences
-    sentences = re.split(r'(?<=[.!?])\s+', result)
-    processed_sentences = []
-    
-    for sentence in sentences:
-        words = sentence.split()
-        
-        # Keep sentences under 12 words
-        if len(words) > 12:
-            # Take first 10-12 words, end at logical break
-            truncated = words[:12]
-            sentence = ' '.join(truncated)
-            
-            # Clean up ending
-            sentence = re.sub(r'\s+(and|but|or|so|because)$', '', sentence, flags=re.IGNORECASE)
-            
-            # Ensure proper ending
-            if not sentence.endswith(('.', '!', '?')):
-                sentence += '.'
-        
-        if sentence.strip():
-            processed_sentences.append(sentence.strip())
-    
-    result = ' '.join(processed_sentences)
-    
-    # Clean up spacing and capitalization
-    result = re.sub(r'\s+', ' ', result).strip()
-    
-    # Ensure first letter is capitalized
-    if result:
-        result = result[0].upper() + result[1:]
-    
-    return result
-
-
-def _apply_victorian_style(text: str) -> str:
-    """
-    Victorian style: extremely formal, flowery language.
-    Example: "I understand" -> "It is my humble understanding"
-    """
-    result = text
-    
-    # Victorian word/phrase replacements (order matters - longer phrases first)
-    replacements = [
-        # Phrases
-        (r'\bI think\b', "It is my humble opinion that"),
-        (r'\bI understand\b', "I do most earnestly comprehend"),
-        (r'\bI feel\b', "I find myself experiencing"),
-        (r'\bI believe\b', "It is my sincere belief that"),
-        (r'\bI hope\b', "I do fervently wish"),
-        (r'\bI am sorry\b', "I find myself most regretful"),
-        (r'\bI\'m sorry\b', "I find myself most regretful"),
-        (r'\bthank you\b', "I extend my most gracious appreciation"),
-        (r'\bthanks\b', "my gratitude to you"),
-        (r'\bplease\b', "I humbly beseech you to"),
-        (r'\bcan we\b', "might we perchance"),
-        (r'\bcan I\b', "might I humbly"),
-        (r'\blet me\b', "pray, allow me to"),
-        (r'\bI want\b', "I do earnestly desire"),
-        (r'\bI need\b', "I find myself in want of"),
-        
-        # Words
-        (r'\bbad\b', "most unfavorable"),
-        (r'\bgood\b', "most agreeable"),
-        (r'\bhappy\b', "filled with great felicity"),
-        (r'\bsad\b', "overcome with melancholy"),
-        (r'\bangry\b', "vexed beyond measure"),
-        (r'\bvery\b', "exceedingly"),
-        (r'\breally\b', "most assuredly"),
-        (r'\byes\b', "indeed"),
-        (r'\bno\b', "I must regretfully decline"),
-        (r'\bokay\b', "most agreeable"),
-        (r'\bok\b', "most agreeable"),
-        (r'\bhelp\b', "render assistance"),
-        (r'\bproblem\b', "matter of concern"),
-        (r'\bissue\b', "matter requiring attention"),
-        (r'\bsituation\b', "present circumstances"),
-        (r'\bdifficult\b', "most challenging"),
-        (r'\beasy\b', "most effortless"),
-        (r'\bfast\b', "with great haste"),
-        (r'\bslow\b', "with deliberate care"),
-        (r'\bnow\b', "at this present moment"),
-        (r'\bsoon\b', "in due course"),
-        (r'\blater\b', "at a subsequent time"),
-        (r'\btoday\b', "on this very day"),
-        (r'\btomorrow\b', "on the morrow"),
-        (r'\byesterday\b', "on the day prior"),
-    ]
-    
-    for pattern, replacement in replacements:
-        result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
-    
-    # Add Victorian flourishes at the end
-    endings = [
-        ", if you would be so kind.",
-        ", I remain your humble servant.",
-        ", with utmost sincerity.",
-        ", herewith.",
-        "."
-    ]
-    
-    # Remove existing ending punctuation and add Victorian ending
-    result = result.rstrip('.!?')
-    result += random.choice(endings)
-    
-    # Ensure proper capitalization
-    if result:
-        result = result[0].upper() + result[1:]
-    
-    return result
+    return persona.apply(text)
 
 
 # Helper function to get available styles
 def get_available_styles() -> list[str]:
     """Return list of available style options."""
-    return ["Diplomat", "Gen Z", "Executive", "Victorian"]
+    return [p.name for p in get_personas().values()]
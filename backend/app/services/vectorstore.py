@@ -1,34 +1,244 @@
-import chromadb
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from app.core import metrics
 from app.core.config import settings
-from typing import List, Dict, Any
-
-_client = None
-_collection = None
-
-def get_collection():
-    global _client, _collection
-    if _collection is None:
-        # PersistentClient saves data to disk automatically
-        _client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
-        _collection = _client.get_or_create_collection(name="messages")
-    return _collection
-
-def upsert_message(mid: str, text: str, embedding: List[float], metadata: Dict[str, Any]):
-    coll = get_collection()
-    coll.upsert(
-        ids=[mid],
-        metadatas=[metadata],
-        documents=[text],
-        embeddings=[embedding]
-    )
-
-def search_context(embedding: List[float], top_k: int = 3) -> List[str]:
-    coll = get_collection()
-    res = coll.query(
-        query_embeddings=[embedding],
-        n_results=top_k
-    )
-    # Return just the text of past messages
-    if res and res['documents']:
-        return res['documents'][0]
-    return []
\ No newline at end of file
+from app.db.vector_backend import VectorBackend, ContextFilter
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+# float32 rows from embeddings.generate_embeddings; backends also accept plain lists
+Vector = Union[np.ndarray, List[float]]
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> VectorBackend:
+    """The storage engine selected by VECTOR_BACKEND ("chroma" or "local")."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(settings.VECTOR_BACKEND)
+    return _backend
+
+def create_backend(name: str) -> VectorBackend:
+    if name == "chroma":
+        from app.db.chroma_backend import ChromaBackend
+        return ChromaBackend(settings.CHROMA_PERSIST_DIR, shard_by_conversation=settings.CHROMA_SHARD_BY_CONVERSATION)
+    if name == "local":
+        from app.db.local_backend import LocalBackend
+        return LocalBackend(
+            settings.LOCAL_VECTOR_DIR,
+            ann_threshold=settings.LOCAL_VECTOR_ANN_THRESHOLD,
+            hnsw_m=settings.HNSW_M,
+            hnsw_ef_construction=settings.HNSW_EF_CONSTRUCTION,
+            hnsw_ef=settings.HNSW_EF_SEARCH,
+        )
+    raise ValueError(f"Unknown VECTOR_BACKEND: {name!r} (expected 'chroma' or 'local')")
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer for upserts.
+    Messages accumulate in memory and are written with one bulk `upsert` when
+    VECTOR_WRITE_BUFFER_SIZE is reached or the oldest entry is older than
+    VECTOR_WRITE_FLUSH_INTERVAL_S. Pending and in-flight entries stay searchable
+    so a process always reads its own writes.
+    """
+
+    def __init__(self, max_items: int, flush_interval: float):
+        self.max_items = max(1, max_items)
+        self.flush_interval = flush_interval
+        self._pending: "OrderedDict[str, Tuple[str, Vector, Dict[str, Any]]]" = OrderedDict()
+        self._in_flight: Dict[str, Tuple[str, Vector, Dict[str, Any]]] = {}
+        self._oldest = None
+        self._lock = threading.Lock()        # guards _pending / _in_flight
+        self._flush_lock = threading.Lock()  # one bulk write at a time
+        self._stop = threading.Event()
+        self._timer = None
+
+        # --- METRICS ---
+        self.flushes = 0
+        self.flushed_items = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def add(self, mids, texts, embeddings, metadatas):
+        with self._lock:
+            for mid, text, emb, meta in zip(mids, texts, embeddings, metadatas):
+                self._pending[mid] = (text, emb, meta)
+                self._pending.move_to_end(mid)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_items
+        self._ensure_timer()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch = dict(self._pending)
+                self._in_flight.update(batch)
+                self._pending.clear()
+                self._oldest = None
+
+            start = time.perf_counter()
+            try:
+                get_backend().upsert(
+                    ids=list(batch.keys()),
+                    documents=[v[0] for v in batch.values()],
+                    embeddings=[v[1] for v in batch.values()],
+                    metadatas=[v[2] for v in batch.values()],
+                )
+            except Exception as e:
+                self.flush_errors += 1
+                metrics.CALL_ERRORS.inc("vectorstore.flush")
+                print(f"❌ Vector store flush failed ({len(batch)} messages): {e}")
+                # Put them back (newer writes for the same id win) so the next flush retries
+                with self._lock:
+                    for mid, value in batch.items():
+                        self._pending.setdefault(mid, value)
+                    if self._pending and self._oldest is None:
+                        self._oldest = time.monotonic()
+                raise
+            finally:
+                with self._lock:
+                    for mid in batch:
+                        self._in_flight.pop(mid, None)
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            metrics.CALL_SECONDS.observe(elapsed_ms / 1000, "vectorstore.flush")
+            self.flushes += 1
+            self.flushed_items += len(batch)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    def _ensure_timer(self):
+        if self._timer is None or not self._timer.is_alive():
+            self._stop.clear()
+            self._timer = threading.Thread(target=self._run_timer, name="vectorstore-flush", daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        tick = max(0.05, self.flush_interval / 4)
+        while not self._stop.wait(tick):
+            oldest = self._oldest
+            if oldest is not None and time.monotonic() - oldest >= self.flush_interval:
+                try:
+                    self.flush()
+                except Exception:
+                    pass  # already logged; retried on the next tick
+
+    def snapshot(self) -> List[Tuple[str, str, Vector, Dict[str, Any]]]:
+        """(id, text, embedding, metadata) for everything not yet visible in the backend."""
+        with self._lock:
+            merged = {**self._in_flight, **self._pending}
+        return [(mid, v[0], v[1], v[2]) for mid, v in merged.items()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffer_depth": len(self._pending),
+            "in_flight": len(self._in_flight),
+            "max_items": self.max_items,
+            "flush_interval_s": self.flush_interval,
+            "flushes": self.flushes,
+            "flushed_items": self.flushed_items,
+            "flush_errors": self.flush_errors,
+            "flush_ms": {
+                "last": round(self.last_flush_ms, 3),
+                "avg": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+                "max": round(self.max_flush_ms, 3),
+            },
+        }
+
+    def close(self):
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join(timeout=5)
+        self.flush()
+
+
+_buffer = WriteBuffer(settings.VECTOR_WRITE_BUFFER_SIZE, settings.VECTOR_WRITE_FLUSH_INTERVAL_S)
+
+def upsert_message(mid: str, text: str, embedding: Vector, metadata: Dict[str, Any]):
+    upsert_messages([mid], [text], [embedding], [metadata])
+
+def upsert_messages(mids: List[str], texts: List[str], embeddings: Sequence[Vector], metadatas: List[Dict[str, Any]]):
+    """Queue messages for the next bulk upsert (see WriteBuffer)."""
+    if not mids:
+        return
+    _buffer.add(mids, texts, embeddings, metadatas)
+
+def context_filter(conversation_id: Optional[int], sender: Optional[str], now: Optional[float] = None) -> Optional[ContextFilter]:
+    """
+    Retrieval scope for one request, per CONTEXT_SCOPE and CONTEXT_RECENCY_SECONDS.
+    "conversation" scopes to the conversation when one is given, else to the sender.
+    Pass a shared `now` for a batch so identical scopes can be queried together.
+    """
+    now = time.time() if now is None else now
+    min_ts = now - settings.CONTEXT_RECENCY_SECONDS if settings.CONTEXT_RECENCY_SECONDS > 0 else None
+    scope = settings.CONTEXT_SCOPE
+    if scope == "conversation" and conversation_id:
+        return ContextFilter(conversation_id=conversation_id, min_timestamp=min_ts)
+    if scope in ("conversation", "sender") and sender:
+        return ContextFilter(sender=sender, min_timestamp=min_ts)
+    return ContextFilter(min_timestamp=min_ts) if min_ts is not None else None
+
+def search_context(embedding: Vector, top_k: int = 3, scope: Optional[ContextFilter] = None) -> List[str]:
+    return search_context_batch([embedding], top_k=top_k, scopes=[scope])[0]
+
+@metrics.timed("vectorstore.search_context_batch")
+def search_context_batch(embeddings: Sequence[Vector], top_k: int = 3,
+                         scopes: Optional[List[Optional[ContextFilter]]] = None) -> List[List[str]]:
+    """Run one backend query for many embeddings; returns one context list per embedding."""
+    if len(embeddings) == 0:
+        return []
+    scopes = scopes or [None] * len(embeddings)
+    backend = get_backend()
+    # Snapshot first: anything flushed while we query shows up in both and is merged by id
+    pending = _buffer.snapshot()
+    hits = backend.query(embeddings, top_k, filters=scopes)
+
+    if not pending:
+        # Return just the text of past messages
+        return [[doc for _, doc, _ in row] for row in hits]
+
+    # Read-your-writes: score buffered messages with the backend's own metric
+    # and merge the ones in scope into each result list.
+    p_vecs = np.asarray([p[2] for p in pending], dtype=np.float32)
+    p_dists = backend.distances(np.asarray(embeddings, dtype=np.float32), p_vecs)
+
+    results = []
+    for qi, row in enumerate(hits):
+        scope = scopes[qi]
+        candidates = {mid: (dist, doc) for mid, doc, dist in row}
+        for (mid, doc, _, meta), dist in zip(pending, p_dists[qi].tolist()):
+            if scope is None or scope.matches(meta):
+                candidates[mid] = (dist, doc)
+        ranked = sorted(candidates.values(), key=lambda c: c[0])[:top_k]
+        results.append([doc for _, doc in ranked])
+    return results
+
+def flush():
+    """Write out everything buffered and close the backend (called on shutdown)."""
+    global _backend
+    _buffer.close()
+    if _backend is not None:
+        _backend.close()
+        _backend = None
+
+def get_buffer_stats() -> Dict[str, Any]:
+    """Write-behind buffer counters only; in memory, safe on the event loop (e.g. /metrics)."""
+    return _buffer.stats()
+
+def get_stats() -> Dict[str, Any]:
+    """Blocking: counts the backend (a Chroma / sqlite query). Call through run_blocking."""
+    backend = get_backend()
+    return {"backend": backend.name, "messages": backend.count(), **_buffer.stats()}
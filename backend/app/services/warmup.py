@@ -0,0 +1,94 @@
+"""
+Model Warm-up
+Loads the embedding, scorer and rewriter models concurrently at startup and
+pushes one dummy input through each, so lazy kernel / allocator init happens
+before the first real request instead of during it.
+
+State per model: pending -> loading -> warming -> ready | fallback | failed
+("fallback" = the service couldn't load its weights and serves fallback output).
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.core import executor
+from app.core.config import settings
+from app.services import embeddings, rewriter, scorer
+
+WARMUP_TEXT = "Thanks for waiting, I know this took longer than expected."
+
+
+def _loaded(pair) -> bool:
+    # scorer / rewriter get_model return (None, None) when the weights can't be loaded
+    return pair[1] is not None
+
+
+# name -> (load, is_loaded, dummy inference)
+MODELS: Dict[str, tuple] = {
+    "embeddings": (embeddings.get_model, lambda m: m is not None, lambda: embeddings.generate_embedding(WARMUP_TEXT)),
+    "scorer": (scorer.get_model, _loaded, lambda: scorer.score_message(WARMUP_TEXT)),
+    "rewriter": (rewriter.get_model, _loaded, lambda: rewriter.generate_rewrite(WARMUP_TEXT)),
+}
+
+_state: Dict[str, Dict[str, Any]] = {
+    name: {"status": "pending", "load_s": None, "warmup_s": None, "error": None} for name in MODELS
+}
+_started_at: Optional[float] = None
+_finished_at: Optional[float] = None
+
+
+async def _warm(name: str, load: Callable, is_loaded: Callable, infer: Callable):
+    state = _state[name]
+    try:
+        state["status"] = "loading"
+        start = time.perf_counter()
+        model = await executor.run_blocking(load)
+        state["load_s"] = round(time.perf_counter() - start, 3)
+        if not is_loaded(model):
+            state["status"] = "fallback"
+            return
+
+        state["status"] = "warming"
+        start = time.perf_counter()
+        await executor.run_blocking(infer)
+        state["warmup_s"] = round(time.perf_counter() - start, 3)
+        state["status"] = "ready"
+        print(f"🔥 {name} ready (load {state['load_s']}s, warm-up {state['warmup_s']}s)")
+    except Exception as e:
+        state["status"] = "failed"
+        state["error"] = str(e)
+        print(f"❌ Warm-up failed for {name}: {e}")
+
+
+async def warm_up():
+    """Load and warm every model concurrently; never raises."""
+    global _started_at, _finished_at
+    _started_at = time.time()
+    await asyncio.gather(*(_warm(name, *fns) for name, fns in MODELS.items()))
+    _finished_at = time.time()
+    print(f"✅ Models warmed up in {_finished_at - _started_at:.1f}s")
+
+
+def start() -> Optional[asyncio.Task]:
+    """Warm up in the background so /healthz answers while models load."""
+    if not settings.WARMUP_ON_STARTUP:
+        return None
+    return asyncio.create_task(warm_up())
+
+
+def is_ready() -> bool:
+    ok = {"ready", "fallback"} if settings.WARMUP_ALLOW_FALLBACK else {"ready"}
+    if not settings.WARMUP_ON_STARTUP:
+        # Lazy loading: nothing to wait for
+        return True
+    return all(state["status"] in ok for state in _state.values())
+
+
+def get_status() -> Dict[str, Any]:
+    return {
+        "ready": is_ready(),
+        "started_at": _started_at,
+        "warmup_total_s": round(_finished_at - _started_at, 3) if _finished_at else None,
+        "models": {name: dict(state) for name, state in _state.items()},
+    }
@@ -0,0 +1,336 @@
+"""
+Load test for POST /api/v1/analyze: throughput and p50/p95/p99 latency, overall
+and per pipeline stage, swept over concurrency levels and message lengths.
+
+Usage (from backend/):
+    # In-process (ASGI, no network), mock models: runs without saved_models/
+    python -m benchmarks.load_test --mock-models --concurrency 1 4 16 --lengths 10 40 120
+
+    # Against a running server
+    MOCK_MODELS=1 uvicorn app.main:app --port 8000
+    python -m benchmarks.load_test --url http://127.0.0.1:8000
+
+    # Save results, then compare a later run against them
+    python -m benchmarks.load_test --mock-models --output benchmarks/results/load_before.json
+    python -m benchmarks.load_test --mock-models --compare benchmarks/results/load_before.json
+
+Messages come from a synthetic corpus with the columns of data/synthetic_dataset.csv
+(--write-corpus saves it), or from --corpus. Each request gets a different
+message, so the result cache only hits when the same text is analyzed again.
+
+Stages: embed, retrieve, score, detect, rewrite, style, read from each
+response's Server-Timing header (see app/core/metrics.py), so they are reported
+in both modes as long as the server has SERVER_TIMING on. A stage's time is
+measured where the pipeline awaits it, so it includes any wait for the inference
+pool or a micro-batch; a result cache hit shows up as a near-zero stage. The
+write-behind upsert is off the response path and only appears in GET /metrics.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+STAGES = ("embed", "retrieve", "score", "detect", "rewrite", "style")
+
+# --- SYNTHETIC CORPUS ---
+
+SITUATIONS = [
+    "User has asked for the {thing} several times already",
+    "A developer pushed a change to {project} without review",
+    "Manager waiting on the {thing} for {project}",
+    "Colleague missed the {day} deadline",
+    "Teammate keeps interrupting in meetings",
+]
+SENTENCES = [
+    "I've been asking for the {thing} since {day}.",
+    "Why is the {thing} for {project} still not done??",
+    "This is the {num}th time I have to remind you.",
+    "Did you even test {project} before pushing it?",
+    "You ALWAYS do this and it is getting ridiculous.",
+    "Honestly I don't know why I bother explaining the {thing} again.",
+    "The {thing} was due {day} and nobody told me anything.",
+    "Can you please just fix {project} before {day}?",
+    "I'm tired of cleaning up after your mistakes on {project}.",
+    "Let me know when the {thing} is ready, if that's not too much to ask.",
+]
+THINGS = ["report", "slides", "budget", "release notes", "invoice", "design doc", "test plan", "roadmap"]
+PROJECTS = ["the billing service", "the mobile app", "checkout", "the data pipeline", "the dashboard", "onboarding"]
+DAYS = ["Monday", "Tuesday", "last week", "yesterday", "this morning", "Friday", "the 3rd"]
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(thing=rng.choice(THINGS), project=rng.choice(PROJECTS),
+                           day=rng.choice(DAYS), num=rng.randint(3, 40))
+
+
+def synthetic_rows(n: int, words: int, seed: int = 0) -> List[dict]:
+    """`n` rows shaped like data/synthetic_dataset.csv, with messages of about `words` words."""
+    rng = random.Random(f"{seed}:{words}")
+    rows = []
+    for _ in range(n):
+        message: List[str] = []
+        while len(message) < words:
+            message.extend(_fill(rng.choice(SENTENCES), rng).split())
+        rows.append({
+            "situation": _fill(rng.choice(SITUATIONS), rng),
+            "original_message": " ".join(message[:max(1, words)]),
+            "empathy_score_warmth": round(rng.uniform(0, 0.3), 2),
+            "empathy_score_validation": round(rng.uniform(0, 0.3), 2),
+            "rewritten_message": "",
+        })
+    return rows
+
+
+def corpus_messages(path: str, n: int, words: int, seed: int = 0) -> List[str]:
+    """`n` messages of about `words` words, built by joining original_message values from a CSV."""
+    with open(path, newline="", encoding="utf-8") as f:
+        pool = [row["original_message"] for row in csv.DictReader(f)]
+    rng = random.Random(f"{seed}:{words}")
+    out = []
+    for _ in range(n):
+        message: List[str] = []
+        while len(message) < words:
+            message.extend(rng.choice(pool).split())
+        out.append(" ".join(message[:max(1, words)]))
+    return out
+
+
+# --- STAGE TIMING ---
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """"embed;dur=3.1, rewrite;dur=240.0" -> {"embed": 0.0031, "rewrite": 0.24} (seconds)."""
+    times: Dict[str, float] = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                times[name] = float(value) / 1000
+    return times
+
+
+# --- RUNNING ---
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": round(pct(50), 2),
+        "p95_ms": round(pct(95), 2),
+        "p99_ms": round(pct(99), 2),
+    }
+
+
+async def run_cell(client, messages: List[str], concurrency: int, path: str, args) -> dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for text in messages:
+        queue.put_nowait(text)
+    samples = []
+    errors: Dict[str, int] = {}
+
+    async def worker():
+        while not queue.empty():
+            text = queue.get_nowait()
+            times: Dict[str, float] = {}
+            start = time.perf_counter()
+            try:
+                resp = await client.post(path, json={"text": text, "sender": "bench", "style": args.style,
+                                                     **({"profile": args.profile} if args.profile else {})})
+                status = str(resp.status_code)
+                times = parse_server_timing(resp.headers.get("server-timing"))
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if status == "200":
+                samples.append((elapsed, times))
+            else:
+                errors[status] = errors.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    if not args.url:
+        # Let write-behind upserts finish so they don't spill into the next cell
+        from app.services import pipeline
+        await pipeline.drain()
+
+    return {
+        "requests": len(messages),
+        "ok": len(samples),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 2) if wall > 0 else None,
+        "latency": percentiles([s[0] for s in samples]),
+        "stages": {
+            stage: percentiles([s[1][stage] for s in samples if stage in s[1]])
+            for stage in STAGES
+        } if any(s[1] for s in samples) else {},
+    }
+
+
+async def run(args) -> List[dict]:
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        lifespan = None
+    else:
+        from app.main import app
+        from app.services import warmup
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        # Wait until every model has loaded or given up, then refuse to benchmark a half-loaded app
+        while not warmup.is_ready() and not all(
+                m["status"] in ("ready", "fallback", "failed") for m in warmup.get_status()["models"].values()):
+            await asyncio.sleep(0.05)
+        if not warmup.is_ready():
+            missing = {name: m for name, m in warmup.get_status()["models"].items() if m["status"] != "ready"}
+            await lifespan.__aexit__(None, None, None)
+            await client.aclose()
+            for name, m in missing.items():
+                print(f"❌ {name}: {m['status']}" + (f" ({m['error']})" if m["error"] else ""))
+            raise SystemExit(f"❌ Models did not load: {', '.join(missing)}. "
+                             "Use --mock-models, or WARMUP_ALLOW_FALLBACK=1 to benchmark the fallback output.")
+
+    path = "/api/v1/analyze"
+    results = []
+    try:
+        # Warm-up: first requests pay for lazy imports, thread pool start-up, etc.
+        await run_cell(client, [m["original_message"] for m in synthetic_rows(args.warmup, 20, seed=-1)], 1, path, args)
+
+        for words in args.lengths:
+            for concurrency in args.concurrency:
+                n = max(args.requests, concurrency * 4)
+                if args.corpus:
+                    messages = corpus_messages(args.corpus, n, words, seed=args.seed + concurrency)
+                else:
+                    messages = [r["original_message"] for r in synthetic_rows(n, words, seed=args.seed + concurrency)]
+                print(f"⏱️ {words} words, concurrency {concurrency}: {n} requests...")
+                cell = await run_cell(client, messages, concurrency, path, args)
+                results.append({"words": words, "concurrency": concurrency, **cell})
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def environment(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.realpath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    env = {
+        "commit": commit or None,
+        "mode": "http" if args.url else "in-process",
+        "url": args.url,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "style": args.style,
+        "profile": args.profile,
+    }
+    if not args.url:
+        from app.core.config import settings
+        env["settings"] = {k: getattr(settings, k) for k in (
+            "MOCK_MODELS", "MOCK_MODEL_LATENCY_MS", "INFERENCE_BACKEND", "VECTOR_BACKEND", "INFERENCE_WORKERS",
+            "INFERENCE_MAX_PENDING", "SCORER_BATCH_MAX_SIZE", "REWRITER_BATCH_MAX_SIZE", "REWRITE_DEFAULT_PROFILE",
+            "CACHE_ENABLED", "SERVER_TIMING",
+        )}
+    return env
+
+
+def print_table(results: List[dict], baseline: Optional[List[dict]] = None):
+    base = {(r["words"], r["concurrency"]): r for r in baseline or []}
+    print(f"\n{'words':>6}{'conc':>6}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'err':>6}"
+          + ("".join(f"{s + ' p50':>14}" for s in STAGES) if results and results[0]["stages"] else ""))
+    for r in results:
+        lat = r["latency"]
+        line = (f"{r['words']:>6}{r['concurrency']:>6}{r['throughput_rps'] or 0:>9.1f}"
+                f"{lat.get('p50_ms', 0):>8.1f}ms{lat.get('p95_ms', 0):>8.1f}ms{lat.get('p99_ms', 0):>8.1f}ms"
+                f"{sum(r['errors'].values()):>6}")
+        line += "".join(f"{r['stages'][s].get('p50_ms', 0):>12.1f}ms" for s in STAGES if r["stages"])
+        print(line)
+        old = base.get((r["words"], r["concurrency"]))
+        if old and old["latency"].get("p50_ms"):
+            d = {k: (lat.get(k, 0) - old["latency"].get(k, 0)) / old["latency"][k] * 100 for k in ("p50_ms", "p95_ms", "p99_ms")}
+            rps = (r["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100 if old["throughput_rps"] else 0
+            print(f"{'vs baseline':>12}{rps:>+8.0f}%{d['p50_ms']:>+9.0f}%{d['p95_ms']:>+9.0f}%{d['p99_ms']:>+9.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; default is in-process")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 40, 120], help="message lengths, in words")
+    parser.add_argument("--requests", type=int, default=50, help="requests per cell (at least 4 x concurrency)")
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent before measuring")
+    parser.add_argument("--style", default="Diplomat")
+    parser.add_argument("--profile", choices=["quality", "balanced", "fast", "sample"], help="T5 decoding profile")
+    parser.add_argument("--corpus", help="CSV with an original_message column (e.g. data/synthetic_dataset.csv)")
+    parser.add_argument("--write-corpus", metavar="PATH", help="write the synthetic corpus for --lengths as CSV and exit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mock-models", action="store_true", help="in-process: use mock models (MOCK_MODELS=1)")
+    parser.add_argument("--mock-latency-ms", type=float, help="in-process: MOCK_MODEL_LATENCY_MS")
+    parser.add_argument("--data-dir", help="in-process: vector store directory (default: a fresh temp dir)")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", metavar="JSON", help="print changes against an earlier --output file")
+    args = parser.parse_args()
+
+    if args.write_corpus:
+        os.makedirs(os.path.dirname(args.write_corpus) or ".", exist_ok=True)
+        rows = [row for words in args.lengths for row in synthetic_rows(args.requests, words, args.seed)]
+        with open(args.write_corpus, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"✅ Wrote {len(rows)} rows to {args.write_corpus}")
+        return
+
+    if not args.url:
+        # Settings are read at import, so configure the app before importing it
+        if args.mock_models:
+            os.environ["MOCK_MODELS"] = "1"
+        if args.mock_latency_ms is not None:
+            os.environ["MOCK_MODEL_LATENCY_MS"] = str(args.mock_latency_ms)
+        data_dir = args.data_dir or tempfile.mkdtemp(prefix="load_test_")
+        os.environ["CHROMA_PERSIST_DIR"] = os.path.join(data_dir, "chroma")
+        os.environ["LOCAL_VECTOR_DIR"] = os.path.join(data_dir, "local")
+        # Synthetic requests must not end up in the stores training data is exported from
+        os.environ["ANALYSIS_STORE_PATH"] = os.path.join(data_dir, "analyses.sqlite")
+        os.environ["FEEDBACK_DIR"] = os.path.join(data_dir, "feedback")
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
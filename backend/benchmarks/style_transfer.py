@@ -0,0 +1,110 @@
+"""
+Style transfer: compiled single-pass personas vs. the old one-re.sub-per-rule code.
+
+Usage (from backend/):
+    python -m benchmarks.style_transfer
+    python -m benchmarks.style_transfer --sentences 1 10 100 --output benchmarks/results/style_transfer.json
+
+First checks that both implementations give the same output on every test
+input (endings are pinned to the last choice, so randomness doesn't hide a
+difference), then times one call per style on inputs of growing length.
+"""
+
+import argparse
+import json
+import os
+import random
+import timeit
+from unittest import mock
+
+from app.services import style_transfer
+from benchmarks import legacy_style_transfer as legacy
+
+SENTENCES = [
+    "I really understand that this situation is very difficult for you.",
+    "Thank you for letting me know, I think we can find a good solution together.",
+    "I am sorry, I do not want to make this problem worse than it already is.",
+    "To be honest, I feel like we should maybe talk about it later today.",
+    "Please help me understand what happened yesterday, it was not okay.",
+    "In my opinion, we just need a little more time and it will be fine, actually.",
+    "Can we sort of agree that I believe that this is kind of a bit complicated and hard?",
+    "I hope tomorrow is better, I'm sorry it has been such a bad and slow week.",
+]
+
+
+class _LastChoice(random.Random):
+    """Never adds an optional ending; a mandatory one is always the last choice."""
+
+    def random(self):
+        return 0.99
+
+    def choice(self, seq):
+        return seq[-1]
+
+
+def make_text(n_sentences: int) -> str:
+    return " ".join(SENTENCES[i % len(SENTENCES)] for i in range(n_sentences))
+
+
+def check_parity(styles) -> dict:
+    mismatches = {}
+    texts = SENTENCES + [make_text(n) for n in (3, 20)]
+    personas = style_transfer.get_personas()
+    with mock.patch.object(legacy.random, "random", lambda: 0.0), \
+            mock.patch.object(legacy.random, "choice", lambda seq: seq[-1]):
+        for style in styles:
+            for text in texts:
+                old = legacy.apply_style(text, style)
+                new = personas[style].apply(text, rng=_LastChoice())
+                if old != new:
+                    mismatches.setdefault(style, []).append({"input": text, "legacy": old, "compiled": new})
+    return mismatches
+
+
+def time_call(fn, text: str, style: str, min_time: float) -> float:
+    timer = timeit.Timer(lambda: fn(text, style))
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, nargs="+", default=[1, 10, 100], help="input lengths, in sentences")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per measurement")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    styles = [s for s in style_transfer.get_available_styles() if s != "Diplomat"]
+
+    mismatches = check_parity(styles)
+    for style, cases in mismatches.items():
+        print(f"⚠️ {style}: {len(cases)} outputs differ, e.g.\n   legacy:   {cases[0]['legacy']}\n   compiled: {cases[0]['compiled']}")
+    if not mismatches:
+        print("✅ identical output on all parity inputs")
+
+    results = []
+    for n in args.sentences:
+        text = make_text(n)
+        for style in styles:
+            legacy_us = time_call(legacy.apply_style, text, style, args.min_time)
+            compiled_us = time_call(style_transfer.apply_style, text, style, args.min_time)
+            results.append({
+                "style": style, "sentences": n, "chars": len(text),
+                "legacy_us": round(legacy_us, 1), "compiled_us": round(compiled_us, 1),
+                "speedup": round(legacy_us / compiled_us, 2),
+            })
+
+    print(f"\n{'style':<11}{'sentences':>10}{'chars':>8}{'legacy':>12}{'compiled':>12}{'speedup':>9}")
+    for r in results:
+        print(f"{r['style']:<11}{r['sentences']:>10}{r['chars']:>8}{r['legacy_us']:>10.1f}µs"
+              f"{r['compiled_us']:>10.1f}µs{r['speedup']:>8.1f}x")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"mismatches": mismatches, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Memory per worker: preloaded (shared) weights vs. every worker loading its own.
+
+Usage (from backend/, Linux only - reads /proc/<pid>/smaps_rollup):
+    python -m benchmarks.worker_memory --workers 4
+    python -m benchmarks.worker_memory --workers 4 --output benchmarks/results/worker_memory.json
+
+For each mode this starts gunicorn with gunicorn_conf.py, waits for /readyz,
+sends a few /analyze requests, then reads the memory of the master and every
+worker. PSS (proportional set size) splits each shared page evenly between the
+processes mapping it, so total PSS is the real footprint of the whole server.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_smaps_rollup(pid: int) -> dict:
+    """Memory counters for one process, in MiB."""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in FIELDS:
+                out[key] = int(rest.split()[0]) / 1024
+    return out
+
+
+def children(pid: int) -> list:
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(p) for p in f.read().split())
+    return pids
+
+
+def get(url: str, timeout: float = 5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def post(url: str, payload: dict, timeout: float = 120):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status
+
+
+def wait_ready(base: str, workers: int, timeout: float):
+    """Readiness is per worker, so require several consecutive 200s to cover all of them."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        streak = streak + 1 if get(f"{base}/readyz") == 200 else 0
+        if streak >= workers * 4:
+            return
+        time.sleep(0.05 if streak else 0.5)
+    raise TimeoutError(f"server not ready after {timeout}s")
+
+
+def measure(mode: str, args) -> dict:
+    env = dict(os.environ, WEB_CONCURRENCY=str(args.workers), BIND=f"127.0.0.1:{args.port}",
+               PRELOAD_MODELS="1" if mode == "preload" else "0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn_conf.py"],
+        env=env, stdout=subprocess.DEVNULL if not args.verbose else None, stderr=subprocess.STDOUT,
+    )
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        start = time.perf_counter()
+        wait_ready(base, args.workers, args.timeout)
+        ready_s = time.perf_counter() - start
+        for i in range(args.requests):
+            post(f"{base}/api/v1/analyze", {"text": f"Why is this still not done? Attempt {i}", "sender": "bench"})
+        time.sleep(1)
+
+        master = read_smaps_rollup(proc.pid)
+        workers = [read_smaps_rollup(pid) for pid in children(proc.pid)]
+        total_pss = master["Pss"] + sum(w["Pss"] for w in workers)
+        return {
+            "mode": mode,
+            "workers": len(workers),
+            "ready_s": round(ready_s, 1),
+            "total_pss_mib": round(total_pss, 1),
+            "pss_per_worker_mib": round(sum(w["Pss"] for w in workers) / len(workers), 1),
+            "rss_per_worker_mib": round(sum(w["Rss"] for w in workers) / len(workers), 1),
+            "private_per_worker_mib": round(sum(w["Private_Clean"] + w["Private_Dirty"] for w in workers) / len(workers), 1),
+            "master": {k: round(v, 1) for k, v in master.items()},
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=["preload", "per-worker"], default=["per-worker", "preload"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=20, help="/analyze calls sent before measuring")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show gunicorn output")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        print(f"⏱️ {mode}: starting {args.workers} workers...")
+        results.append(measure(mode, args))
+
+    print(f"\n{'mode':<12}{'total PSS':>12}{'PSS/worker':>12}{'RSS/worker':>12}{'private/worker':>16}{'ready':>8}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['total_pss_mib']:>10.0f}Mi{r['pss_per_worker_mib']:>10.0f}Mi"
+              f"{r['rss_per_worker_mib']:>10.0f}Mi{r['private_per_worker_mib']:>14.0f}Mi{r['ready_s']:>7.0f}s")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Gunicorn config for multi-worker serving with shared model weights.
+
+Usage (from backend/):
+    WEB_CONCURRENCY=4 gunicorn app.main:app -c gunicorn_conf.py
+
+The master loads the models once (preload_app) and forks the workers, which
+share the weight pages copy-on-write. Each worker gets cores // workers torch
+threads unless TORCH_NUM_THREADS is set.
+"""
+
+import os
+
+from app.core import serving
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+# PRELOAD_MODELS=0 gives the old behaviour (every worker loads its own copy), for comparison
+preload_app = os.environ.get("PRELOAD_MODELS", "1") != "0"
+# Model warm-up runs per worker after fork; give it time before the worker is killed
+timeout = int(os.environ.get("WORKER_TIMEOUT", 120))
+
+
+def on_starting(server):
+    # Runs in the master after the app is preloaded and before any worker is forked
+    if preload_app:
+        serving.preload_models()
+
+
+def post_fork(server, worker):
+    threads = serving.configure_torch_threads(workers)
+    server.log.info(f"Worker {worker.pid}: torch intra-op threads = {threads}")
@@ -0,0 +1,89 @@
+"""
+Compare ONNX Runtime outputs against the PyTorch checkpoints.
+
+Usage (from backend/):
+    python -m scripts.check_onnx_parity                 # fp32 export
+    python -m scripts.check_onnx_parity --quantized     # int8 export, looser defaults
+
+Scores: max absolute difference of the clipped model outputs (warmth, validation).
+Rewrites: exact-match rate and mean token similarity of the beam-search outputs.
+Exits non-zero if either drifts beyond its tolerance.
+"""
+
+import argparse
+import csv
+import difflib
+import json
+import sys
+import time
+
+from app.services import rewriter, scorer
+
+DEFAULT_DATA = "data/synthetic_dataset.csv"
+
+
+def load_texts(path: str, limit: int):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row["original_message"] for row in csv.DictReader(f)][:limit]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quantized", action="store_true", help="check the int8 export")
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--score-tolerance", type=float, default=None,
+                        help="max abs score difference (default 0.01, or 0.05 with --quantized)")
+    parser.add_argument("--min-rewrite-similarity", type=float, default=None,
+                        help="min mean token similarity (default 0.98, or 0.85 with --quantized)")
+    parser.add_argument("--skip-rewriter", action="store_true")
+    args = parser.parse_args()
+
+    score_tol = args.score_tolerance if args.score_tolerance is not None else (0.05 if args.quantized else 0.01)
+    min_sim = args.min_rewrite_similarity if args.min_rewrite_similarity is not None else (0.85 if args.quantized else 0.98)
+    texts = load_texts(args.data, args.samples)
+    report = {"samples": len(texts), "quantized": args.quantized}
+
+    # --- SCORER ---
+    ref, ref_s = timed(scorer.predict, *scorer.load_model("torch"), texts)
+    got, got_s = timed(scorer.predict, *scorer.load_model("onnx", args.quantized), texts)
+    max_diff = max(abs(a - b) for r, g in zip(ref, got) for a, b in zip(r, g))
+    report["scorer"] = {
+        "max_abs_diff": round(max_diff, 6),
+        "tolerance": score_tol,
+        "torch_s": round(ref_s, 3),
+        "onnx_s": round(got_s, 3),
+        "ok": max_diff <= score_tol,
+    }
+
+    # --- REWRITER ---
+    if not args.skip_rewriter:
+        ref, ref_s = timed(rewriter.generate, *rewriter.load_model("torch"), texts)
+        got, got_s = timed(rewriter.generate, *rewriter.load_model("onnx", args.quantized), texts)
+        sims = [difflib.SequenceMatcher(None, r.split(), g.split()).ratio() for r, g in zip(ref, got)]
+        mean_sim = sum(sims) / len(sims) if sims else 1.0
+        report["rewriter"] = {
+            "exact_match": round(sum(r == g for r, g in zip(ref, got)) / max(len(ref), 1), 4),
+            "mean_similarity": round(mean_sim, 4),
+            "min_similarity": min_sim,
+            "torch_s": round(ref_s, 3),
+            "onnx_s": round(got_s, 3),
+            "ok": mean_sim >= min_sim,
+        }
+        worst = sorted(zip(sims, ref, got))[:3]
+        report["rewriter"]["worst"] = [{"similarity": round(s, 3), "torch": r, "onnx": g} for s, r, g in worst if s < 1.0]
+
+    print(json.dumps(report, indent=2))
+    ok = all(section["ok"] for section in (report.get("scorer"), report.get("rewriter")) if section)
+    print("✅ ONNX outputs within tolerance" if ok else "❌ ONNX outputs drifted beyond tolerance")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Export the fine-tuned scorer and rewriter to ONNX for INFERENCE_BACKEND=onnx.
+
+Usage (from backend/, needs `pip install optimum-onnx[onnxruntime]`):
+    python -m scripts.export_onnx               # fp32 -> saved_models/*_onnx
+    python -m scripts.export_onnx --quantize    # also int8 -> saved_models/*_onnx_int8
+
+Then verify with `python -m scripts.check_onnx_parity [--quantized]`.
+"""
+
+import argparse
+import time
+
+from app.services import onnx_models, rewriter, scorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", choices=["scorer", "rewriter"], default=["scorer", "rewriter"])
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamic int8 copy")
+    args = parser.parse_args()
+
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+
+    targets = {
+        "scorer": (scorer.MODEL_PATH, ORTModelForSequenceClassification),
+        "rewriter": (rewriter.MODEL_PATH, ORTModelForSeq2SeqLM),
+    }
+    for name in args.models:
+        model_path, ort_cls = targets[name]
+        start = time.perf_counter()
+        print(f"📦 Exporting {name} from {model_path}...")
+        out_dir = onnx_models.export(model_path, ort_cls)
+        print(f"   fp32 -> {out_dir} ({time.perf_counter() - start:.1f}s)")
+
+        if args.quantize:
+            start = time.perf_counter()
+            q_dir = onnx_models.quantize(out_dir, onnx_models.onnx_dir(model_path, quantized=True))
+            print(f"   int8 -> {q_dir} ({time.perf_counter() - start:.1f}s)")
+
+    print("✅ Export done. Set INFERENCE_BACKEND=onnx (and ONNX_QUANTIZED=true for int8) to use it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Export RLHF feedback joined with the analyses it rates as a training set.
+
+Usage (from backend/):
+    python -m scripts.export_training_data --output data/feedback_dataset.csv
+    python -m scripts.export_training_data --output data/feedback_dataset.parquet   # needs pyarrow
+
+Feedback segments (data/feedback/) are streamed oldest first and joined in
+chunks against the analysis store (data/analyses.sqlite) by message_id, so
+neither side is loaded whole. Each row has `original_message` and
+`rewritten_message`, the columns training/train_rewriter.py reads:
+
+    user_correction given         -> the correction        (target_source "correction")
+    thumbs up on a T5 rewrite     -> the base T5 rewrite   (target_source "accepted")
+
+Other feedback (thumbs down without a correction, ratings of messages that
+weren't rewritten) has no target and is skipped unless --all is passed.
+Feedback for a message_id that isn't in the store is counted and skipped.
+"""
+
+import argparse
+import csv
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.services import analysis_store, feedback
+
+FIELDS = [
+    ("feedback_id", "string"), ("message_id", "string"), ("feedback_at", "string"), ("rating", "int64"),
+    ("original_message", "string"), ("rewritten_message", "string"), ("target_source", "string"),
+    ("user_correction", "string"), ("base_rewrite", "string"), ("styled_rewrite", "string"),
+    ("style", "string"), ("profile", "string"),
+    *((f"model_{f}", "float64") for f in analysis_store.SCORE_FIELDS),
+    ("issues", "string"), ("analyzed_at", "float64"),
+    ("scorer_version", "string"), ("rewriter_version", "string"), ("rules_version", "string"),
+]
+COLUMNS = [name for name, _ in FIELDS]
+
+
+def training_row(record: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
+    correction = (record.get("user_correction") or "").strip()
+    if correction:
+        target, source = correction, "correction"
+    elif record.get("rating", 0) > 0 and analysis["base_rewrite"]:
+        target, source = analysis["base_rewrite"], "accepted"
+    else:
+        target, source = None, None
+    return {
+        "feedback_id": record.get("feedback_id"),
+        "message_id": record["message_id"],
+        "feedback_at": record.get("timestamp"),
+        "rating": record.get("rating"),
+        "original_message": analysis["original_text"],
+        "rewritten_message": target,
+        "target_source": source,
+        "user_correction": record.get("user_correction"),
+        "base_rewrite": analysis["base_rewrite"],
+        "styled_rewrite": analysis["styled_rewrite"],
+        "style": analysis["style"],
+        "profile": analysis["profile"],
+        **{f"model_{f}": analysis[f] for f in analysis_store.SCORE_FIELDS},
+        "issues": analysis["issues"],
+        "analyzed_at": analysis["created_at"],
+        "scorer_version": analysis["scorer_version"],
+        "rewriter_version": analysis["rewriter_version"],
+        "rules_version": analysis["rules_version"],
+    }
+
+
+def chunks(records: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for record in records:
+        if record.get("message_id"):
+            chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CsvSink:
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """One row group per chunk, so memory stays at one chunk."""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet output needs pyarrow (pip install pyarrow), or write a .csv")
+        self._pa = pa
+        self._schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in FIELDS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if rows:
+            self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help=".csv, or .parquet (needs pyarrow)")
+    parser.add_argument("--feedback-dir", default=feedback.get_dir())
+    parser.add_argument("--store", default=settings.ANALYSIS_STORE_PATH or analysis_store.DEFAULT_PATH)
+    parser.add_argument("--all", action="store_true", help="also export feedback with no training target")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        raise SystemExit(f"❌ No analysis store at {args.store}")
+    store = analysis_store.AnalysisStore(args.store)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    sink = ParquetSink(args.output) if args.output.endswith(".parquet") else CsvSink(args.output)
+
+    print(f"📂 Joining feedback in {args.feedback_dir} with {args.store} ({len(store)} analyses)...")
+    start = time.perf_counter()
+    counts = {"feedback": 0, "exported": 0, "unmatched": 0, "no_target": 0}
+    try:
+        for chunk in chunks(feedback.read_records(args.feedback_dir), args.chunk_size):
+            analyses = store.get_many([r["message_id"] for r in chunk])
+            rows = []
+            for record in chunk:
+                analysis: Optional[Dict[str, Any]] = analyses.get(record["message_id"])
+                if analysis is None:
+                    counts["unmatched"] += 1
+                    continue
+                row = training_row(record, analysis)
+                if row["rewritten_message"] is None and not args.all:
+                    counts["no_target"] += 1
+                    continue
+                rows.append(row)
+            sink.write(rows)
+            counts["feedback"] += len(chunk)
+            counts["exported"] += len(rows)
+    finally:
+        sink.close()
+        store.close()
+
+    print(f"✅ Exported {counts['exported']} of {counts['feedback']} feedback records to {args.output} "
+          f"in {time.perf_counter() - start:.1f}s "
+          f"({counts['unmatched']} without an analysis, {counts['no_target']} without a target)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Import an existing ChromaDB `messages` collection into the local vector backend.
+
+Usage (from backend/):
+    python -m scripts.migrate_chroma --chroma-dir ./chroma_data --target-dir ./vector_data
+
+Then set VECTOR_BACKEND=local. Re-running is safe: ids are upserted.
+"""
+
+import argparse
+import time
+
+from app.core.config import settings
+from app.db.chroma_backend import ChromaBackend
+from app.db.local_backend import LocalBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chroma-dir", default=settings.CHROMA_PERSIST_DIR)
+    parser.add_argument("--target-dir", default=settings.LOCAL_VECTOR_DIR)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"📂 Reading Chroma collection from {args.chroma_dir}...")
+    source = ChromaBackend(args.chroma_dir)
+    total = source.count()
+    target = LocalBackend(
+        args.target_dir,
+        ann_threshold=settings.LOCAL_VECTOR_ANN_THRESHOLD,
+        hnsw_m=settings.HNSW_M,
+        hnsw_ef_construction=settings.HNSW_EF_CONSTRUCTION,
+        hnsw_ef=settings.HNSW_EF_SEARCH,
+    )
+
+    start = time.perf_counter()
+    copied = 0
+    for ids, documents, embeddings, metadatas in source.iter_all(args.batch_size):
+        target.upsert(ids, documents, embeddings, [m or {} for m in metadatas])
+        copied += len(ids)
+        print(f"   {copied}/{total} messages")
+    target.close()
+
+    print(f"✅ Migrated {copied} messages to {args.target_dir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Sharded Chroma: queries without a conversation must see every shard."""
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from app.db.chroma_backend import ChromaBackend  # noqa: E402
+from app.db.vector_backend import ContextFilter  # noqa: E402
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return ChromaBackend(str(tmp_path / "chroma"), shard_by_conversation=True)
+
+
+def _store(backend):
+    backend.upsert(
+        ids=["c7-alice", "c9-bob", "loose-alice"],
+        documents=["alice in conversation 7", "bob in conversation 9", "alice without a conversation"],
+        embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.9, 0.1, 0.0]],
+        metadatas=[
+            {"conversation_id": 7, "sender": "alice", "timestamp": 10.0},
+            {"conversation_id": 9, "sender": "bob", "timestamp": 20.0},
+            {"sender": "alice", "timestamp": 30.0},
+        ],
+    )
+
+
+def test_sender_filter_reads_messages_stored_in_a_shard(backend):
+    _store(backend)
+    [hits] = backend.query([[1.0, 0.0, 0.0]], top_k=5, filters=[ContextFilter(sender="alice")])
+    assert [mid for mid, _, _ in hits] == ["c7-alice", "loose-alice"]
+
+
+def test_global_query_merges_shards_by_distance(backend):
+    _store(backend)
+    [hits] = backend.query([[0.0, 1.0, 0.0]], top_k=2, filters=[None])
+    assert [mid for mid, _, _ in hits] == ["c9-bob", "loose-alice"]
+    [hits] = backend.query([[0.0, 1.0, 0.0]], top_k=5, filters=[ContextFilter(min_timestamp=15.0)])
+    assert {mid for mid, _, _ in hits} == {"c9-bob", "loose-alice"}
+
+
+def test_conversation_filter_still_reads_only_its_shard(backend):
+    _store(backend)
+    [hits] = backend.query([[0.0, 1.0, 0.0]], top_k=5, filters=[ContextFilter(conversation_id=7)])
+    assert [mid for mid, _, _ in hits] == ["c7-alice"]
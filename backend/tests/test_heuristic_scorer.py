@@ -0,0 +1,24 @@
+"""Scores are cached under whitespace-normalized text, so the rules must not depend on whitespace."""
+
+import pytest
+
+from app.services.cache import normalize_text
+from app.services.heuristic_scorer import calculate_heuristic_score
+
+VARIANTS = [
+    ("I HATE YOU", "  I  HATE  YOU  "),
+    ("I HATE YOU", "\tI\nHATE YOU"),
+    ("Please STOP doing that", "Please   STOP    doing that"),
+    ("WHY would you do that??", "WHY  would you   do that??"),
+    ("THANK YOU SO MUCH", "THANK\t\tYOU SO MUCH"),
+]
+
+
+@pytest.mark.parametrize("text,variant", VARIANTS)
+def test_whitespace_variants_score_the_same(text, variant):
+    assert normalize_text(text) == normalize_text(variant)
+    assert calculate_heuristic_score(variant) == calculate_heuristic_score(text)
+
+
+def test_shouting_is_still_penalized():
+    assert calculate_heuristic_score("I HATE YOU") < calculate_heuristic_score("I hate you")
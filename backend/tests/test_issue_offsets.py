@@ -0,0 +1,53 @@
+"""
+Issue offsets index the exact request text. Texts that differ only in
+whitespace share result-cache entries (scores, rewrites), so a cached issue
+list would point at the wrong characters.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+# Settings are read at import, so configure the app before importing it
+_data_dir = tempfile.mkdtemp(prefix="test_issue_offsets_")
+os.environ.setdefault("MOCK_MODELS", "1")
+os.environ.setdefault("VECTOR_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_DIR", os.path.join(_data_dir, "local"))
+os.environ.setdefault("FEEDBACK_DIR", os.path.join(_data_dir, "feedback"))
+os.environ.setdefault("ANALYSIS_STORE_PATH", os.path.join(_data_dir, "analyses.sqlite"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+VARIANTS = ["I hate you", "I    hate   you", "\tI hate you", "I HATE YOU", "  I  HATE  YOU  "]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def _check(text, issues):
+    assert issues, f"no issues for {text!r}"
+    for issue in issues:
+        if issue["code"] == "shouting":
+            assert (issue["start"], issue["end"]) == (0, len(text)), f"{text!r}: {issue}"
+        else:
+            assert text[issue["start"]:issue["end"]].lower() == "hate", f"{text!r}: {issue}"
+
+
+def test_single_analyze_offsets_survive_whitespace_variants(client):
+    for text in VARIANTS:
+        response = client.post("/api/v1/analyze", json={"text": text})
+        assert response.status_code == 200
+        _check(text, response.json()["issues"])
+
+
+def test_batch_analyze_offsets_survive_whitespace_variants(client):
+    response = client.post("/api/v1/analyze/batch", json={"messages": [{"text": t} for t in VARIANTS]})
+    assert response.status_code == 200
+    for text, result in zip(VARIANTS, response.json()):
+        _check(text, result["issues"])
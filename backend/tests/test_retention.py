@@ -0,0 +1,30 @@
+"""Retention planning for messages stored before timestamps were recorded."""
+
+from app.services.retention import plan_evictions
+
+DAY = 86400
+NOW = 1_000 * DAY
+
+
+def _row(mid, text, timestamp=None, conversation_id=1, sender="user"):
+    meta = {"conversation_id": conversation_id, "sender": sender}
+    if timestamp is not None:
+        meta["timestamp"] = timestamp
+    return mid, text, meta
+
+
+def test_legacy_rows_without_timestamp_are_not_expired():
+    rows = [_row("legacy-1", "hello"), _row("legacy-2", "how are you"), _row("legacy-3", "bye", timestamp=None)]
+    assert plan_evictions(rows, now=NOW, max_age_s=90 * DAY) == {}
+
+
+def test_timestamped_rows_still_expire_next_to_legacy_rows():
+    rows = [_row("legacy", "hello"), _row("old", "old news", NOW - 100 * DAY), _row("new", "fresh", NOW - DAY)]
+    assert plan_evictions(rows, now=NOW, max_age_s=90 * DAY) == {"old": "expired"}
+
+
+def test_legacy_rows_rank_oldest_for_caps_and_duplicates():
+    rows = [_row("legacy", "same text"), _row("new", "same text", NOW - DAY), _row("newer", "other", NOW)]
+    assert plan_evictions(rows, now=NOW, max_age_s=90 * DAY, dedupe=True) == {"legacy": "duplicate"}
+    rows = [_row("legacy", "a"), _row("new", "b", NOW - DAY), _row("newer", "c", NOW)]
+    assert plan_evictions(rows, now=NOW, max_per_conversation=2) == {"legacy": "conversation_cap"}
@@ -0,0 +1,166 @@
+"""
+Command line shared by train_scorer.py and train_rewriter.py: run length and
+batch size, multi-process CPU training, bf16, resuming, and the throughput
+report every run ends with.
+
+    python train_scorer.py --epochs 3 --batch-size 16 --grad-accum 2
+    torchrun --nproc_per_node 4 train_rewriter.py --bf16 auto
+    python train_rewriter.py --resume                  # last checkpoint in results_t5/
+
+Under torchrun each process trains a model replica on its own share of the
+batches and gradients are averaged over gloo (DDP), so the effective batch is
+batch size x grad accum x processes. The cores are split evenly between the
+processes on a node (--threads overrides): torchrun's own default of one
+thread per process would leave most of the machine idle.
+
+The report (rank 0) is printed and appended to <output dir>/throughput.jsonl,
+one line per run, so configurations can be compared.
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import torch
+from transformers import TrainerCallback
+from transformers.trainer_utils import get_last_checkpoint
+
+_STARTED = time.perf_counter()
+
+
+def parse_args(description: str, *, epochs: float, batch_size: int, output_dir: str,
+               learning_rate: Optional[float] = None) -> argparse.Namespace:
+    """The defaults are each script's own settings."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--epochs", type=float, default=epochs)
+    parser.add_argument("--max-steps", type=int, default=-1, help="stop after this many optimizer steps (overrides --epochs)")
+    parser.add_argument("--batch-size", type=int, default=batch_size, help="per process")
+    parser.add_argument("--grad-accum", type=int, default=1, help="batches per optimizer step")
+    parser.add_argument("--lr", type=float, default=learning_rate, help="learning rate (default: the Trainer's)")
+    parser.add_argument("--bf16", choices=("auto", "on", "off"), default="auto",
+                        help="bf16 autocast; auto uses it when the CPU has native bf16 (AVX512-BF16 / AMX)")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads per process (default: cores / processes)")
+    parser.add_argument("--workers", type=int, default=0, help="data loader worker processes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=output_dir, help="checkpoints and throughput.jsonl")
+    parser.add_argument("--resume", nargs="?", const="last", default=None, metavar="CHECKPOINT",
+                        help="resume from CHECKPOINT, or with no value from the last one in --output-dir")
+    return parser.parse_args()
+
+
+def world_size() -> int:
+    return int(os.environ.get("WORLD_SIZE", 1))
+
+
+def cpu_supports_bf16() -> bool:
+    """Native bf16 matmuls; without them autocast still works but is slower than fp32."""
+    for check in ("_is_amx_tile_supported", "_is_avx512_bf16_supported"):
+        fn = getattr(torch.cpu, check, None)
+        if fn is not None and fn():
+            return True
+    return False
+
+
+def _threads_per_process(args: argparse.Namespace) -> int:
+    if args.threads:
+        return args.threads
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(1, cores // int(os.environ.get("LOCAL_WORLD_SIZE", 1)))
+
+
+def training_kwargs(args: argparse.Namespace) -> Dict[str, Any]:
+    """TrainingArguments for the CLI options; also sets this process's torch thread count."""
+    torch.set_num_threads(_threads_per_process(args))
+    bf16 = args.bf16 == "on" or (args.bf16 == "auto" and cpu_supports_bf16())
+    if args.bf16 == "on" and not cpu_supports_bf16():
+        print("⚠️ This CPU has no native bf16; autocast will be emulated and likely slower than fp32")
+    kwargs = {
+        "output_dir": args.output_dir,
+        "num_train_epochs": args.epochs,
+        "max_steps": args.max_steps,
+        "per_device_train_batch_size": args.batch_size,
+        "per_device_eval_batch_size": args.batch_size,
+        "gradient_accumulation_steps": args.grad_accum,
+        "bf16": bf16,
+        "use_cpu": True,
+        "dataloader_num_workers": args.workers,
+        "seed": args.seed,
+    }
+    if args.lr is not None:
+        kwargs["learning_rate"] = args.lr
+    if world_size() > 1:
+        kwargs["ddp_backend"] = "gloo"
+        kwargs["ddp_find_unused_parameters"] = False  # every parameter gets a gradient in both models
+    return kwargs
+
+
+def resume_checkpoint(args: argparse.Namespace) -> Optional[str]:
+    if args.resume is None:
+        return None
+    if args.resume != "last":
+        return args.resume
+    checkpoint = get_last_checkpoint(args.output_dir) if os.path.isdir(args.output_dir) else None
+    if checkpoint is None:
+        print(f"⚠️ No checkpoint in {args.output_dir}; starting from scratch")
+    else:
+        print(f"⏩ Resuming from {checkpoint}")
+    return checkpoint
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Samples/sec over the optimizer steps this run took (evaluation excluded),
+    counting every step as a full effective batch.
+    """
+
+    def __init__(self, run: str):
+        self.run = run
+        self._start = 0.0
+        self._start_step = 0
+        self._eval_seconds = 0.0
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._start = time.perf_counter()
+        self._start_step = state.global_step  # > 0 when resuming
+
+    def on_evaluate(self, args, state, control, metrics=None, **kwargs):
+        self._eval_seconds += (metrics or {}).get("eval_runtime", 0.0)
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if not state.is_world_process_zero:
+            return
+        train_seconds = time.perf_counter() - self._start
+        step_seconds = max(train_seconds - self._eval_seconds, 1e-9)
+        steps = state.global_step - self._start_step
+        effective_batch = args.per_device_train_batch_size * args.gradient_accumulation_steps * args.world_size
+        report = {
+            "run": self.run,
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "processes": args.world_size,
+            "threads_per_process": torch.get_num_threads(),
+            "batch_size": args.per_device_train_batch_size,
+            "grad_accum": args.gradient_accumulation_steps,
+            "effective_batch": effective_batch,
+            "bf16": args.bf16,
+            "resumed_from_step": self._start_step,
+            "steps": steps,
+            "samples": steps * effective_batch,
+            "samples_per_sec": round(steps * effective_batch / step_seconds, 2),
+            "train_seconds": round(train_seconds, 1),
+            "eval_seconds": round(self._eval_seconds, 1),
+            "wall_clock_seconds": round(time.perf_counter() - _STARTED, 1),
+        }
+        print(f"📊 {self.run}: {report['samples']} samples in {steps} steps, "
+              f"{report['samples_per_sec']} samples/sec "
+              f"({args.world_size} x {report['threads_per_process']} threads, effective batch {effective_batch}, "
+              f"bf16 {'on' if args.bf16 else 'off'})")
+        print(f"   training {train_seconds:.1f}s (evaluation {self._eval_seconds:.1f}s), "
+              f"wall clock {report['wall_clock_seconds']:.1f}s")
+        os.makedirs(args.output_dir, exist_ok=True)
+        with open(os.path.join(args.output_dir, "throughput.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
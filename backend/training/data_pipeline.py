@@ -0,0 +1,324 @@
+"""
+Streaming training data for train_scorer.py and train_rewriter.py.
+
+Sources (data/synthetic_dataset.csv, exports from scripts/export_training_data.py,
+CSV or Parquet) are read in chunks, never whole. Each chunk is tokenized without
+padding and appended to a tokenized cache on disk:
+
+    cache/tokenized/<key>/
+        input_ids.i32  input_offsets.i64     every row's input tokens, back to back
+        target_ids.i32 target_offsets.i64    seq2seq targets (rewriter)
+        labels.f32                           regression labels, rows x columns (scorer)
+        is_val.u8                            train / validation split
+        meta.json
+
+<key> hashes the tokenizer, the task (columns, prefix, max lengths, split) and
+each source's size and mtime, so the cache is rebuilt only when one of them
+changes. Arrays are memory-mapped: a dataset larger than RAM costs disk, not
+memory.
+
+Batches come from LengthBucketSampler, which groups rows of similar length,
+and DynamicPaddingCollator, which pads each batch only to its longest row.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "tokenized")
+FORMAT_VERSION = 1
+LABEL_PAD = -100  # ignored by the seq2seq loss
+
+
+# --- READING ---
+
+def iter_chunks(path: str, columns: Sequence[str], chunk_rows: int = 10000) -> Iterator["pd.DataFrame"]:
+    """DataFrames of up to `chunk_rows` rows holding `columns`, from a CSV or Parquet file."""
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(columns)):
+            yield batch.to_pandas()
+        return
+
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        chunk.columns = chunk.columns.str.strip()
+        missing = [c for c in columns if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns {missing}. Found: {list(chunk.columns)}")
+        yield chunk[list(columns)]
+
+
+def split_mask(texts: Sequence[str], val_fraction: float) -> np.ndarray:
+    """Validation rows picked by a hash of the text: stable across runs and chunkings, no shuffle buffer."""
+    if val_fraction <= 0:
+        return np.zeros(len(texts), dtype=np.uint8)
+    buckets = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=4).digest(), "big") for t in texts),
+        dtype=np.uint64, count=len(texts),
+    )
+    return (buckets % 10000 < int(val_fraction * 10000)).astype(np.uint8)
+
+
+# --- TOKENIZED CACHE ---
+
+def _fingerprint(path: str) -> List:
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+def cache_key(sources: Sequence[str], tokenizer, task: Dict) -> str:
+    spec = {
+        "format": FORMAT_VERSION,
+        "tokenizer": [type(tokenizer).__name__, tokenizer.name_or_path, len(tokenizer)],
+        "task": task,
+        "sources": [_fingerprint(p) for p in sources],
+    }
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class _Appender:
+    """Appends one ragged array (tokens + row offsets) to two flat files."""
+
+    def __init__(self, directory: str, name: str):
+        self._ids = open(os.path.join(directory, f"{name}_ids.i32"), "wb")
+        self._offsets = open(os.path.join(directory, f"{name}_offsets.i64"), "wb")
+        self._end = 0
+        self._offsets.write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def extend(self, rows: List[List[int]]):
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        self._ids.write(np.fromiter((t for r in rows for t in r), dtype=np.int32, count=int(lengths.sum())).tobytes())
+        self._offsets.write((self._end + np.cumsum(lengths)).tobytes())
+        self._end += int(lengths.sum())
+
+    def close(self):
+        self._ids.close()
+        self._offsets.close()
+
+
+def build_cache(sources: Sequence[str], tokenizer, text_column: str, *, prefix: str = "",
+                target_column: Optional[str] = None, label_columns: Sequence[str] = (),
+                max_length: int = 128, target_max_length: int = 128, val_fraction: float = 0.1,
+                cache_dir: str = DEFAULT_CACHE_DIR, chunk_rows: int = 10000) -> "TokenizedCache":
+    """
+    Tokenize `sources` into a cache (or reuse the one already built for the same inputs).
+    Rows missing the text, the target or any label are skipped.
+    """
+    task = {
+        "text": text_column, "prefix": prefix, "target": target_column, "labels": list(label_columns),
+        "max_length": max_length, "target_max_length": target_max_length, "val_fraction": val_fraction,
+    }
+    path = os.path.join(cache_dir, cache_key(sources, tokenizer, task))
+    if os.path.exists(os.path.join(path, "meta.json")):
+        print(f"📦 Using tokenized cache {path}")
+        return TokenizedCache(path)
+
+    print(f"🔤 Tokenizing {', '.join(sources)} into {path}...")
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".building-")
+    columns = [text_column] + ([target_column] if target_column else []) + list(label_columns)
+    inputs = _Appender(tmp, "input")
+    targets = _Appender(tmp, "target") if target_column else None
+    rows = 0
+    try:
+        with open(os.path.join(tmp, "labels.f32"), "wb") as labels_file, \
+             open(os.path.join(tmp, "is_val.u8"), "wb") as split_file:
+            for source in sources:
+                for chunk in iter_chunks(source, columns, chunk_rows):
+                    chunk = chunk.dropna(subset=columns)
+                    if chunk.empty:
+                        continue
+                    texts = chunk[text_column].astype(str).tolist()
+                    inputs.extend(tokenizer([prefix + t for t in texts], truncation=True, max_length=max_length)["input_ids"])
+                    if targets is not None:
+                        targets.extend(tokenizer(chunk[target_column].astype(str).tolist(), truncation=True,
+                                                 max_length=target_max_length)["input_ids"])
+                    if label_columns:
+                        labels_file.write(chunk[list(label_columns)].to_numpy(dtype=np.float32).tobytes())
+                    split_file.write(split_mask(texts, val_fraction).tobytes())
+                    rows += len(chunk)
+                    print(f"   {rows} rows")
+        inputs.close()
+        if targets is not None:
+            targets.close()
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"rows": rows, "label_columns": list(label_columns),
+                       "has_targets": target_column is not None, "task": task, "sources": list(sources)}, f, indent=2)
+        try:
+            os.replace(tmp, path)  # a half-built cache is never picked up
+        except OSError:
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise
+            shutil.rmtree(tmp, ignore_errors=True)  # another process built the same cache first
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return TokenizedCache(path)
+
+
+class TokenizedCache:
+    def __init__(self, path: str):
+        self._open(path)
+
+    def __getstate__(self):
+        # DataLoader workers reopen the files instead of receiving a pickled copy of every array
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self._open(state["path"])
+
+    def _open(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.rows: int = self.meta["rows"]
+        self.input_ids, self.input_offsets = self._ragged("input")
+        self.target_ids, self.target_offsets = self._ragged("target") if self.meta["has_targets"] else (None, None)
+        k = len(self.meta["label_columns"])
+        self.labels = self._map("labels.f32", np.float32, (self.rows, k)) if k else None
+        self.is_val = self._map("is_val.u8", np.uint8, (self.rows,))
+
+    def _map(self, name: str, dtype, shape):
+        if not shape[0] or (len(shape) > 1 and not shape[1]):
+            return np.zeros(shape, dtype=dtype)  # np.memmap can't map an empty file
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+    def _ragged(self, name: str):
+        offsets = self._map(f"{name}_offsets.i64", np.int64, (self.rows + 1,))
+        return self._map(f"{name}_ids.i32", np.int32, (int(offsets[-1]),)), offsets
+
+    def split(self, name: str) -> "TokenizedDataset":
+        """"train" or "validation" rows."""
+        mask = np.asarray(self.is_val) == (1 if name == "validation" else 0)
+        return TokenizedDataset(self, np.flatnonzero(mask))
+
+
+class TokenizedDataset(Dataset):
+    def __init__(self, cache: TokenizedCache, indices: np.ndarray):
+        self.cache = cache
+        self.indices = indices
+        # Per-row token counts, for bucketing (targets usually dominate seq2seq cost)
+        lengths = np.diff(cache.input_offsets)[indices]
+        if cache.target_offsets is not None:
+            lengths = np.maximum(lengths, np.diff(cache.target_offsets)[indices])
+        self.lengths = lengths
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i: int) -> Dict[str, np.ndarray]:
+        row = self.indices[i]
+        c = self.cache
+        item = {"input_ids": c.input_ids[c.input_offsets[row]:c.input_offsets[row + 1]]}
+        if c.target_ids is not None:
+            item["labels"] = c.target_ids[c.target_offsets[row]:c.target_offsets[row + 1]]
+        elif c.labels is not None:
+            item["labels"] = c.labels[row]
+        return item
+
+
+# --- BATCHING ---
+
+class LengthBucketSampler(Sampler[List[int]]):
+    """
+    Batches of rows with similar lengths. Rows are shuffled, cut into windows of
+    `batch_size * bucket_batches`, sorted by length within each window and split
+    into batches; the batch order is then shuffled. Reshuffles on set_epoch().
+    """
+
+    def __init__(self, lengths: np.ndarray, batch_size: int, shuffle: bool = True, seed: int = 0,
+                 bucket_batches: int = 50, drop_last: bool = False):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.window = batch_size * bucket_batches
+        self.drop_last = drop_last
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = np.random.default_rng(self.seed + self.epoch)
+        order = rng.permutation(len(self.lengths)) if self.shuffle else np.arange(len(self.lengths))
+        batches = []
+        for start in range(0, len(order), self.window):
+            window = order[start:start + self.window]
+            window = window[np.argsort(self.lengths[window], kind="stable")]
+            batches.extend(window[i:i + self.batch_size] for i in range(0, len(window), self.batch_size))
+        if self.drop_last:
+            batches = [b for b in batches if len(b) == self.batch_size]
+        if self.shuffle:
+            rng.shuffle(batches)
+        return (b.tolist() for b in batches)
+
+    def __len__(self):
+        # Every window can end with a partial batch
+        n = len(self.lengths)
+        windows = [min(self.window, n - start) for start in range(0, n, self.window)]
+        if self.drop_last:
+            return sum(w // self.batch_size for w in windows)
+        return sum(-(-w // self.batch_size) for w in windows)
+
+
+class DynamicPaddingCollator:
+    """Pads each batch to its own longest row (rounded up to `pad_to_multiple_of`)."""
+
+    def __init__(self, pad_token_id: int, pad_to_multiple_of: int = 8):
+        self.pad_token_id = pad_token_id
+        self.multiple = max(1, pad_to_multiple_of)
+
+    def _pad(self, rows: List[np.ndarray], value: int) -> np.ndarray:
+        width = max(len(r) for r in rows)
+        width = -(-width // self.multiple) * self.multiple
+        out = np.full((len(rows), width), value, dtype=np.int64)
+        for i, r in enumerate(rows):
+            out[i, :len(r)] = r
+        return out
+
+    def __call__(self, items: List[Dict[str, np.ndarray]]) -> Dict[str, torch.Tensor]:
+        input_ids = self._pad([it["input_ids"] for it in items], self.pad_token_id)
+        batch = {
+            "input_ids": torch.from_numpy(input_ids),
+            "attention_mask": torch.from_numpy((input_ids != self.pad_token_id).astype(np.int64)),
+        }
+        if "labels" in items[0]:
+            first = items[0]["labels"]
+            if first.dtype == np.float32:
+                batch["labels"] = torch.from_numpy(np.stack([it["labels"] for it in items]))
+            else:
+                batch["labels"] = torch.from_numpy(self._pad([it["labels"] for it in items], LABEL_PAD))
+        return batch
+
+
+class LengthBucketingMixin:
+    """
+    Mix into a transformers Trainer / Seq2SeqTrainer so its data loaders use
+    LengthBucketSampler over a TokenizedDataset instead of random fixed-size batches.
+    """
+
+    def _bucketed_loader(self, dataset: TokenizedDataset, batch_size: int, shuffle: bool) -> DataLoader:
+        sampler = LengthBucketSampler(dataset.lengths, batch_size, shuffle=shuffle, seed=self.args.seed,
+                                      drop_last=self.args.dataloader_drop_last)
+        loader = DataLoader(dataset, batch_sampler=sampler, collate_fn=self.data_collator,
+                            num_workers=self.args.dataloader_num_workers, pin_memory=self.args.dataloader_pin_memory)
+        return self.accelerator.prepare(loader)
+
+    def get_train_dataloader(self) -> DataLoader:
+        return self._bucketed_loader(self.train_dataset, self.args.train_batch_size, shuffle=True)
+
+    def get_eval_dataloader(self, eval_dataset=None) -> DataLoader:
+        if isinstance(eval_dataset, str):
+            eval_dataset = self.eval_dataset[eval_dataset]
+        dataset = eval_dataset if eval_dataset is not None else self.eval_dataset
+        return self._bucketed_loader(dataset, self.args.eval_batch_size, shuffle=False)
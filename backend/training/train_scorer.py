@@ -1,6 +1,3 @@
-import pandas as pd
-import torch
-from datasets import Dataset
 from transformers import EarlyStoppingCallback 
 from transformers import (
     DistilBertTokenizer, 
@@ -8,7 +5,8 @@ from transformers import (
     Trainer, 
     TrainingArguments
 )
-from sklearn.model_selection import train_test_split
+import cli
+from data_pipeline import DynamicPaddingCollator, LengthBucketingMixin, build_cache
 
 # --- CONFIGURATION ---
 DATA_PATH = "../data/synthetic_dataset.csv"
@@ -16,47 +14,45 @@ MODEL_NAME = "distilbert-base-uncased"
 OUTPUT_DIR = "../saved_models/empathy_scorer"
 NUM_EPOCHS = 15 
 BATCH_SIZE = 8
+# We predict both scores at once ("Multi-Output Regression")
+LABEL_COLUMNS = ['empathy_score_warmth', 'empathy_score_validation']
+
+
+class BucketedTrainer(LengthBucketingMixin, Trainer):
+    pass
+
 
 def main():
-    print(f"📂 Loading data from {DATA_PATH}...")
-    
-    # 1. Load Data
-    df = pd.read_csv(DATA_PATH)
-    
-    # Clean column names (strip whitespace just in case)
-    df.columns = df.columns.str.strip()
-    
-    # Ensure we have the right columns
-    required_cols = ['original_message', 'empathy_score_warmth', 'empathy_score_validation']
-    if not all(col in df.columns for col in required_cols):
-        raise ValueError(f"CSV is missing columns. Found: {df.columns}")
+    args = cli.parse_args("Train the empathy scorer.", epochs=NUM_EPOCHS, batch_size=BATCH_SIZE, output_dir="./results")
 
-    # 2. Preprocess Data
-    # We combine the two scores into a list for the model to predict both at once
-    # This is called "Multi-Output Regression"
-    df['labels'] = df.apply(lambda row: [float(row['empathy_score_warmth']), float(row['empathy_score_validation'])], axis=1)
-    
-    # Split into Train/Test (80% train, 20% test)
-    train_df, val_df = train_test_split(df, test_size=0.2, random_state=42)
-    
-    # Convert to HuggingFace Dataset format
-    train_dataset = Dataset.from_pandas(train_df)
-    val_dataset = Dataset.from_pandas(val_df)
+    # 1. Define Training Arguments (epochs, batch size, processes, bf16: see cli.py)
+    training_args = TrainingArguments(
+        **cli.training_kwargs(args),
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        logging_dir="./logs",
+        logging_steps=10,
+        load_best_model_at_end=True,     # REQUIRED for Early Stopping
+        metric_for_best_model="eval_loss",
+        greater_is_better=False
+    )
 
     print("🧠 Initializing Tokenizer and Model...")
     tokenizer = DistilBertTokenizer.from_pretrained(MODEL_NAME)
 
-    # 3. Tokenization Function
-    def tokenize_function(examples):
-        return tokenizer(examples["original_message"], padding="max_length", truncation=True, max_length=128)
+    # 2. Load + Tokenize Data
+    # The CSV is streamed in chunks and tokenized once into an on-disk cache (reused
+    # until the data or tokenizer changes); labels are read as a float32 block per chunk.
+    # Under torchrun the main process builds it while the others wait, then they all map it.
+    print(f"📂 Loading data from {DATA_PATH}...")
+    with training_args.main_process_first(desc="tokenizing"):
+        data = build_cache([DATA_PATH], tokenizer, "original_message", label_columns=LABEL_COLUMNS,
+                           max_length=128, val_fraction=0.2)
 
-    # Apply tokenization
-    train_dataset = train_dataset.map(tokenize_function, batched=True)
-    val_dataset = val_dataset.map(tokenize_function, batched=True)
-    
-    # Remove raw text columns, keep only tensors
-    train_dataset.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"])
-    val_dataset.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"])
+    # 3. Split into Train/Test (80% train, 20% test, by a stable hash of the message)
+    train_dataset = data.split("train")
+    val_dataset = data.split("validation")
+    print(f"   {len(train_dataset)} train / {len(val_dataset)} validation rows")
 
     # 4. Initialize Model
     # num_labels=2 because we are predicting [warmth, validation]
@@ -66,37 +62,25 @@ def main():
         problem_type="regression"
     )
 
-    # 5. Define Training Arguments
-    training_args = TrainingArguments(
-    output_dir="./results",
-    num_train_epochs=15,             # Set this high (e.g., 10 or 15)
-    per_device_train_batch_size=8,
-    per_device_eval_batch_size=8,
-    eval_strategy="epoch",
-    save_strategy="epoch",
-    logging_dir="./logs",
-    logging_steps=10,
-    load_best_model_at_end=True,     # REQUIRED for Early Stopping
-    metric_for_best_model="eval_loss",
-    greater_is_better=False
-)
-
-    # 6. Initialize Trainer
-    trainer = Trainer(
+    # 5. Initialize Trainer
+    # Batches of similar-length messages, each padded only to its longest one
+    trainer = BucketedTrainer(
         model=model,
         args=training_args,
         train_dataset=train_dataset,
         eval_dataset=val_dataset,
-        callbacks=[EarlyStoppingCallback(early_stopping_patience=3)],
+        data_collator=DynamicPaddingCollator(tokenizer.pad_token_id),
+        callbacks=[EarlyStoppingCallback(early_stopping_patience=3), cli.ThroughputCallback("scorer")],
     )
 
     print("🚀 Starting Training...")
-    trainer.train()
+    trainer.train(resume_from_checkpoint=cli.resume_checkpoint(args))
 
-    print(f"💾 Saving model to {OUTPUT_DIR}...")
-    model.save_pretrained(OUTPUT_DIR)
-    tokenizer.save_pretrained(OUTPUT_DIR)
-    print("✅ Training Complete. You are ready to score messages!")
+    if trainer.is_world_process_zero():
+        print(f"💾 Saving model to {OUTPUT_DIR}...")
+        trainer.save_model(OUTPUT_DIR)  # the unwrapped model, not the DDP wrapper
+        tokenizer.save_pretrained(OUTPUT_DIR)
+        print("✅ Training Complete. You are ready to score messages!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
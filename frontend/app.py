@@ -92,6 +92,17 @@ def create_radar_chart(scores):
     )
     return fig
 
+def parse_server_timing(header):
+    """"embed;dur=3.1, rewrite;dur=240.0, total;dur=251.7" -> {"embed": 3.1, ...} (ms)."""
+    timings = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                timings[name] = float(value)
+    return timings
+
 # --- SIDEBAR (SYSTEM STATUS) ---
 with st.sidebar:
     st.image("https://img.icons8.com/color/96/000000/brain--v1.png", width=60)
@@ -100,7 +111,9 @@ with st.sidebar:
     st.markdown("---")
     col1, col2 = st.columns(2)
     col1.metric("Model", "DistilBERT", "v2.0")
-    col2.metric("Latency", "42ms", "-12ms")
+    # Filled in once a request has been timed (below)
+    latency_slot = col2.empty()
+    stage_slot = st.empty()
     
     st.markdown("### 🎛️ Control Panel")
     sensitivity = st.slider("Strictness Level", 0.0, 1.0, 0.7, help="Adjust how strictly the AI flags toxicity.")
@@ -134,7 +147,9 @@ with left_col:
                 if response.status_code == 200:
                     data = response.json()
                     st.session_state.result = data
+                    st.session_state.previous_time = st.session_state.get("process_time")
                     st.session_state.process_time = process_time
+                    st.session_state.server_timing = parse_server_timing(response.headers.get("Server-Timing"))
                 else:
                     st.error(f"Backend Error: {response.status_code}")
             except Exception as e:
@@ -161,6 +176,21 @@ with left_col:
         with tab2:
             st.json(res)
 
+# --- MEASURED LATENCY (sidebar) ---
+if "process_time" in st.session_state:
+    previous = st.session_state.get("previous_time")
+    latency_slot.metric(
+        "Latency", f"{st.session_state.process_time * 1000:.0f}ms",
+        f"{(st.session_state.process_time - previous) * 1000:+.0f}ms" if previous else None,
+        delta_color="inverse"
+    )
+    stages = {k: v for k, v in st.session_state.get("server_timing", {}).items() if k != "total"}
+    if stages:
+        with stage_slot.expander("⏱️ Server time by stage"):
+            st.bar_chart(pd.Series(stages, name="ms"))
+else:
+    latency_slot.metric("Latency", "–")
+
 # --- RIGHT COLUMN: ANALYTICS DASHBOARD ---
 with right_col:
     if "result" in st.session_state: